@@ -0,0 +1,84 @@
+"""
+Import time benchmark
+---------------------
+Imports each framework module in a fresh interpreter, reports how long the import took
+and fails if it went over budget or pulled in a module that should only load lazily
+(visualization, graphviz, tokenizer).
+
+Usage:
+    python benchmarks/importTime.py [--repeat 5] [--budget-scale 1.0]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module: (time budget in seconds, modules that must not be imported as a side effect)
+IMPORT_BUDGETS = {
+    "framework.models.Models": (1.5, ["tiktoken", "matplotlib", "pygraphviz", "networkx"]),
+    "framework.agents.AlgorithmOfThought.modelProcesses": (1.5, ["tiktoken", "matplotlib", "pygraphviz", "networkx"]),
+    "framework.agents.AlgorithmOfThought.AoTAgent": (1.5, ["tiktoken", "matplotlib", "pygraphviz", "networkx"]),
+    "framework.blocks.knowledge.prompts.PromptTemplate": (0.5, ["tiktoken"]),
+    "framework.blocks.tools.Tool": (0.5, []),
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+def measure(module: str, repeat: int) -> dict:
+    """Import a module in `repeat` fresh interpreters, keep the fastest run"""
+    best = None
+    loaded = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", PROBE.format(module=module)],
+                              cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed"}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best:
+            best = result["seconds"]
+            loaded = result["modules"]
+    return {"seconds": best, "modules": loaded}
+
+def main():
+    parser = argparse.ArgumentParser(description="Guard framework import times against regressions")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply every budget, for slow machines")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    failures = []
+    results = {}
+    for module, (budget, forbidden) in IMPORT_BUDGETS.items():
+        measured = measure(module, args.repeat)
+        if "error" in measured:
+            failures.append(f"{module}: {measured['error']}")
+            results[module] = {"error": measured["error"]}
+            continue
+        budget = budget * args.budget_scale
+        leaked = [name for name in forbidden if name in measured["modules"]]
+        results[module] = {"seconds": measured["seconds"], "budget": budget, "leaked": leaked}
+        print(f"{module:<55} {measured['seconds'] * 1000:8.1f} ms (budget {budget * 1000:.0f} ms)")
+        if measured["seconds"] > budget:
+            failures.append(f"{module}: {measured['seconds']:.3f}s is over the {budget:.3f}s budget")
+        if leaked:
+            failures.append(f"{module}: eagerly imports {', '.join(leaked)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
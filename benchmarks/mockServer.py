@@ -0,0 +1,245 @@
+"""
+Mock OpenAI server
+------------------
+A local stand-in for the OpenAI-compatible endpoints the framework calls
+(/v1/chat/completions, streamed or not, and /v1/embeddings) with configurable
+latency, jitter, slow-tail and error rate. Replies are deterministic for a given seed:
+AoT scoring calls (max_tokens <= 10) get a number between 0 and 100, other
+chat calls get a short step of text, embeddings are unit vectors derived from
+the input text.
+
+Usage:
+    python benchmarks/mockServer.py --port 8000 --latency 0.2 --jitter 0.05 --error-rate 0.01
+    python benchmarks/mockServer.py --port 8001 --latency 0.2 --tail-rate 0.05 --tail-latency 2
+    then point api_base / base_url at http://127.0.0.1:8000/v1
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+import numpy as np
+
+def count_tokens(text: str) -> int:
+    """Rough whitespace token count, the mock never needs the real tokenizer"""
+    return len(str(text).split())
+
+def text_embedding(text: str, dimension: int) -> list:
+    """Unit vector seeded by the text so equal inputs embed identically"""
+    seed = int.from_bytes(hashlib.sha1(str(text).encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+class MockStats():
+    """Request counters, read them between runs to get calls and tokens per benchmark"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls: Dict[str, int] = {"chat": 0, "embeddings": 0, "errors": 0}
+            self.models: Dict[str, int] = {}
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+
+    def add(self, route: str, prompt_tokens: int = 0, completion_tokens: int = 0, model: str = None) -> None:
+        with self._lock:
+            self.calls[route] = self.calls.get(route, 0) + 1
+            if model is not None:
+                self.models[model] = self.models.get(model, 0) + 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"calls": dict(self.calls), "models": dict(self.models), "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens}
+
+class MockOpenAIServer():
+    """
+    Threaded HTTP server speaking enough of the OpenAI REST API for the framework.
+
+    Parameters
+    ----------
+    latency : float
+        Base delay in seconds added to every request.
+    jitter : float
+        Uniform random delay in seconds added on top of the latency.
+    error_rate : float
+        Fraction of requests answered with a 500 error.
+    tail_rate : float
+        Fraction of requests that are delayed by tail_latency on top, a slow tail for hedging.
+    tail_latency : float
+        Extra delay in seconds of the slow requests.
+    model_latency : dict
+        Extra delay in seconds per requested model name, e.g. a slower large model.
+    dimension : int
+        Length of the returned embeddings.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, dimension: int = 1536, seed: int = 0, tail_rate: float = 0.0, tail_latency: float = 0.0,
+                 model_latency: Dict[str, float] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.model_latency = model_latency or {}
+        self.dimension = dimension
+        self.stats = MockStats()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _draw(self) -> float:
+        with self._random_lock:
+            return self._random.random()
+
+    def _delay(self, model: str = None) -> None:
+        delay = self.latency + self.jitter * self._draw() + self.model_latency.get(model, 0.0)
+        if self.tail_rate and self._draw() < self.tail_rate:
+            delay += self.tail_latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def _chat_reply(self, body: dict) -> str:
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        if body.get("max_tokens", 1000) <= 10:
+            # AoT evaluate_states asks for a bare float
+            return str(int(digest[:4], 16) % 101)
+        # Sampled calls vary from call to call, greedy ones depend on the prompt only
+        salt = f"{self._draw():.6f}" if body.get("temperature", 0) else ""
+        variant = hashlib.sha1((digest + salt).encode("utf-8")).hexdigest()[:8]
+        return f"###STEP### mock reasoning {variant}: split the problem and check the partial result."
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+                else:
+                    self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                server._delay(body.get("model"))
+                if server.error_rate and server._draw() < server.error_rate:
+                    server.stats.add("errors")
+                    self._send_json(500, {"error": {"message": "mock server error", "type": "server_error"}})
+                    return
+                if self.path.endswith("/chat/completions"):
+                    self._chat(body)
+                elif self.path.endswith("/embeddings"):
+                    self._embeddings(body)
+                else:
+                    self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+            def _chat(self, body: dict):
+                reply = server._chat_reply(body)
+                prompt_tokens = sum(count_tokens(message.get("content", "")) for message in body.get("messages", []))
+                completion_tokens = count_tokens(reply)
+                model = body.get("model", "mock")
+                server.stats.add("chat", prompt_tokens, completion_tokens, model=model)
+                if body.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    chunks = [{"role": "assistant"}] + [{"content": word + " "} for word in reply.split()] + [{}]
+                    for delta in chunks:
+                        event = {"id": "mock", "object": "chat.completion.chunk", "model": model,
+                                 "choices": [{"index": 0, "delta": delta, "finish_reason": None if delta else "stop"}]}
+                        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.close_connection = True
+                    return
+                self._send_json(200, {
+                    "id": "mock", "object": "chat.completion", "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens},
+                })
+
+            def _embeddings(self, body: dict):
+                inputs = body.get("input", [])
+                if isinstance(inputs, str):
+                    inputs = [inputs]
+                prompt_tokens = sum(count_tokens(text) for text in inputs)
+                server.stats.add("embeddings", prompt_tokens)
+                self._send_json(200, {
+                    "object": "list", "model": body.get("model", "mock"),
+                    "data": [{"object": "embedding", "index": i, "embedding": text_embedding(text, server.dimension)}
+                             for i, text in enumerate(inputs)],
+                    "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+                })
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--tail-rate", type=float, default=0.0)
+    parser.add_argument("--tail-latency", type=float, default=0.0)
+    args = parser.parse_args()
+    server = MockOpenAIServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.dimension,
+                              tail_rate=args.tail_rate, tail_latency=args.tail_latency)
+    print(f"Mock OpenAI server listening on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+"""
+Benchmark suite
+---------------
+Runs the framework against a local mock OpenAI server (benchmarks/mockServer.py),
+so no API keys or network are needed, and stores the results as JSON.
+
+Suites:
+    aot_solve        AoTAgent.solve end-to-end latency, LLM calls and tokens per solve
+    aot_cascade      AoTAgent.solve with one large model against per-role models and a scoring cascade
+    aot_concurrent_dfs  AoTAgent.solve with sibling subtrees explored sequentially against concurrently
+    batch_solve      AoTBatchSolver tasks/sec, sequential against concurrent
+    evaluate_states  AlgorithmModelProcesses.evaluate_states throughput
+    embeddings       TextEmbeddings ingestion rows/sec
+    retrieval        LocalVectorStore query QPS
+    quantized_retrieval  QuantizedVectorStore int8 and product quantized QPS, recall@10 and compression
+    pinecone_pool    Pinecone wrapper startup per worker on FakePinecone, fresh connections against pooled
+    router           RouterModel tail latency over three mock endpoints, direct against hedged, and failover
+    tracing          Cost of a span with tracing off and on, and AoTAgent.solve traced against untraced
+    pdf_parser       PDFParser.breakdown_document pages/sec on a generated PDF
+
+Usage:
+    python benchmarks/runBenchmarks.py --output results.json
+    python benchmarks/runBenchmarks.py --output new.json --compare results.json --tolerance 0.15
+    python benchmarks/runBenchmarks.py --suites tracing --trace aot_trace.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from mockServer import MockOpenAIServer
+
+# Metrics with these suffixes improve when they go up, every other numeric metric improves when it goes down
+HIGHER_IS_BETTER = ("_per_sec", "_qps", "speedup", "_recall_at_10", "_compression")
+
+TASK = "If (A-B) = [1,5,7,8], (B-A) = [2,10], and (A∩B) = [3,6,9], Find the set B."
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the framework's progress printing and info logging while timing"""
+    loggers = [logging.getLogger(name) for name in list(logging.root.manager.loggerDict) if name.startswith("framework")]
+    levels = [logger.level for logger in loggers]
+    for logger in loggers:
+        logger.setLevel(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        for logger, level in zip(loggers, levels):
+            logger.setLevel(level)
+
+def mock_server(args) -> MockOpenAIServer:
+    return MockOpenAIServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, dimension=args.dimension)
+
+def bench_aot_solve(args) -> dict:
+    from framework.agents.AlgorithmOfThought.AoTAgent import AoTAgent
+    latencies = []
+    with mock_server(args) as server, quiet():
+        for i in range(args.solves):
+            agent = AoTAgent(api_key="mock", api_base=server.base_url, num_thoughts=2, max_steps=3,
+                             pruning_threshold=50, value_threshold=80, initial_prompt=f"{TASK} (run {i})")
+            start = time.perf_counter()
+            agent.solve()
+            latencies.append(time.perf_counter() - start)
+        stats = server.stats.snapshot()
+    solves = len(latencies)
+    return {
+        "latency_mean_s": statistics.mean(latencies),
+        "latency_p50_s": percentile(latencies, 50),
+        "latency_p95_s": percentile(latencies, 95),
+        "llm_calls_per_solve": stats["calls"]["chat"] / solves,
+        "prompt_tokens_per_solve": stats["prompt_tokens"] / solves,
+        "completion_tokens_per_solve": stats["completion_tokens"] / solves,
+        "config": {"solves": solves, "num_thoughts": 2, "max_steps": 3},
+    }
+
+def bench_aot_cascade(args) -> dict:
+    from framework.agents.AlgorithmOfThought.AoTAgent import AoTAgent
+    from framework.models.Cascade import CascadePolicy
+    metrics = {}
+    # The large model answers ten times slower than the small one
+    with MockOpenAIServer(latency=args.latency, jitter=args.jitter, model_latency={"large": args.latency * 9}) as server, quiet():
+        for label in ("single", "cascade"):
+            server.stats.reset()
+            latencies = []
+            for i in range(args.solves):
+                options = {} if label == "single" else {"role_models": {"generate": "large", "evaluate": "large", "solve": "large"},
+                                                        "cascade": CascadePolicy(small="small", samples=2)}
+                agent = AoTAgent(api_key="mock", api_base=server.base_url, model="large", num_thoughts=2, max_steps=3,
+                                 pruning_threshold=50, value_threshold=80, initial_prompt=f"{TASK} (run {i})", **options)
+                start = time.perf_counter()
+                agent.solve()
+                latencies.append(time.perf_counter() - start)
+            stats = server.stats.snapshot()
+            metrics[f"{label}_latency_mean_s"] = statistics.mean(latencies)
+            metrics[f"{label}_large_calls_per_solve"] = stats["models"].get("large", 0) / len(latencies)
+            metrics[f"{label}_small_calls_per_solve"] = stats["models"].get("small", 0) / len(latencies)
+    metrics["config"] = {"solves": args.solves, "num_thoughts": 2, "max_steps": 3}
+    return metrics
+
+def bench_aot_concurrent_dfs(args) -> dict:
+    from framework.agents.AlgorithmOfThought.AoTAgent import AoTAgent
+    metrics = {}
+    for label, options in (("sequential", {}), ("concurrent", {"concurrent_subtrees": args.concurrency})):
+        # A fresh server per mode, so both draw the same sampled thoughts as long as they make the same calls
+        with mock_server(args) as server, quiet():
+            latencies = []
+            wasted = 0
+            for i in range(args.solves):
+                agent = AoTAgent(api_key="mock", api_base=server.base_url, num_thoughts=3, max_steps=3,
+                                 pruning_threshold=20, value_threshold=40, initial_prompt=f"{TASK} (run {i})", **options)
+                start = time.perf_counter()
+                agent.solve()
+                latencies.append(time.perf_counter() - start)
+                if agent.subtree_scheduler is not None:
+                    wasted += agent.subtree_scheduler.stats()["wasted_calls"]
+            metrics[f"{label}_latency_mean_s"] = statistics.mean(latencies)
+            metrics[f"{label}_llm_calls_per_solve"] = server.stats.snapshot()["calls"]["chat"] / len(latencies)
+    metrics["wasted_calls_per_solve"] = wasted / len(latencies)
+    metrics["speedup"] = metrics["sequential_latency_mean_s"] / metrics["concurrent_latency_mean_s"]
+    metrics["config"] = {"solves": args.solves, "num_thoughts": 3, "max_steps": 3, "concurrent_subtrees": args.concurrency}
+    return metrics
+
+def bench_batch_solve(args) -> dict:
+    from framework.agents.AlgorithmOfThought.batchSolver import AoTBatchSolver
+    tasks = [f"{TASK} (task {i})" for i in range(args.tasks)]
+    metrics = {}
+    with mock_server(args) as server, quiet():
+        for concurrency in (1, args.concurrency):
+            solver = AoTBatchSolver(api_key="mock", api_base=server.base_url, max_concurrent_tasks=concurrency,
+                                    max_in_flight=concurrency * 2, num_thoughts=2, max_steps=3,
+                                    pruning_threshold=50, value_threshold=80)
+            start = time.perf_counter()
+            results = list(solver.solve_iter(tasks))
+            elapsed = time.perf_counter() - start
+            errors = [result for result in results if result.error is not None]
+            if errors:
+                raise RuntimeError(f"{len(errors)} batch task(s) failed, first: {errors[0].error!r}")
+            label = "sequential" if concurrency == 1 else "concurrent"
+            metrics[f"{label}_tasks_per_sec"] = len(tasks) / elapsed
+    metrics["speedup"] = metrics["concurrent_tasks_per_sec"] / metrics["sequential_tasks_per_sec"]
+    metrics["config"] = {"tasks": len(tasks), "concurrency": args.concurrency}
+    return metrics
+
+def bench_evaluate_states(args) -> dict:
+    from framework.agents.AlgorithmOfThought.modelProcesses import AlgorithmModelProcesses
+    states = [f"###STEP 1### candidate step {i}: subtract the known sets" for i in range(args.states)]
+    with mock_server(args) as server, quiet():
+        model = AlgorithmModelProcesses('OpenAI')
+        model.LLM.set_api_info(base_api_key="mock", base_url=server.base_url)
+        start = time.perf_counter()
+        values = model.evaluate_states(states=states, initial_prompt=TASK, previous_score=None, current_step=1)
+        elapsed = time.perf_counter() - start
+    return {"states_per_sec": len(states) / elapsed, "config": {"states": len(states), "scored": len(values)}}
+
+def bench_embeddings(args) -> dict:
+    from framework.blocks.knowledge.embeddings.OpenAIEmbeddings import TextEmbeddings
+    rows = {f"topic {i}": f"chunk {i} " + "lorem ipsum dolor sit amet " * 20 for i in range(args.rows)}
+    with mock_server(args) as server, quiet(), tempfile.TemporaryDirectory() as tmp:
+        embeddings = TextEmbeddings(base_api_key="mock", base_url=server.base_url, useOpenAIBase=False)
+        start = time.perf_counter()
+        embeddings.dict_to_embeds_csv(data_dict=rows, output_path=os.path.join(tmp, "embeds.csv"))
+        elapsed = time.perf_counter() - start
+    return {"rows_per_sec": len(rows) / elapsed, "config": {"rows": len(rows), "dimension": args.dimension}}
+
+def bench_router(args) -> dict:
+    from framework.models.Router import RouterModel
+    # Two endpoints with a slow tail and one that always fails
+    servers = [MockOpenAIServer(latency=args.latency, jitter=args.jitter, tail_rate=0.02, tail_latency=args.latency * 20, seed=seed)
+               for seed in (1, 2)] + [MockOpenAIServer(error_rate=1.0)]
+    metrics = {}
+    with contextlib.ExitStack() as stack, quiet():
+        for server in servers:
+            stack.enter_context(server)
+        for label, hedge in (("direct", False), ("hedged", True)):
+            llm = RouterModel([server.base_url for server in servers], model="mock", api_key="mock", hedge=hedge, cooldown=60)
+            latencies = []
+            for i in range(args.router_calls):
+                start = time.perf_counter()
+                llm.run(query=f"{TASK} (call {i})", max_tokens=10)
+                latencies.append(time.perf_counter() - start)
+            llm.close()
+            stats = llm.stats()
+            metrics[f"{label}_latency_p50_s"] = percentile(latencies, 50)
+            metrics[f"{label}_latency_p99_s"] = percentile(latencies, 99)
+            metrics[f"{label}_extra_calls_per_call"] = (stats["hedged"] + stats["failovers"]) / len(latencies)
+    metrics["config"] = {"calls": args.router_calls, "endpoints": len(servers), "tail_rate": 0.02}
+    return metrics
+
+def bench_retrieval(args) -> dict:
+    from framework.blocks.knowledge.vectorStores.LocalVectorStore import LocalVectorStore
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, args.dimension)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+    store = LocalVectorStore(dimension=args.dimension)
+    start = time.perf_counter()
+    store.upsert(vectors=[(str(i), vector, {"content": f"chunk {i}"}) for i, vector in enumerate(vectors)])
+    upsert_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for query in queries:
+        store.query(vector=query, top_k=10, include_metadata=True)
+    elapsed = time.perf_counter() - start
+    return {
+        "upsert_rows_per_sec": len(vectors) / upsert_elapsed,
+        "query_qps": len(queries) / elapsed,
+        "config": {"vectors": len(vectors), "queries": len(queries), "top_k": 10, "dimension": args.dimension},
+    }
+
+def bench_quantized_retrieval(args) -> dict:
+    from framework.blocks.knowledge.vectorStores.LocalVectorStore import LocalVectorStore
+    from framework.blocks.knowledge.vectorStores.QuantizedVectorStore import QuantizedVectorStore, recall_at_k
+    rng = np.random.default_rng(0)
+    # Clustered vectors, uniform noise has no neighbourhood structure for recall to measure
+    centers = rng.standard_normal((64, args.dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, 64, args.vectors)] + 0.5 * rng.standard_normal((args.vectors, args.dimension)).astype(np.float32)
+    queries = centers[rng.integers(0, 64, args.queries)] + 0.5 * rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+    rows = [(str(i), vector, {"content": f"chunk {i}"}) for i, vector in enumerate(vectors)]
+    exact = LocalVectorStore(dimension=args.dimension, initial_capacity=len(rows))
+    exact.upsert(vectors=rows)
+    float32_bytes = args.dimension * 4
+    # About 8 dimensions per subvector like the 1536/192 default, n_subvectors has to divide the dimension
+    n_subvectors = next(n for n in range(max(args.dimension // 8, 1), 0, -1) if args.dimension % n == 0)
+    results = {}
+    for name, options in (("int8", {"quantizer": "int8"}),
+                          ("pq", {"quantizer": "pq", "n_subvectors": n_subvectors, "max_train": 5000}),
+                          ("pq_rerank", {"quantizer": "pq", "n_subvectors": n_subvectors, "max_train": 5000, "rerank": True})):
+        store = QuantizedVectorStore(dimension=args.dimension, initial_capacity=len(rows), **options)
+        store.upsert(vectors=rows)
+        start = time.perf_counter()
+        for query in queries:
+            store.query(vector=query, top_k=10)
+        elapsed = time.perf_counter() - start
+        results[f"{name}_query_qps"] = len(queries) / elapsed
+        results[f"{name}_recall_at_10"] = recall_at_k(store, exact, queries, top_k=10)
+        results[f"{name}_compression"] = float32_bytes * len(rows) / store.nbytes()["codes"]
+    results["config"] = {"vectors": len(rows), "queries": len(queries), "top_k": 10, "dimension": args.dimension, "n_subvectors": n_subvectors}
+    return results
+
+def write_synthetic_pdf(path: str, sections: int, pages_per_section: int) -> int:
+    """Write a PDF with one bookmark per section and a few lines of text per page, returns the page count"""
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    page_number = 0
+    for section in range(sections):
+        for page_in_section in range(pages_per_section):
+            page = writer.add_blank_page(612, 792)
+            page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+            lines = [f"Section {section}"] if page_in_section == 0 else []
+            lines += [f"line {line} of page {page_number} explains monte carlo tree search and planning" for line in range(40)]
+            text = " T* ".join(f"({line}) Tj" for line in lines)
+            content = DecodedStreamObject()
+            content.set_data(f"BT /F1 9 Tf 11 TL 40 760 Td {text} ET".encode("latin-1"))
+            page[NameObject("/Contents")] = writer._add_object(content)
+            if page_in_section == 0:
+                writer.add_outline_item(f"Section {section}", page_number)
+            page_number += 1
+    with open(path, "wb") as f:
+        writer.write(f)
+    return page_number
+
+def bench_pinecone_pool(args) -> dict:
+    from framework.blocks.knowledge.vectorStores.FakePinecone import FakePinecone
+    from framework.blocks.knowledge.vectorStores.Pinecone import Pinecone
+    from framework.blocks.knowledge.vectorStores.PineconePool import PineconePool
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.rows, 64)).astype(np.float32)
+    metrics = {}
+    # Control plane calls (init, whoami, list_indexes) are much slower than queries
+    service = FakePinecone(latency=args.latency, control_latency=args.latency * 20)
+    with quiet():
+        Pinecone(api_key="bench", index_name="bench", dimension=64, pool=PineconePool(client=service)).upsert(
+            [(str(i), vector.tolist(), {}) for i, vector in enumerate(vectors)])
+        shared = PineconePool(client=service)
+        for label in ("fresh", "pooled"):
+            start = time.perf_counter()
+            for worker in range(args.concurrency):
+                # fresh builds every wrapper's connection from scratch, as before the pool
+                pool = PineconePool(client=service) if label == "fresh" else shared
+                store = Pinecone(api_key="bench", index_name="bench", dimension=64, pool=pool)
+                store.query(vector=vectors[worker].tolist(), top_k=5)
+            metrics[f"{label}_startup_s_per_worker"] = (time.perf_counter() - start) / args.concurrency
+    metrics["speedup"] = metrics["fresh_startup_s_per_worker"] / metrics["pooled_startup_s_per_worker"]
+    metrics["config"] = {"workers": args.concurrency, "rows": args.rows, "dimension": 64}
+    return metrics
+
+def bench_pdf_parser(args) -> dict:
+    from framework.blocks.knowledge.documentParsers.DocumentParser import PDFParser
+    with tempfile.TemporaryDirectory() as tmp, quiet():
+        path = os.path.join(tmp, "synthetic.pdf")
+        pages = write_synthetic_pdf(path, sections=args.sections, pages_per_section=3)
+        start = time.perf_counter()
+        chunks = PDFParser.breakdown_document(path, max_tokens=500)
+        elapsed = time.perf_counter() - start
+    return {"pages_per_sec": pages / elapsed, "config": {"pages": pages, "chunks": len(chunks)}}
+
+def bench_tracing(args) -> dict:
+    from framework.agents.AlgorithmOfThought.AoTAgent import AoTAgent
+    from framework.tracing.Tracer import Tracer, disable_tracing, enable_tracing, span
+    spans = 200000
+    metrics = {}
+    for label in ("disabled", "enabled"):
+        tracer = enable_tracing(Tracer(max_spans=spans)) if label == "enabled" else disable_tracing()
+        start = time.perf_counter()
+        for i in range(spans):
+            with span("bench", step=i):
+                pass
+        metrics[f"{label}_span_ns"] = (time.perf_counter() - start) / spans * 1e9
+        disable_tracing()
+    with mock_server(args) as server, quiet():
+        for label in ("untraced", "traced"):
+            tracer = enable_tracing() if label == "traced" else None
+            latencies = []
+            for i in range(args.solves):
+                agent = AoTAgent(api_key="mock", api_base=server.base_url, num_thoughts=2, max_steps=3,
+                                 pruning_threshold=50, value_threshold=80, initial_prompt=f"{TASK} (run {i})")
+                start = time.perf_counter()
+                agent.solve()
+                latencies.append(time.perf_counter() - start)
+            disable_tracing()
+            metrics[f"{label}_latency_mean_s"] = statistics.mean(latencies)
+    metrics["spans_per_solve"] = len(tracer.spans()) / args.solves
+    if args.trace:
+        tracer.export_chrome(args.trace)
+        print(f"  trace written to {args.trace}")
+    metrics["config"] = {"spans": spans, "solves": args.solves, "num_thoughts": 2, "max_steps": 3}
+    return metrics
+
+SUITES = {
+    "aot_solve": bench_aot_solve,
+    "aot_cascade": bench_aot_cascade,
+    "aot_concurrent_dfs": bench_aot_concurrent_dfs,
+    "batch_solve": bench_batch_solve,
+    "evaluate_states": bench_evaluate_states,
+    "embeddings": bench_embeddings,
+    "retrieval": bench_retrieval,
+    "router": bench_router,
+    "tracing": bench_tracing,
+    "quantized_retrieval": bench_quantized_retrieval,
+    "pinecone_pool": bench_pinecone_pool,
+    "pdf_parser": bench_pdf_parser,
+}
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Print the change of every metric against a baseline, return the regressions beyond tolerance"""
+    regressions = []
+    for suite, metrics in results["results"].items():
+        previous = baseline.get("results", {}).get(suite)
+        if not previous:
+            continue
+        for name, value in metrics.items():
+            old = previous.get(name)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old == 0:
+                continue
+            change = (value - old) / abs(old)
+            worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+            flag = "REGRESSION" if worse > tolerance else ""
+            print(f"{suite}.{name:<30} {old:12.4f} -> {value:12.4f} ({change:+.1%}) {flag}")
+            if flag:
+                regressions.append(f"{suite}.{name}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the framework benchmarks against a local mock server")
+    parser.add_argument("--suites", default=",".join(SUITES), help="comma separated suites to run")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="relative change counted as a regression")
+    parser.add_argument("--latency", type=float, default=0.005, help="mock server base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.002, help="mock server random extra latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock requests that fail")
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--solves", type=int, default=3)
+    parser.add_argument("--tasks", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--states", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--router-calls", type=int, default=500)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--trace", help="write the Chrome trace of the traced solves of the tracing suite to this file")
+    args = parser.parse_args()
+
+    # Keep the model's retry back-off short against the mock server
+    os.environ.setdefault("OPENAI_RATE_TIMEOUT", "0.05")
+    # The mock server runs offline, where tiktoken may not be able to fetch its encoding
+    os.environ.setdefault("TOKEN_COUNTER_APPROXIMATE", "1")
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "mock": {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate},
+        },
+        "results": {},
+    }
+    for name in [suite.strip() for suite in args.suites.split(",") if suite.strip()]:
+        if name not in SUITES:
+            parser.error(f"unknown suite {name}, choose from {', '.join(SUITES)}")
+        print(f"Running {name}...", flush=True)
+        results["results"][name] = SUITES[name](args)
+        metrics = {key: value for key, value in results["results"][name].items() if key != "config"}
+        print("  " + ", ".join(f"{key}={value:.4g}" for key, value in metrics.items()), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,22 @@
 from framework.agents.AlgorithmOfThought.modelProcesses import AlgorithmModelProcesses
+from framework.agents.AlgorithmOfThought.bestThoughts import BestThoughtTracker
+from framework.agents.AlgorithmOfThought.graphVisualizer import GraphExporter, GraphSnapshot
+from framework.agents.AlgorithmOfThought.runJournal import RunJournal
+from framework.agents.AlgorithmOfThought.subtreeScheduler import SearchStopped, SubtreeScheduler
+from framework.agents.AlgorithmOfThought.thoughtDedup import ThoughtDeduplicator
+from framework.agents.AlgorithmOfThought.workerFarm import WorkerFarm
+from framework.models.Models import ModelBase
+from framework.models.ResponseCache import ResponseCache
+from framework.models.Cascade import CascadePolicy
+from framework.tracing.Tracer import annotate, span, traced
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import copy
 import json
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Callable
 from termcolor import colored
 
-import networkx as nx
-import matplotlib.pyplot as plt
-import pygraphviz as pgv
-from networkx.drawing.nx_agraph import graphviz_layout
-
 import logging
+import os
 import traceback
 
 class CustomLogger(logging.Logger):
@@ -25,16 +33,19 @@ logger.setLevel(logging.INFO)
 c_handler = logging.StreamHandler()
 c_handler.encoding = 'utf-8'  # Set encoding to utf-8 for console handler
 
-f_handler = logging.FileHandler('file.log', encoding='utf-8')  # Set encoding to utf-8 for file handler
+# Logs also go to the file named by AOT_LOG_FILE, there is no log file unless it is set
+log_file = os.getenv("AOT_LOG_FILE")
+f_handler = logging.FileHandler(log_file, encoding='utf-8', delay=True) if log_file else None
 
 # Create formatters and add it to handlers
 format = logging.Formatter('%(name)s - %(message)s - %(lineno)d')
 c_handler.setFormatter(format)
-f_handler.setFormatter(format)
 
 # Add handlers to the logger
 logger.addHandler(c_handler)
-logger.addHandler(f_handler)
+if f_handler is not None:
+    f_handler.setFormatter(format)
+    logger.addHandler(f_handler)
 
 # Define constants
 PRUNING_THRESHOLD = 0.5
@@ -76,6 +87,62 @@ class AoTAgent():
         The initial prompt to start the Agent with.
     thought_cache : dict
         The cache to use for the Agent.
+    graph_exporter : GraphExporter
+        Optional exporter that writes the search tree in the background once a solution is found.
+        Visualization is off by default so solve() never blocks on layout or drawing.
+    journal : RunJournal
+        Optional journal recording every prompt, response, score and search checkpoint.
+        In 'replay' mode responses come from the journal instead of the network, in
+        'resume' mode a crashed run is picked up from its journal.
+    llm : ModelBase
+        Optional, already configured model instance to use instead of building one from
+        model_type, model, api_key and api_base. Lets many agents share one pooled client.
+    response_cache : ResponseCache
+        Optional exact-match response cache, can be shared between agents.
+    dedup_threshold : float
+        Optional MinHash similarity from which a new thought is merged into a known
+        near-duplicate and reuses its score and node instead of being evaluated again.
+        Only thoughts with the same numbers, operators and variable names are merged.
+        None, the default, evaluates every distinct thought.
+    thought_embedder : Callable
+        Optional text to embedding function, catches reworded duplicates MinHash misses
+        at the cost of one embedding call per new thought. Needs dedup_threshold.
+    pipelined : bool
+        Evaluate every thought as soon as it is generated and start generating the next
+        step of promising children while their siblings are still being scored, so a step
+        costs about its slowest generation plus one evaluation instead of all of them.
+        Prefetched generations see the accepted thoughts as of their submission.
+    max_workers : int
+        Threads of the pipelined mode, num_thoughts * (num_thoughts + 1) by default.
+    role_models : dict
+        Models per role, 'generate', 'evaluate' and 'solve', as instances or model names
+        on the same endpoint (through llm.with_model). Roles left out use model.
+    cascade : CascadePolicy
+        Optional policy scoring thoughts with a small model first and escalating to the
+        evaluate model only when its scores are missing, inconsistent or close to the
+        pruning or value threshold.
+    farm : WorkerFarm
+        Optional worker farm running the generations, evaluations and solution of this
+        search on its worker processes. The farm's model settings are used instead of
+        model_type, model, api_key, api_base, llm and role_models.
+    solution_alternatives : int
+        Besides the best path, show the solution prompt this many runner-up paths (the
+        next best accepted thought of every step). 0 keeps the prompt as it was.
+    concurrent_subtrees : int
+        Explore this many sibling subtrees at once, see SubtreeScheduler. dfs still walks
+        the tree in order and only uses the explorers' model calls, so with a replayed
+        journal the search ends exactly as a sequential one. Explorers see the accepted
+        thoughts as of when they started. 0 searches sequentially, can't be combined with
+        pipelined. Explorers spend extra model calls. Their prompts carry older context,
+        so their answers, and with a sampling model the tree, can differ from a
+        sequential run. Wrong guesses are counted in subtree_scheduler.stats()
+        ["wasted_calls"]. Only worth it when model calls take tens of milliseconds or
+        more.
+    speculative_calls : int
+        Calls the explorers may make per search, 8 per concurrent subtree when None.
+    speculation_min_latency : float
+        Mean seconds per model call below which no explorer is started. Faster models
+        leave nothing to overlap, and speculation would only add calls.
 
     Returns
     -------
@@ -93,6 +160,10 @@ class AoTAgent():
     backtracking_threshold: float
     initial_prompt: str
     thought_cache: Dict[str, Any]
+    graph_exporter: GraphExporter
+    graph_export: Future
+    journal: RunJournal
+    deduplicator: ThoughtDeduplicator
         
     def __init__(
         self,
@@ -107,8 +178,25 @@ class AoTAgent():
         initial_prompt: str = None,
         thought_cache: Dict[str, Any] = None,
         valid_retry_count: int = 1,
+        graph_exporter: GraphExporter = None,
+        journal: RunJournal = None,
+        llm: ModelBase = None,
+        response_cache: ResponseCache = None,
+        dedup_threshold: float = None,
+        thought_embedder: Callable[[str], List[float]] = None,
+        pipelined: bool = False,
+        max_workers: int = None,
+        role_models: Dict[str, Any] = None,
+        cascade: CascadePolicy = None,
+        farm: WorkerFarm = None,
+        solution_alternatives: int = 0,
+        concurrent_subtrees: int = 0,
+        speculative_calls: int = None,
+        speculation_min_latency: float = 0.02,
     ):
         """Init method for AoT"""
+        if pipelined and concurrent_subtrees:
+            raise ValueError("pipelined and concurrent_subtrees can't be combined, choose one")
         if thought_cache is None:
             self.thought_cache = {"accepted": {}, "pruned": {}}
         else:
@@ -120,74 +208,146 @@ class AoTAgent():
         self.initial_prompt = initial_prompt
         #self.output = []
         
-        self.model = AlgorithmModelProcesses(model_type)
-        self.model.LLM.set_api_info(base_api_key=api_key, base_url=api_base)
-        self.model.LLM.model = model
+        self.journal = journal
+        if farm is not None:
+            # The farm's workers build the prompts and call the model, the search stays here
+            self.model = farm.model_processes(journal=journal)
+        else:
+            self.model = AlgorithmModelProcesses(model_type, journal=journal, llm=llm, response_cache=response_cache)
+        if llm is None and farm is None:
+            self.model.LLM.set_api_info(base_api_key=api_key, base_url=api_base)
+            self.model.LLM.model = model
+        if cascade is not None and cascade.thresholds is None:
+            cascade.thresholds = (pruning_threshold, value_threshold)
+        self.model.set_role_models(role_models, cascade)
         
         self.valid_retry_count = valid_retry_count
         self.evaluated_thoughts = {}
         self.last_state = ""
         self.nodeCount = 0
+        # networkx is imported here rather than at module level to keep imports cheap
+        import networkx as nx
         self.graph = nx.DiGraph()  # Add this line to initialize the graph
         
         
-        self.best_thoughts = {} # A dictionary to store the best thoughts per step
+        # Accepted thoughts ranked per step, best_thoughts is its {step: best thought} view
+        self.best_tracker = BestThoughtTracker()
+        self.best_tracker.load(self.thought_cache["accepted"])
+        self.best_thoughts = self.best_tracker.best
+        self.solution_alternatives = solution_alternatives
         self.state_stack = []
+        
+        self.graph_exporter = graph_exporter
+        self.graph_export = None # Future of the last background graph export
+        
+        self.deduplicator = ThoughtDeduplicator(threshold=dedup_threshold, embedder=thought_embedder) if dedup_threshold is not None else None
+        self.duplicate_thoughts = {} # near-duplicate thought -> the known thought it was merged into
+        self.seed_deduplicator()
+        
+        self.pipelined = pipelined
+        self.max_workers = max_workers
+        self._executor = None # created on the first pipelined step
+        self._prefetched = {} # (state, step) -> futures of thoughts generated ahead of dfs reaching them
+        
+        self.concurrent_subtrees = concurrent_subtrees
+        self.speculative_calls = speculative_calls
+        self.speculation_min_latency = speculation_min_latency
+        self.subtree_scheduler = None # created for every search, kept afterwards for its stats
+        self._call_counts = {} # (kind, key) -> times this search asked the scheduler for the call
+        self._explorer = False # True for the copies exploring a subtree ahead of dfs
 
+    @traced("aot.solve")
     def solve(self) -> str:
         """Solve the problem using AoT prompt and dfs search algorithm"""
         try:
-            self.last_state = self.initial_prompt
-            self.graph.add_node(0, state=self.initial_prompt, color='blue')
-            #self.graph.add_node(self.nodeCount, state=self.initial_prompt)
-            #self.nodeCount += 1
-            # Run DFS
-            self.dfs(self.initial_prompt, 1)
+            checkpoint = self.journal.last_checkpoint() if self.journal is not None and self.journal.mode == "resume" else None
+            if checkpoint is not None and checkpoint["phase"] in ("searched", "solved"):
+                # The search finished before the crash, restore it instead of searching again
+                self.restore_checkpoint(checkpoint)
+            else:
+                # A partial search is redone from the root, the journal serves the calls it already made
+                self.last_state = self.initial_prompt
+                self.graph.add_node(0, state=self.initial_prompt, color='blue')
+                if self.concurrent_subtrees:
+                    self.subtree_scheduler = SubtreeScheduler(self.concurrent_subtrees, self.speculative_calls, self.speculation_min_latency)
+                    self._call_counts = {}
+                #self.graph.add_node(self.nodeCount, state=self.initial_prompt)
+                #self.nodeCount += 1
+                # Run DFS
+                self.dfs(self.initial_prompt, 1)
 
-            self.get_best_thoughts_per_step()
+                self.get_best_thoughts_per_step()
+                self.checkpoint("searched")
             
-            # Generate the final solution based on the best thought
-            solution = self.model.generate_solution(initial_prompt=self.initial_prompt, best_steps=self.best_thoughts, rejected_solutions=self.thought_cache["pruned"])
+            if checkpoint is not None and checkpoint["phase"] == "solved":
+                solution = checkpoint["solution"]
+            else:
+                # Generate the final solution based on the best thought
+                alternatives = self.best_tracker.alternative_paths(self.solution_alternatives + 1)[1:] if self.solution_alternatives else None
+                solution = self.model.generate_solution(initial_prompt=self.initial_prompt, best_steps=self.best_thoughts, rejected_solutions=self.thought_cache["pruned"],
+                                                        alternatives=alternatives)
+                self.checkpoint("solved", solution=solution)
 
             # Display and return the solution
             logger.info(f"Solution is {solution}")
 
-            '''
-            # Write cache to JSON file
-            with open("./thought_cache.json", "a") as json_file:
-                json.dump(self.thought_cache, json_file)'''
-            # Draw the graph at the end of the solve method
-           # pos = nx.spring_layout(self.graph, scale=10)  # This will calculate the positions of the nodes
-            print(self.graph.edges(data=True))
-            #labels = {node: data['state'] for node, data in self.graph.nodes(data=True)}
-            #T = nx.dfs_tree(self.graph, source=0)  # This will create a tree from the graph
-            nodes = self.graph.nodes(data=True)
-            node_colors = [node['color'] for _, node in nodes]
-            edges = self.graph.edges(data=True)
-            edge_colors = [edge['color'] for _, _, edge in edges]
-            pos = graphviz_layout(self.graph, prog='dot')
-            try:
-                nx.draw(self.graph, pos, with_labels=True, arrows=True, node_color=node_colors, edge_color=edge_colors)   
-                plt.show() 
-            except Exception as e :
-                print(e) 
-            ''' try:
-                nx.draw(self.graph, labels=labels, with_labels=True)
-                plt.show()
-            except Exception as e:
-                print(e)'''
+            # Hand the graph to the exporter, it is written in the background so the solution returns now
+            if self.graph_exporter is not None:
+                self.graph_export = self.graph_exporter.export(self.graph)
             return solution
 
         except Exception as error:
             logger.error(f"Error in AoT_dfs: {error}")
-
-            '''
-            # Write cache to JSON file even if an error occurs
-            with open("./thought_cache_error.json", "a") as json_file:
-                json.dump(self.thought_cache, json_file)'''
+            # Make sure everything up to the failure is in the journal so the run can be resumed
+            if self.journal is not None:
+                try:
+                    self.journal.flush()
+                except Exception as journal_error:
+                    logger.error(f"Journal flush failed too: {journal_error!r}")
 
             raise error
+        
+        finally:
+            self.shutdown_executor()
 
+    @traced("aot.checkpoint")
+    def checkpoint(self, phase: str, **extra) -> None:
+        """Write a copy of the search state to the journal, a no-op without one"""
+        if self.journal is None:
+            return
+        graph = GraphSnapshot(self.graph)
+        self.journal.checkpoint(phase, {
+            "initial_prompt": self.initial_prompt,
+            "thought_cache": json.loads(json.dumps(self.thought_cache)),
+            "evaluated_thoughts": dict(self.evaluated_thoughts),
+            "best_thoughts": {str(step): dict(best) for step, best in self.best_thoughts.items()},
+            "node_count": self.nodeCount,
+            "nodes": graph.nodes,
+            "edges": graph.edges,
+            **extra,
+        })
+        
+    def restore_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        """Load the search state from a journal checkpoint"""
+        self.thought_cache = checkpoint["thought_cache"]
+        self.evaluated_thoughts = dict(checkpoint["evaluated_thoughts"])
+        # Ranked again from the restored accepted thoughts, the checkpoint's best_thoughts is the same view
+        self.best_tracker.load(self.thought_cache["accepted"])
+        self.nodeCount = checkpoint["node_count"]
+        self.graph.clear()
+        self.graph.add_nodes_from((node, data) for node, data in checkpoint["nodes"])
+        self.graph.add_edges_from((u, v, data) for u, v, data in checkpoint["edges"])
+        self.last_state = self.initial_prompt
+        self.seed_deduplicator()
+        
+    def seed_deduplicator(self) -> None:
+        """Register the thoughts already in the cache, e.g. a shared or restored one"""
+        if self.deduplicator is None:
+            return
+        self.deduplicator.clear()
+        for thought in list(self.thought_cache["accepted"]) + list(self.thought_cache["pruned"]):
+            self.deduplicator.add(thought)
+        
     def check_cache(self, state: str) -> float:
         """Check if the state is in the cache and return the corresponding value"""
         if state in self.thought_cache["accepted"]:
@@ -200,12 +360,14 @@ class AoTAgent():
             value = None
         return value
             
+    @traced("aot.dfs")
     def dfs(self, state: str, step: int) -> None:
         """Depth-first search algorithm"""
         if step > self.max_steps:
             return
         
         state_node_count = self.get_node_number_from_state(state) if self.get_node_number_from_state(state) != None else self.nodeCount
+        annotate(step=step, node=state_node_count)
         retry_count = 0
         
         # Push the current state onto the stack
@@ -218,8 +380,12 @@ class AoTAgent():
             if any(self.evaluated_thoughts[thought] > self.value_threshold for thought in thoughts):
                 break
             retry_count += 1
+        
+        if self.subtree_scheduler is not None and step < self.max_steps:
+            self.explore_ahead(thoughts, step)
             
         print(colored("Step: " + str(step), "red"))
+        previous_state = state  # backtrack target of a pruned thought once the stack is empty
         for next_state in thoughts:
             next_state_value = self.evaluated_thoughts.get(next_state)
                 
@@ -228,6 +394,7 @@ class AoTAgent():
                 self.thought_cache["pruned"][next_state] = next_state_value
                 if next_state in self.thought_cache["accepted"]:
                     del self.thought_cache["accepted"][next_state]
+                self.best_tracker.discard(next_state)
                     
                 print(colored(f"Pruned thought under {self.value_threshold}: value: {next_state_value}", "red"))  
                 # Add the pruned thought to the graph with a different color
@@ -260,40 +427,200 @@ class AoTAgent():
             self.dfs(state, step + 1)
             
 
+    @traced("aot.expand")
     def generate_and_filter_thoughts(self, state: str, last_score: float, current_step: int) -> List[str]:
         """Generate and filter thoughts"""
+        if self.pipelined:
+            return self.generate_and_filter_thoughts_pipelined(state, last_score, current_step)
         state_node_count = self.get_node_number_from_state(state) if self.get_node_number_from_state(state) != None else self.nodeCount
+        annotate(step=current_step, node=state_node_count)
 
         self.last_state = state
         
-        thoughts = self.model.generate_thoughts(
-                state=state, k=self.num_thoughts, initial_prompt=self.initial_prompt, accepted_solutions=self.thought_cache["accepted"], max_steps=self.max_steps, current_step=current_step
-            )
+        with span("aot.generate_thoughts", step=current_step, node=state_node_count, k=self.num_thoughts):
+            thoughts = self.shared_call("thought", (state, current_step), lambda: self.model.generate_thoughts(
+                    state=state, k=self.num_thoughts, initial_prompt=self.initial_prompt, accepted_solutions=self.thought_cache["accepted"], max_steps=self.max_steps, current_step=current_step
+                ))
         #print(thoughts)
-        for thought in thoughts.copy():
-            #self.add_nodes_and_edge(state_node_count, False, state, self.nodeCount + 1, True, thought)
-            # Check if thoughts for this state are cached
-            cached_value = self.check_cache(thought)
-            if cached_value is not None:
-                print(colored(f"cached state: {thought}, Cached value: {cached_value}", "cyan"))
-                existing_node_number = self.get_node_number_from_state(thought)
-                if existing_node_number is not None:
-                    node_number = existing_node_number
-                else:
-                    raise Exception("Node number not found")
-                    #self.nodeCount += 1
-                    #node_number = self.nodeCount
-                self.graph.add_node(node_number, state=thought, color='purple')
-                self.graph.add_edge(state_node_count, node_number, color='purple')
-                thoughts.remove(thought)
-                
-        self.get_best_thoughts_per_step_no_nodes()
+        thoughts = [thought for thought in thoughts if self.screen_thought(thought, state_node_count)]
         
-        new_evaluations = self.model.evaluate_states(
-            states=thoughts, initial_prompt=self.initial_prompt, previous_score=last_score, current_step=current_step, 
-            previous_best_thoughts=self.best_thoughts
-        )
+        with span("aot.evaluate_states", step=current_step, node=state_node_count, thoughts=len(thoughts)):
+            if self.subtree_scheduler is None:
+                new_evaluations = self.model.evaluate_states(
+                    states=thoughts, initial_prompt=self.initial_prompt, previous_score=last_score, current_step=current_step, 
+                    previous_best_thoughts=self.best_thoughts
+                )
+            else:
+                new_evaluations = self.evaluate_shared(thoughts, last_score, current_step)
+        return self.record_evaluations(thoughts, new_evaluations, state_node_count, current_step)
+    
+    @traced("aot.expand_pipelined")
+    def generate_and_filter_thoughts_pipelined(self, state: str, last_score: float, current_step: int) -> List[str]:
+        """
+        Same result as generate_and_filter_thoughts, but every generated thought is screened
+        and sent to evaluation as soon as it arrives instead of after the slowest generation,
+        and children that will be explored have their next step generated while their
+        siblings are still being scored. Thoughts are returned in generation order, so the
+        search visits them in the same order as the sequential path.
+        """
+        state_node_count = self.get_node_number_from_state(state) if self.get_node_number_from_state(state) != None else self.nodeCount
+
+        self.last_state = state
+        executor = self.get_executor()
+        
+        generations = self._prefetched.pop((state, current_step), None)
+        annotate(step=current_step, node=state_node_count, prefetched=generations is not None)
+        if generations is None:
+            generations = self.model.submit_thoughts(
+                executor, state=state, k=self.num_thoughts, initial_prompt=self.initial_prompt, accepted_solutions=self.thought_cache["accepted"], max_steps=self.max_steps, current_step=current_step
+            )
+        # Evaluations format their prompt on worker threads, give them a copy the search can't change underneath
+        best_thoughts = {step: dict(best) for step, best in self.best_thoughts.items()}
+        
+        order = {future: index for index, future in enumerate(generations)}
+        screened = []
+        evaluations = {}
+        for future in as_completed(generations):
+            thought = future.result()
+            # Screening touches the cache, graph and deduplicator, so it stays on this thread
+            if self.screen_thought(thought, state_node_count):
+                screened.append((order[future], thought))
+                evaluations[executor.submit(self.model.evaluate_state, thought, self.initial_prompt, last_score, current_step, best_thoughts)] = thought
+        
+        new_evaluations = {}
+        for future in as_completed(evaluations):
+            thought, value = evaluations[future], future.result()
+            if value is None:
+                continue
+            new_evaluations[thought] = value
+            # dfs descends into this child next, start generating its step while the siblings are scored.
+            # Its prompt sees the accepted thoughts as of now, without this step's, that is the price of the overlap.
+            if value > self.value_threshold and current_step < self.max_steps and (thought, current_step + 1) not in self._prefetched:
+                self._prefetched[(thought, current_step + 1)] = self.model.submit_thoughts(
+                    executor, state=thought, k=self.num_thoughts, initial_prompt=self.initial_prompt, accepted_solutions=self.thought_cache["accepted"], max_steps=self.max_steps, current_step=current_step + 1
+                )
+        
+        thoughts = [thought for _, thought in sorted(screened)]
+        return self.record_evaluations(thoughts, new_evaluations, state_node_count, current_step)
+    
+    def get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            # A step has up to num_thoughts evaluations and num_thoughts prefetched generations per child in flight
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers or self.num_thoughts * (self.num_thoughts + 1),
+                                                thread_name_prefix="aot")
+        return self._executor
+    
+    def shutdown_executor(self) -> None:
+        """Drop prefetched generations the search never got to and stop the worker threads"""
+        self._prefetched.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.subtree_scheduler is not None and not self._explorer:
+            self.subtree_scheduler.stop()
+    
+    def shared_call(self, kind: str, key: Tuple, function: Callable[[], Any]) -> Any:
+        """
+        function's result, through the subtree scheduler when subtrees are explored
+        concurrently. The call is told apart by kind, key and how often this search asked
+        for it before, as a journal tells apart its responses.
+        """
+        if self.subtree_scheduler is None:
+            return function()
+        if self._explorer and self.subtree_scheduler.stopped.is_set():
+            raise SearchStopped()
+        count = self._call_counts.get((kind, key), 0)
+        self._call_counts[(kind, key)] = count + 1
+        return self.subtree_scheduler.run((kind, key, count), function, speculative=self._explorer)
+    
+    def evaluate_shared(self, thoughts: List[str], last_score: float, current_step: int) -> Dict[str, float]:
+        """evaluate_states one thought at a time, so dfs and the explorers share every evaluation"""
+        new_evaluations = {}
+        for thought in thoughts:
+            value = self.shared_call("evaluate", (thought, current_step), lambda: self.model.evaluate_state(
+                thought, self.initial_prompt, last_score, current_step, self.best_thoughts
+            ))
+            if value is not None:
+                new_evaluations[thought] = value
+        return new_evaluations
+    
+    def explore_ahead(self, thoughts: List[str], step: int) -> None:
+        """Hand the subtrees of the children dfs will descend into after the first to explorers"""
+        children = [thought for thought in thoughts if self.evaluated_thoughts[thought] > self.value_threshold]
+        for child in children[1:]:
+            if self.subtree_scheduler.claim((child, step + 1)):
+                self.subtree_scheduler.explore(self.fork_explorer().dfs, child, step + 1)
+    
+    def fork_explorer(self) -> "AoTAgent":
+        """
+        A copy of the search for exploring a subtree ahead of dfs. It shares the model and
+        the scheduler, but has its own copy of everything dfs changes, and no journal so
+        it never writes checkpoints.
+        """
+        explorer = copy.copy(self)
+        explorer.thought_cache = {name: dict(thoughts) for name, thoughts in self.thought_cache.items()}
+        explorer.evaluated_thoughts = dict(self.evaluated_thoughts)
+        explorer.best_tracker = BestThoughtTracker()
+        explorer.best_tracker.load(explorer.thought_cache["accepted"])
+        explorer.best_thoughts = explorer.best_tracker.best
+        explorer.state_stack = list(self.state_stack)
+        explorer.graph = self.graph.copy()
+        explorer.deduplicator = self.deduplicator.copy() if self.deduplicator is not None else None
+        explorer.duplicate_thoughts = dict(self.duplicate_thoughts)
+        explorer._call_counts = dict(self._call_counts)
+        explorer.journal = None
+        explorer.graph_exporter = None
+        explorer._explorer = True
+        return explorer
+    
+    def screen_thought(self, thought: str, state_node_count: int) -> bool:
+        """
+        True when a generated thought still has to be evaluated. Cached thoughts and
+        near-duplicates of known ones are linked into the graph and reuse their score.
+        """
+        #self.add_nodes_and_edge(state_node_count, False, state, self.nodeCount + 1, True, thought)
+        # Check if thoughts for this state are cached
+        cached_value = self.check_cache(thought)
+        if cached_value is not None:
+            print(colored(f"cached state: {thought}, Cached value: {cached_value}", "cyan"))
+            existing_node_number = self.get_node_number_from_state(thought)
+            if existing_node_number is not None:
+                node_number = existing_node_number
+            else:
+                raise Exception("Node number not found")
+                #self.nodeCount += 1
+                #node_number = self.nodeCount
+            self.graph.add_node(node_number, state=thought, color='purple')
+            self.graph.add_edge(state_node_count, node_number, color='purple')
+            return False
+        # Merge near-duplicates (whitespace, formatting, rewording) into the thought they repeat
+        duplicate_of = self.deduplicator.find(thought) if self.deduplicator is not None else None
+        if duplicate_of is not None:
+            if duplicate_of != thought:
+                self.duplicate_thoughts[thought] = duplicate_of
+            duplicate_value = self.check_cache(duplicate_of)
+            if duplicate_value is not None:
+                # Known and scored before, reuse its score and node
+                print(colored(f"near-duplicate state: {thought}, merged into: {duplicate_of}, Cached value: {duplicate_value}", "cyan"))
+                self.evaluated_thoughts[thought] = duplicate_value
+                node_number = self.get_node_number_from_state(duplicate_of)
+                self.graph.add_node(node_number, state=duplicate_of, color='purple')
+                self.graph.add_edge(state_node_count, node_number, color='purple')
+            # Otherwise it repeats a thought of this batch, which is evaluated once
+            return False
+        if self.deduplicator is not None:
+            self.deduplicator.add(thought)
+        return True
+    
+    @traced("aot.record_evaluations")
+    def record_evaluations(self, thoughts: List[str], new_evaluations: Dict[str, float], state_node_count: int, current_step: int) -> List[str]:
+        """Store the scores of a batch, cache and graph its pruned thoughts and return the ones kept"""
         self.evaluated_thoughts.update(new_evaluations)
+        for thought, duplicate_of in self.duplicate_thoughts.items():
+            if thought not in self.evaluated_thoughts and duplicate_of in new_evaluations:
+                self.evaluated_thoughts[thought] = new_evaluations[duplicate_of]
+        # Thoughts whose evaluation had no score are dropped
+        thoughts = [thought for thought in thoughts if thought in self.evaluated_thoughts]
             
         filtered_thoughts = [
             thought
@@ -305,10 +632,12 @@ class AoTAgent():
         # Cache the filtered thoughts
         for thought in filtered_thoughts:
             self.thought_cache["accepted"][str(thought)] = {"value": self.evaluated_thoughts[thought], "step": current_step}
+            self.best_tracker.accept(str(thought), current_step, self.evaluated_thoughts[thought])
         #print(self.thought_cache["accepted"].items())
         for thought in thoughts:
             if self.evaluated_thoughts[thought] < self.pruning_threshold:
                 self.thought_cache["pruned"][str(thought)] = self.evaluated_thoughts[thought]
+                self.best_tracker.discard(str(thought))
                 print(colored(f"Pruned thought under {self.pruning_threshold}: value: {thought}", "red"))
                 thought_node_count = self.get_node_number_from_state(thought)
                 if thought_node_count == self.nodeCount:
@@ -339,21 +668,16 @@ class AoTAgent():
         # Add edge between nodes
         self.graph.add_edge(node1_number, node2_number, color='black')
         
+    @traced("aot.best_thoughts")
     def get_best_thoughts_per_step(self):
-        for thought, data in self.thought_cache["accepted"].items():
-            step = data["step"]
-            value = data["value"]
-            if step not in self.best_thoughts or value > self.best_thoughts[step]["value"]:
-                self.best_thoughts[step] = {"thought": thought, "value": value}
-
+        """Color the nodes of the best thoughts, which best_tracker keeps up to date as thoughts are accepted and pruned"""
+        best_states = {item["thought"] for item in self.best_thoughts.values()}
         # Change the color of the nodes that represent the best thoughts
         for node, data in self.graph.nodes(data=True):
-            if 'state' in data and data['state'] in (item["thought"] for item in self.best_thoughts.values()):
+            if data.get('state') in best_states:
                 data['color'] = 'green'  # Change the color to green
+        return self.best_thoughts
                 
     def get_best_thoughts_per_step_no_nodes(self):
-        for thought, data in self.thought_cache["accepted"].items():
-            step = data["step"]
-            value = data["value"]
-            if step not in self.best_thoughts or value > self.best_thoughts[step]["value"]:
-                self.best_thoughts[step] = {"thought": thought, "value": value}
\ No newline at end of file
+        """The best accepted thought per step, kept up to date by best_tracker"""
+        return self.best_thoughts
\ No newline at end of file
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Mapping, Union
+
+from framework.agents.AlgorithmOfThought.AoTAgent import AoTAgent
+from framework.models import Models
+from framework.models.ResponseCache import ResponseCache
+
+class BatchResult():
+    """The outcome of one task in a batch, solution is None when error is set"""
+    task_id: Any
+    prompt: str
+    solution: Any
+    error: Exception
+    seconds: float
+
+    def __init__(self, task_id, prompt: str, solution=None, error: Exception = None, seconds: float = 0.0):
+        self.task_id = task_id
+        self.prompt = prompt
+        self.solution = solution
+        self.error = error
+        self.seconds = seconds
+
+    def __repr__(self) -> str:
+        status = f"error={self.error!r}" if self.error is not None else f"solution={self.solution!r}"
+        return f"BatchResult(task_id={self.task_id!r}, {status}, seconds={self.seconds:.2f})"
+
+class AoTBatchSolver():
+    """
+    Batch entry point running many AoTAgent searches at once.
+
+    Every agent shares one model instance backed by a pooled HTTP session and one
+    ResponseCache, and the model caps how many requests are in flight across all
+    tasks. Tasks run on a thread pool, the searches spend nearly all of their time
+    waiting on the LLM, so throughput scales with max_concurrent_tasks inside one
+    process. Solutions are streamed back in completion order.
+
+    Parameters
+    ----------
+    model_type, model, api_key, api_base :
+        As for AoTAgent, used to build the shared model.
+    max_concurrent_tasks : int
+        The number of searches running at the same time.
+    max_in_flight : int
+        The global cap on concurrent LLM requests.
+    response_cache : ResponseCache
+        Shared between all tasks, a new one is created when not given.
+    agent_kwargs :
+        Passed to every AoTAgent, e.g. num_thoughts, max_steps, value_threshold or a shared WorkerFarm as farm.
+    """
+
+    def __init__(self,
+                 model_type: str = 'OpenAI',
+                 model: str = "gpt-3.5-turbo",
+                 api_key: str = None,
+                 api_base: str = 'https://api.openai.com/v1',
+                 max_concurrent_tasks: int = 8,
+                 max_in_flight: int = 16,
+                 response_cache: ResponseCache = None,
+                 **agent_kwargs):
+        self.llm = Models.Models.get_Model(model_type)
+        self.llm.set_api_info(base_api_key=api_key, base_url=api_base)
+        self.llm.model = model
+        self.llm.set_max_in_flight(max_in_flight)
+        Models.use_pooled_session(pool_size=max_in_flight)
+
+        self.max_concurrent_tasks = max_concurrent_tasks
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+        self.agent_kwargs = agent_kwargs
+
+    @staticmethod
+    def _as_items(tasks: Union[Iterable[str], Mapping[Any, str]]):
+        # A mapping keeps its own ids, a plain iterable is numbered in order
+        return list(tasks.items()) if isinstance(tasks, Mapping) else list(enumerate(tasks))
+
+    def solve_task(self, task_id, prompt: str) -> BatchResult:
+        start = time.perf_counter()
+        try:
+            agent = AoTAgent(initial_prompt=prompt, llm=self.llm, response_cache=self.response_cache, **self.agent_kwargs)
+            return BatchResult(task_id, prompt, solution=agent.solve(), seconds=time.perf_counter() - start)
+        except Exception as e:
+            return BatchResult(task_id, prompt, error=e, seconds=time.perf_counter() - start)
+
+    def solve_iter(self, tasks: Union[Iterable[str], Mapping[Any, str]]) -> Iterator[BatchResult]:
+        """Yield a BatchResult for each task as soon as its search finishes"""
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_tasks, thread_name_prefix="aot-batch") as pool:
+            futures = [pool.submit(self.solve_task, task_id, prompt) for task_id, prompt in self._as_items(tasks)]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def solve_all(self, tasks: Union[Iterable[str], Mapping[Any, str]]) -> Dict[Any, BatchResult]:
+        """Solve every task, keyed by task id in input order"""
+        items = self._as_items(tasks)
+        results = {result.task_id: result for result in self.solve_iter(dict(items))}
+        return {task_id: results[task_id] for task_id, _ in items}
+
+    async def solve_stream(self, tasks: Union[Iterable[str], Mapping[Any, str]]) -> AsyncIterator[BatchResult]:
+        """Async variant of solve_iter for services running an event loop"""
+        loop = asyncio.get_running_loop()
+        pool = ThreadPoolExecutor(max_workers=self.max_concurrent_tasks, thread_name_prefix="aot-batch")
+        try:
+            futures = [loop.run_in_executor(pool, self.solve_task, task_id, prompt) for task_id, prompt in self._as_items(tasks)]
+            for future in asyncio.as_completed(futures):
+                yield await future
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+'''Example Usage'''
+'''solver = AoTBatchSolver(model="gpt-3.5-turbo", api_key=OPENAI_API_KEY, max_concurrent_tasks=8, max_in_flight=16,
+                        num_thoughts=2, max_steps=3, pruning_threshold=50, value_threshold=80)
+for result in solver.solve_iter(["task one", "task two"]):
+    print(result.task_id, result.solution)'''
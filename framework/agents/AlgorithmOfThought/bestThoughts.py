@@ -0,0 +1,114 @@
+import heapq
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+class BestThoughtTracker():
+    """
+    Accepted thoughts ranked per step, kept up to date as thoughts are accepted and pruned
+    instead of rescanning the thought cache.
+
+    Every step has a max-heap of its accepted thoughts. Pruned thoughts are removed lazily:
+    they are forgotten in O(1) and skipped the next time they surface at the top, and a
+    heap is rebuilt once more than half of it is stale. Accepting and pruning cost
+    O(log n), the best thought of every step (best, the dict AoTAgent exposes as
+    best_thoughts) is read in O(1), and the n best of a step in O(n log h).
+
+    Equal values keep the thought accepted first, as the rescan did.
+    """
+    best: Dict[int, Dict[str, Any]]
+
+    def __init__(self):
+        self.best = {}
+        self._heaps: Dict[int, List[Tuple[float, int, str]]] = {}
+        self._entries: Dict[str, Tuple[int, int, float]] = {}  # thought -> (step, sequence, value)
+        self._stale: Dict[int, int] = {}
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, thought: str) -> bool:
+        return thought in self._entries
+
+    def accept(self, thought: str, step: int, value: float) -> None:
+        """Add an accepted thought, or move it when it was accepted before with another step or value"""
+        entry = self._entries.get(thought)
+        if entry is not None:
+            if entry[0] == step and entry[2] == value:
+                return
+            self.discard(thought)
+        sequence = next(self._sequence)
+        self._entries[thought] = (step, sequence, value)
+        heapq.heappush(self._heaps.setdefault(step, []), (-value, sequence, thought))
+        best = self.best.get(step)
+        if best is None or value > best["value"]:
+            self.best[step] = {"thought": thought, "value": value}
+
+    def discard(self, thought: str) -> None:
+        """Forget a pruned thought, the next best of its step takes its place"""
+        entry = self._entries.pop(thought, None)
+        if entry is None:
+            return
+        step = entry[0]
+        self._stale[step] = self._stale.get(step, 0) + 1
+        if self._stale[step] * 2 > len(self._heaps[step]):
+            self._compact(step)
+        best = self.best.get(step)
+        if best is not None and best["thought"] == thought:
+            top = self._top(step)
+            if top is None:
+                del self.best[step]
+            else:
+                self.best[step] = {"thought": top[2], "value": -top[0]}
+
+    def _valid(self, step: int, item: Tuple[float, int, str]) -> bool:
+        entry = self._entries.get(item[2])
+        return entry is not None and entry[0] == step and entry[1] == item[1]
+
+    def _top(self, step: int) -> Optional[Tuple[float, int, str]]:
+        heap = self._heaps.get(step)
+        while heap and not self._valid(step, heap[0]):
+            heapq.heappop(heap)
+            self._stale[step] -= 1
+        return heap[0] if heap else None
+
+    def _compact(self, step: int) -> None:
+        heap = [item for item in self._heaps[step] if self._valid(step, item)]
+        heapq.heapify(heap)
+        self._heaps[step] = heap
+        self._stale[step] = 0
+
+    def top(self, step: int, n: int) -> List[Dict[str, Any]]:
+        """The n best accepted thoughts of a step, best first"""
+        items = heapq.nsmallest(n, (item for item in self._heaps.get(step, ()) if self._valid(step, item)))
+        return [{"thought": thought, "value": -value} for value, _, thought in items]
+
+    def alternative_paths(self, n: int) -> List[Dict[int, Dict[str, Any]]]:
+        """
+        The best path and up to n - 1 runners-up: path i takes the i-th best thought of
+        every step, or the step's last one when it has fewer.
+        """
+        ranked = {step: self.top(step, n) for step in self.best}
+        depth = max((len(thoughts) for thoughts in ranked.values()), default=0)
+        return [{step: thoughts[min(i, len(thoughts) - 1)] for step, thoughts in ranked.items()} for i in range(min(n, depth))]
+
+    def load(self, accepted: Dict[str, Dict[str, Any]]) -> None:
+        """Start over from a thought cache's accepted thoughts, e.g. a shared or restored one"""
+        self.clear()
+        for thought, data in accepted.items():
+            self.accept(thought, data["step"], data["value"])
+
+    def clear(self) -> None:
+        # best is cleared in place, AoTAgent.best_thoughts refers to it
+        self.best.clear()
+        self._heaps.clear()
+        self._entries.clear()
+        self._stale.clear()
+
+'''Example Usage'''
+'''tracker = BestThoughtTracker()
+tracker.accept("1. Split the sets into A-B and A∩B.", step=1, value=85)
+tracker.accept("1. List every element of A.", step=1, value=70)
+tracker.discard("1. Split the sets into A-B and A∩B.")  # pruned, the runner-up becomes the best
+print(tracker.best)                  # {1: {'thought': '1. List every element of A.', 'value': 70}}
+print(tracker.alternative_paths(2))  # the best path and the runner-up path'''
@@ -0,0 +1,160 @@
+import json
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from framework.tracing.Tracer import span, traced
+
+GRAPH_FORMATS = ("json", "dot", "graphml", "png")
+
+@traced("aot.draw_graph")
+def draw_graph(graph) -> None:
+    """
+    Draw the AoT search graph with matplotlib in an interactive window.
+
+    matplotlib and pygraphviz are imported on call so that importing the agent
+    stays cheap and headless installs without graphviz keep working. When
+    pygraphviz is not installed the layout falls back to networkx's spring layout.
+
+    Args:
+        graph: The networkx DiGraph built by AoTAgent, nodes and edges carry a 'color' attribute.
+    """
+    import networkx as nx
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError as e:
+        print(f"matplotlib is not installed, skipping graph drawing: {e}")
+        return
+
+    node_colors = [node['color'] for _, node in graph.nodes(data=True)]
+    edge_colors = [edge['color'] for _, _, edge in graph.edges(data=True)]
+    pos = graph_layout(graph)
+    try:
+        nx.draw(graph, pos, with_labels=True, arrows=True, node_color=node_colors, edge_color=edge_colors)
+        plt.show()
+    except Exception as e:
+        print(e)
+
+def graph_layout(graph) -> dict:
+    """Use the graphviz 'dot' layout when pygraphviz is available, spring layout otherwise"""
+    import networkx as nx
+    try:
+        from networkx.drawing.nx_agraph import graphviz_layout
+        return graphviz_layout(graph, prog='dot')
+    except ImportError:
+        return nx.spring_layout(graph, seed=0)
+
+class GraphSnapshot():
+    """A frozen copy of the search graph so it can be written while the agent keeps going"""
+    nodes: List[Tuple[Any, Dict[str, Any]]]
+    edges: List[Tuple[Any, Any, Dict[str, Any]]]
+
+    def __init__(self, graph):
+        self.nodes = [(node, dict(data)) for node, data in graph.nodes(data=True)]
+        self.edges = [(u, v, dict(data)) for u, v, data in graph.edges(data=True)]
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "directed": True,
+            "nodes": [{"id": node, **data} for node, data in self.nodes],
+            "links": [{"source": u, "target": v, **data} for u, v, data in self.edges],
+        }, ensure_ascii=False)
+
+    def to_dot(self) -> str:
+        def quote(value) -> str:
+            return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+        lines = ["digraph AoT {"]
+        for node, data in self.nodes:
+            label = str(data.get("state", node))
+            label = label if len(label) <= 80 else label[:77] + "..."
+            lines.append(f"  {quote(node)} [label={quote(label)}, color={quote(data.get('color', 'black'))}, tooltip={quote(data.get('state', ''))}];")
+        for u, v, data in self.edges:
+            lines.append(f"  {quote(u)} -> {quote(v)} [color={quote(data.get('color', 'black'))}];")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def to_networkx(self):
+        import networkx as nx
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.nodes)
+        graph.add_edges_from(self.edges)
+        return graph
+
+class GraphExporter():
+    """
+    Opt-in exporter for the AoT search tree.
+
+    export() takes a snapshot of the graph on the calling thread, which is only a copy
+    of the node and edge attributes, and hands the writing to a single background worker
+    so AoTAgent.solve() can return its solution straight away. The 'png' format renders
+    with matplotlib's Agg canvas, it never opens a window and is safe off the main thread.
+
+    Parameters
+    ----------
+    output_dir : str
+        Directory the files are written to, created if missing.
+    formats : tuple
+        Any of 'json', 'dot', 'graphml' and 'png'.
+    """
+    _executor: ThreadPoolExecutor = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, output_dir: str = "aot_graphs", formats: Tuple[str, ...] = ("json",)):
+        unknown = [fmt for fmt in formats if fmt not in GRAPH_FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown graph formats {unknown}, choose from {GRAPH_FORMATS}")
+        self.output_dir = output_dir
+        self.formats = tuple(formats)
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        # A single shared writer thread, created on first export
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aot-graph-export")
+            return cls._executor
+
+    def export(self, graph, name: str = None) -> Future:
+        """Snapshot the graph and write it in the background, the future resolves to the written paths"""
+        with span("aot.graph_snapshot", nodes=graph.number_of_nodes()):
+            snapshot = GraphSnapshot(graph)
+        name = name or f"aot_graph_{time.time_ns()}"
+        return self.get_executor().submit(self.write, snapshot, name)
+
+    @traced("aot.graph_write")
+    def write(self, snapshot: GraphSnapshot, name: str) -> List[str]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, name)
+        paths = []
+        for fmt in self.formats:
+            path = f"{base}.{fmt}"
+            if fmt == "json":
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(snapshot.to_json())
+            elif fmt == "dot":
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(snapshot.to_dot())
+            elif fmt == "graphml":
+                import networkx as nx
+                nx.write_graphml(snapshot.to_networkx(), path)
+            elif fmt == "png":
+                self.render_png(snapshot, path)
+            paths.append(path)
+        return paths
+
+    def render_png(self, snapshot: GraphSnapshot, path: str) -> None:
+        import networkx as nx
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        graph = snapshot.to_networkx()
+        figure = Figure(figsize=(12, 8))
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot(111)
+        nx.draw(graph, graph_layout(graph), ax=ax, with_labels=True, arrows=True,
+                node_color=[data.get('color', 'blue') for _, data in graph.nodes(data=True)],
+                edge_color=[data.get('color', 'black') for _, _, data in graph.edges(data=True)])
+        figure.savefig(path)
@@ -1,9 +1,16 @@
 import re
 from framework.models import Models as model
-from typing import List, Dict
+from framework.models.ResponseCache import ResponseCache
+from framework.models.Cascade import CascadePolicy, resolve_model
+from framework.agents.AlgorithmOfThought.runJournal import RunJournal, journal_key
+from framework.tracing.Tracer import annotate, span
+from typing import List, Dict, Optional
+from concurrent.futures import Executor, Future
+import threading
 from termcolor import colored
 from abc import ABC, abstractmethod
 import logging
+import os
 import traceback
 
 class CustomLogger(logging.Logger):
@@ -18,16 +25,19 @@ logger.setLevel(logging.INFO)
 
 # Create handlers
 c_handler = logging.StreamHandler()
-f_handler = logging.FileHandler('file.log')
+# Logs also go to the file named by AOT_LOG_FILE, there is no log file unless it is set
+log_file = os.getenv("AOT_LOG_FILE")
+f_handler = logging.FileHandler(log_file, encoding='utf-8', delay=True) if log_file else None
 
 # Create formatters and add it to handlers
 format = logging.Formatter('%(name)s - %(message)s - %(lineno)d')
 c_handler.setFormatter(format)
-f_handler.setFormatter(format)
 
 # Add handlers to the logger
 logger.addHandler(c_handler)
-logger.addHandler(f_handler)
+if f_handler is not None:
+    f_handler.setFormatter(format)
+    logger.addHandler(f_handler)
 
 class AbstractModelProcesses(ABC):
     
@@ -44,20 +54,101 @@ class AbstractModelProcesses(ABC):
     def evaluate_states(self, states: List[str], initial_prompt: str):
         pass
 
+# The roles of run_llm calls, and the names role_models may also use for them
+ROLE_ALIASES = {"generate": "thought", "solve": "solution"}
+
 class AlgorithmModelProcesses(AbstractModelProcesses):
     LLM = None
+    journal: RunJournal = None
+    response_cache: ResponseCache = None
+    role_llms: Dict[str, model.ModelBase] = None
+    cascade: CascadePolicy = None
     
-    def __init__(self, model_to_use: str = 'OpenAI'):
-        self.LLM = model.Models.get_Model(model_to_use)
+    def __init__(self, model_to_use: str = 'OpenAI', journal: RunJournal = None, llm: model.ModelBase = None, response_cache: ResponseCache = None):
+        # A model instance passed in is shared as is, e.g. one pooled client for a batch of agents
+        self.LLM = llm if llm is not None else model.Models.get_Model(model_to_use)
+        self.journal = journal
+        self.response_cache = response_cache
+        self.role_llms = {}
+        self.cascade = None
+        self._cache_cursors = {}
+        self._cursor_lock = threading.Lock()
+        
+    def set_role_models(self, role_models: Dict[str, object] = None, cascade: CascadePolicy = None) -> None:
+        """
+        Use other models for some roles ('thought'/'generate', 'evaluate', 'solution'/'solve'),
+        given as instances or model names on the LLM's endpoint, and optionally score through a
+        cascade that tries a small model first.
+        """
+        self.role_llms = {ROLE_ALIASES.get(role, role): resolve_model(spec, self.LLM) for role, spec in (role_models or {}).items()}
+        self.cascade = cascade
+        if cascade is not None:
+            cascade.small = resolve_model(cascade.small, self.LLM)
+            cascade.large = resolve_model(cascade.large, self.LLM)
+        
+    def llm_for(self, role: str) -> model.ModelBase:
+        return self.role_llms.get(role, self.LLM)
+        
+    def run_cached(self, query: str, system_prompt: str = "", max_tokens: int = 1000, temperature: int = 0, llm: model.ModelBase = None, sample: int = None) -> str:
+        """
+        Run the LLM (or the given one) through the shared response cache when there is one.
+        sample picks the cached position of a sampled call instead of this instance's cursor.
+        """
+        llm = llm if llm is not None else self.LLM
+        if self.response_cache is None:
+            return llm.run(system_prompt=system_prompt, query=query, max_tokens=max_tokens, temperature=temperature)
+        cache_key = ResponseCache.key(llm.model, system_prompt, query, max_tokens, temperature)
+        # Greedy calls always share the first response, sampled calls walk through the cached samples
+        index = 0
+        if temperature and sample is not None:
+            index = sample
+        elif temperature:
+            # Claimed under a lock, concurrent samples for the same prompt each get their own position
+            with self._cursor_lock:
+                index = self._cache_cursors.get(cache_key, 0)
+                self._cache_cursors[cache_key] = index + 1
+        response = self.response_cache.get(cache_key, index)
+        annotate(cache_hit=response is not None)
+        if response is None:
+            response = llm.run(system_prompt=system_prompt, query=query, max_tokens=max_tokens, temperature=temperature)
+            self.response_cache.add(cache_key, response)
+        return response
+        
+    def run_llm(self, query: str, system_prompt: str = "", max_tokens: int = 1000, temperature: int = 0, key: str = None, role: str = "text", llm: model.ModelBase = None, sample: int = None) -> str:
+        """Run the role's LLM through the journal, recorded responses are served from it in replay and resume mode"""
+        with span("llm", "llm", role=role, max_tokens=max_tokens, temperature=temperature) as traced_call:
+            if self.journal is not None and key is not None:
+                recorded = self.journal.next_response(key)
+                if recorded is not None:
+                    traced_call.set(journal_hit=True)
+                    return recorded
+            response = self.run_cached(system_prompt=system_prompt, query=query, max_tokens=max_tokens, temperature=temperature,
+                                       llm=llm if llm is not None else self.llm_for(role), sample=sample)
+            if self.journal is not None and key is not None:
+                self.journal.record_llm(key, role, system_prompt, query, max_tokens, temperature, response)
+            return response
         
-    def generate_text(self, prompt: str, system_prompt:str = "", max_tokens: int = 1000, temperature: int = 0, k: int = 1) -> List[str]:
+    def generate_text(self, prompt: str, system_prompt:str = "", max_tokens: int = 1000, temperature: int = 0, k: int = 1, key: str = None, role: str = "text") -> List[str]:
         thoughts = []
         for _ in range(k):
-            response = self.LLM.run(system_prompt=system_prompt, query=prompt, max_tokens=max_tokens, temperature=temperature)
+            response = self.run_llm(system_prompt=system_prompt, query=prompt, max_tokens=max_tokens, temperature=temperature, key=key, role=role)
             thoughts += [response]
         return thoughts
 
     def generate_thoughts(self, state: str, initial_prompt: str, k: int = 1, accepted_solutions = None, rejected_solutions=None, max_steps: int = 3, current_step: int = 0) -> List[str]:
+        system_prompt, prompt, key = self.thought_prompts(state, initial_prompt, accepted_solutions, max_steps, current_step)
+        thoughts = self.generate_text(system_prompt=system_prompt, prompt=prompt, temperature=1, k=k, key=key, role="thought")
+        return thoughts
+
+    def submit_thoughts(self, executor: Executor, state: str, initial_prompt: str, k: int = 1, accepted_solutions = None, max_steps: int = 3, current_step: int = 0) -> List[Future]:
+        """Start the k generations of generate_thoughts on executor, one future per thought"""
+        # The prompt is built now, so it holds the accepted solutions as of submission
+        system_prompt, prompt, key = self.thought_prompts(state, initial_prompt, accepted_solutions, max_steps, current_step)
+        return [executor.submit(self.run_llm, system_prompt=system_prompt, query=prompt, max_tokens=1000, temperature=1, key=key, role="thought")
+                for _ in range(k)]
+
+    def thought_prompts(self, state: str, initial_prompt: str, accepted_solutions = None, max_steps: int = 3, current_step: int = 0):
+        """The system prompt, prompt and journal key of a thought generation"""
         if type(state) == str:
             state_text = state
         else:
@@ -83,50 +174,85 @@ class AlgorithmModelProcesses(AbstractModelProcesses):
         {state_text}
         """
         prompt = f"Generate step {current_step} towards the solution."
-
-        thoughts = self.generate_text(system_prompt=system_prompt, prompt=prompt, temperature=1, k=k)
-        return thoughts
+        return system_prompt, prompt, journal_key("thought", initial_prompt, state_text, current_step)
 
     #Need to add in previous best steps per stage, so highest value per stage and give it here to generate the solution.
-    def generate_solution(self, initial_prompt: str, best_steps, rejected_solutions=None) -> str:
+    def generate_solution(self, initial_prompt: str, best_steps, rejected_solutions=None, alternatives=None) -> str:
         try:
             '''if isinstance(state, list):
                 state_text = "\n".join(state)
             else:
                 state_text = state'''
 
-            prompt = f"""
+            answer = self.generate_text(prompt=self.solution_prompt(initial_prompt, best_steps, rejected_solutions, alternatives), max_tokens=2048, temperature=0,
+                                        key=journal_key("solution", initial_prompt), role="solution")
+            if not answer or answer == '':  # Check if the answer is empty
+                raise ValueError("No solution generated")
+            #logger.info(colored(f"Generated Solution Summary {answer}", "green"))
+            return answer
+        except Exception as e:
+            logging.error(colored(f"Error in generate_solutions: {e}", "red"))
+            return None
+
+    def solution_prompt(self, initial_prompt: str, best_steps, rejected_solutions=None, alternatives=None) -> str:
+        """The final prompt, alternatives are runner-up paths shown after the best steps when given"""
+        runner_ups = f"""Runner-up paths, in order, to fall back on where the reasoning above is weak:
+            ###'{alternatives}'###\n\n
+            """ if alternatives else ""
+        return f"""
             Generate a solution to comply with the user's instructions, 
             you must generate a solution on the basis of determining the most reliable solution in the shortest amount of time, 
             while taking rejected solutions into account and learning from them. 
             Considering the reasoning provided:\n\n
             ###'{best_steps}'###\n\n
-            Devise the best possible solution for the task: {initial_prompt}, Here are evaluated steps that were rejected: 
+            {runner_ups}Devise the best possible solution for the task: {initial_prompt}, Here are evaluated steps that were rejected: 
             ###{rejected_solutions}###\n\n
             Give the solution without making the same mistakes you did with the evaluated rejected steps. 
             Be simple. Be direct. Provide intuitive solutions as soon as you think of them."""
-           
-            answer = self.generate_text(prompt=prompt, max_tokens=2048, temperature=0)
-            if not answer or answer == '':  # Check if the answer is empty
-                raise ValueError("No solution generated")
-            #logger.info(colored(f"Generated Solution Summary {answer}", "green"))
-            return answer
-        except Exception as e:
-            logging.error(colored(f"Error in generate_solutions: {e}", "red"))
-            return None
 
     def evaluate_states(self, states: List[str], initial_prompt: str, previous_score: float, current_step: int = 0, previous_best_thoughts = None) -> Dict[str, float]:
         if not states:
             return {}
 
-        if self.LLM.evaluation_strategy == "value":
+        if self.llm_for("evaluate").evaluation_strategy == "value":
             state_values = {}
             for state in states:
-                if type(state) == str:
-                    state_text = state
-                else:
-                    state_text = "\n".join(state)
-                prompt = f""" To achieve the following goal: '{initial_prompt}', 
+                value = self.evaluate_state(state, initial_prompt, previous_score, current_step, previous_best_thoughts)
+                if value is not None:
+                    state_values[state] = value
+            return state_values
+
+        else:
+            raise ValueError("Invalid evaluation strategy. Choose 'value' or 'vote'.")
+
+    def evaluate_state(self, state: str, initial_prompt: str, previous_score: float, current_step: int = 0, previous_best_thoughts = None) -> Optional[float]:
+        """Value of a single state, None when the response holds no number"""
+        prompt, key = self.evaluate_prompt(state, initial_prompt, previous_score, current_step, previous_best_thoughts)
+        state_text = state if type(state) == str else "\n".join(state)
+        # If the solutions is not making fast progress in achieving the goal, give it a lower score.
+        if self.cascade is not None:
+            scores = [self.parse_score(self.run_llm(query=prompt, max_tokens=10, temperature=1, key=key, role="evaluate", llm=self.cascade.small))
+                      for _ in range(self.cascade.samples)]
+            value, escalate = self.cascade.decide(scores)
+            if escalate:
+                print(colored(f"Small model scores {scores} are not decisive, escalating", "yellow"))
+                value = self.parse_score(self.run_llm(query=prompt, max_tokens=10, temperature=1, key=journal_key("evaluate_escalated", initial_prompt, state_text, current_step),
+                                                      role="evaluate", llm=self.cascade.large))
+        else:
+            value = self.parse_score(self.run_llm(query=prompt, max_tokens=10, temperature=1, key=key, role="evaluate"))
+        if value is not None:
+            print(colored(f"Evaluated Thought Value: {value} at step: {current_step} with context being {state_text}", "green"))
+            if self.journal is not None:
+                self.journal.record_score(state_text, current_step, value)
+        return value
+
+    def evaluate_prompt(self, state: str, initial_prompt: str, previous_score: float, current_step: int = 0, previous_best_thoughts = None):
+        """The prompt and journal key of a state evaluation"""
+        if type(state) == str:
+            state_text = state
+        else:
+            state_text = "\n".join(state)
+        prompt = f""" To achieve the following goal: '{initial_prompt}', 
                     pessimistically value the latest generated step and it's accuracy
                     AS A FLOAT BETWEEN 0 AND 100.\n
                     If this state has another step that is not step {current_step} in it at once, rank it lower. Having a PLAN is NOT BAD\n
@@ -137,17 +263,14 @@ class AlgorithmModelProcesses(AbstractModelProcesses):
                     Only rate it higher than the previous score if it is step {current_step} towards the solution.\n  
                     Again evaluate the current state AS A FLOAT BETWEEN 0 and 100:\n,  DO NOT RETURN ANYTHING ELSE, JUST THE FLOAT
                 """
-                # If the solutions is not making fast progress in achieving the goal, give it a lower score.
-                response = self.LLM.run(query=prompt, max_tokens=10, temperature=1)
-                match = re.search(r'[-+]?[0-9]*\.?[0-9]+', response)
-                if match:
-                    value = float(match.group())
-                    print(colored(f"Evaluated Thought Value: {value} at step: {current_step} with context being {state_text}", "green"))
-                    state_values[state] = value
-                else:
-                    print(colored(f"No float value found in response: {response}", "red"))
-            return state_values
+        return prompt, journal_key("evaluate", initial_prompt, state_text, current_step)
 
-        else:
-            raise ValueError("Invalid evaluation strategy. Choose 'value' or 'vote'.")
+    @staticmethod
+    def parse_score(response: str) -> Optional[float]:
+        """The first number in a scoring response"""
+        match = re.search(r'[-+]?[0-9]*\.?[0-9]+', response or "")
+        if match:
+            return float(match.group())
+        print(colored(f"No float value found in response: {response}", "red"))
+        return None
         
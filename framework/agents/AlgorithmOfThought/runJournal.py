@@ -0,0 +1,190 @@
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+JOURNAL_MODES = ("record", "replay", "resume")
+
+logger = logging.getLogger(__name__)
+
+class JournalMissError(KeyError):
+    """Raised in replay mode when the journal has no recorded response for a call"""
+
+def journal_key(role: str, *parts) -> str:
+    """A stable key for a logical model call, e.g. ('thought', initial_prompt, state, step)"""
+    return hashlib.sha1(json.dumps([role, *parts], ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+class RunJournal():
+    """
+    Compressed, append-only journal of an AoT run.
+
+    Every prompt, response and score is queued to a background writer that appends
+    them as gzip-compressed JSON lines. Each batch is written as its own gzip member,
+    so a crash can only lose the batch being written and the rest of the file stays readable.
+    Checkpoints of the search state are written to the same journal.
+
+    Modes
+    -----
+    record : every model call goes to the LLM and is journaled.
+    replay : model calls are served from the journal and never reach the network,
+             a call that was not recorded raises JournalMissError.
+    resume : recorded calls are served from the journal, the first unrecorded call
+             and everything after it goes to the LLM and is journaled. Used to pick
+             up a run that crashed part way through.
+
+    Responses are matched on a logical key (call role, task, state, step) and served
+    in the order they were recorded for that key, which keeps replays deterministic
+    even though the sampled prompts embed the rest of the search state.
+
+    Checkpoints are written once the search is over and once the solution is generated.
+    Resuming restores the last one, a search that crashed part way through is redone from
+    the root with its journaled responses, so it costs no model calls up to the crash.
+
+    A failed write is logged and the writer keeps draining the queue, the error is
+    raised from the next flush() or close().
+    """
+    path: str
+    mode: str
+
+    def __init__(self, path: str, mode: str = "record", flush_interval: float = 1.0, batch_size: int = 64):
+        if mode not in JOURNAL_MODES:
+            raise ValueError(f"Invalid journal mode {mode}, choose from {JOURNAL_MODES}")
+        self.path = path
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._error: Optional[BaseException] = None
+
+        self._lock = threading.Lock()
+        self._responses: Dict[str, List[str]] = {}
+        self._served: Dict[str, int] = {}
+        self._checkpoint: Optional[Dict[str, Any]] = None
+        if mode in ("replay", "resume"):
+            for record in self.read(path):
+                if record["kind"] == "llm":
+                    self._responses.setdefault(record["key"], []).append(record["response"])
+                elif record["kind"] == "checkpoint":
+                    self._checkpoint = record
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._writer = None
+        if mode != "replay":
+            self._writer = threading.Thread(target=self._write_loop, name="aot-journal-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    @staticmethod
+    def read(path: str):
+        """Yield every record in a journal file, stopping quietly at a truncated final batch"""
+        if not os.path.exists(path):
+            return
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        return
+            except (EOFError, gzip.BadGzipFile, zlib.error):
+                return
+
+    def next_response(self, key: str) -> Optional[str]:
+        """Return the next recorded response for a key, None when the call should go to the LLM"""
+        if self.mode == "record":
+            return None
+        with self._lock:
+            responses = self._responses.get(key, [])
+            served = self._served.get(key, 0)
+            if served < len(responses):
+                self._served[key] = served + 1
+                return responses[served]
+        if self.mode == "replay":
+            raise JournalMissError(f"No recorded response for call {key} (call #{served + 1})")
+        return None
+
+    def record_llm(self, key: str, role: str, system_prompt: str, prompt: str, max_tokens: int, temperature: float, response: str) -> None:
+        self.record({"kind": "llm", "key": key, "role": role, "system_prompt": system_prompt, "prompt": prompt,
+                     "max_tokens": max_tokens, "temperature": temperature, "response": response})
+
+    def record_score(self, state: str, step: int, value: float) -> None:
+        self.record({"kind": "score", "state": state, "step": step, "value": value})
+
+    def checkpoint(self, phase: str, search_state: Dict[str, Any]) -> None:
+        """Record a snapshot of the search, search_state must already be a copy the agent no longer mutates"""
+        record = {"kind": "checkpoint", "phase": phase, **search_state}
+        with self._lock:
+            self._checkpoint = record
+        self.record(record)
+
+    def last_checkpoint(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._checkpoint
+
+    def record(self, record: Dict[str, Any]) -> None:
+        if self._writer is None or self._closed:
+            return
+        record["time"] = time.time()
+        self._queue.put(record)
+
+    def flush(self) -> None:
+        """Block until every queued record is written, raises the error of a failed write"""
+        if self._writer is not None:
+            self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        if self._writer is None or self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _write_loop(self) -> None:
+        stop = False
+        while not stop:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                continue
+            # Gather whatever else is already queued, up to a batch
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+            records = [record for record in batch if record is not None]
+            try:
+                if records:
+                    lines = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+                    # One gzip member per batch, appended, so earlier batches survive a crash
+                    with open(self.path, "ab") as f:
+                        f.write(gzip.compress(lines.encode("utf-8")))
+            except Exception as error:
+                # The batch is lost, but the writer lives on so flush() and close() don't wait forever
+                logger.error(f"Journal write to {self.path} failed, {len(records)} records lost: {error!r}")
+                with self._lock:
+                    if self._error is None:
+                        self._error = error
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
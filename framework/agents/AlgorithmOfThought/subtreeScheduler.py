@@ -0,0 +1,132 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Set
+
+class SearchStopped(Exception):
+    """Raised in an explorer once the search it runs ahead of is over"""
+
+class SubtreeScheduler():
+    """
+    Explores sibling subtrees of an AoT search at the same time, at most max_subtrees at
+    once across the whole search, while the search itself stays a sequential depth-first
+    walk.
+
+    dfs descends into a node's first child itself and hands the subtrees of the other
+    children to explorers. An explorer walks its subtree on a private copy of the search
+    (thought cache, scores, stack, graph and deduplicator), so nothing the search reads is
+    changed underneath it. Every generation and evaluation, dfs's or an explorer's, goes
+    through run(), which makes each distinct call once: whoever asks first makes it and
+    later askers wait for its answer. By the time dfs reaches a sibling, its calls are
+    answered or in flight.
+
+    A call is identified by what it is for (kind, state, step) and by how often its asker
+    asked for it before, never by its prompt. dfs therefore gets the answers a sequential
+    run gets from a replayed journal and builds the same cache, scores and graph in the
+    same order. Explorers that guessed wrong, e.g. about a thought an earlier sibling
+    caches first, only cost calls dfs never uses.
+
+    Speculation costs model calls. Explorers run subtrees early, so they see older
+    context than dfs would. Their prompts, and with a sampling model their answers and
+    the tree dfs builds from them, can differ from a sequential run. Their wrong guesses
+    are counted in stats()["wasted_calls"]. To bound that cost, explorers make at most
+    max_speculative_calls calls per search. Once the budget is spent, claims fail and
+    running explorers stop at their next call. Explorers also only start while the
+    model's calls take min_call_latency seconds on average. Faster calls finish sooner
+    than a thread can run ahead of them, so speculating would only add calls.
+
+    Args:
+        max_subtrees: Subtrees explored at once across the whole search.
+        max_speculative_calls: Calls explorers may make per search, 8 per subtree when None.
+        min_call_latency: Mean seconds per call below which no explorer is started.
+    """
+    max_subtrees: int
+    max_speculative_calls: int
+    min_call_latency: float
+
+    def __init__(self, max_subtrees: int = 4, max_speculative_calls: int = None, min_call_latency: float = 0.02):
+        self.max_subtrees = max_subtrees
+        self.max_speculative_calls = max_speculative_calls if max_speculative_calls is not None else 8 * max_subtrees
+        self.min_call_latency = min_call_latency
+        self.stopped = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_subtrees, thread_name_prefix="aot-subtree")
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._claimed: Set[Hashable] = set()
+        self._speculative: Set[Hashable] = set()  # calls an explorer made that dfs did not ask for yet
+        self._call_seconds = 0.0
+        self._stats = {"explorers": 0, "failed_explorers": 0, "calls": 0, "shared_calls": 0, "speculative_calls": 0}
+
+    def run(self, key: Hashable, function: Callable[[], Any], speculative: bool = False) -> Any:
+        """function's result, made by the first asker of key and shared with every later one"""
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner and speculative and self._stats["speculative_calls"] >= self.max_speculative_calls:
+                raise SearchStopped()
+            if owner:
+                future = self._calls[key] = Future()
+                self._stats["calls"] += 1
+                if speculative:
+                    self._speculative.add(key)
+                    self._stats["speculative_calls"] += 1
+            else:
+                self._stats["shared_calls"] += 1
+            if not speculative:
+                self._speculative.discard(key)
+        if owner:
+            start = time.perf_counter()
+            try:
+                future.set_result(function())
+            except BaseException as error:
+                future.set_exception(error)
+            finally:
+                with self._lock:
+                    self._call_seconds += time.perf_counter() - start
+        return future.result()
+
+    def _speculating(self) -> bool:
+        """True while explorers may start: the search runs, the budget lasts and calls are slow enough"""
+        calls = self._stats["calls"]
+        return (not self.stopped.is_set() and self._stats["speculative_calls"] < self.max_speculative_calls
+                and (calls == 0 or self._call_seconds / calls >= self.min_call_latency))
+
+    def claim(self, key: Hashable) -> bool:
+        """True the first time a subtree is claimed for an explorer, while speculating"""
+        with self._lock:
+            if not self._speculating() or key in self._claimed:
+                return False
+            self._claimed.add(key)
+            return True
+
+    def explore(self, function: Callable, *args) -> None:
+        """Run function(*args) on an explorer thread once one is free"""
+        with self._lock:
+            self._stats["explorers"] += 1
+        self._executor.submit(self._explore, function, *args)
+
+    def _explore(self, function: Callable, *args) -> None:
+        if self.stopped.is_set():
+            return
+        try:
+            function(*args)
+        except Exception:
+            # SearchStopped, or a wrong guess asking for a call the journal never recorded. dfs makes the calls it needs itself
+            with self._lock:
+                self._stats["failed_explorers"] += 1
+
+    def stop(self) -> None:
+        """Stop exploring, queued explorers are dropped and running ones end after their call in flight"""
+        self.stopped.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters, wasted_calls are the explorers' calls dfs never asked for"""
+        with self._lock:
+            return dict(self._stats, wasted_calls=len(self._speculative))
+
+'''Example Usage'''
+'''agent = AoTAgent(api_key=OPENAI_API_KEY, num_thoughts=3, max_steps=3, concurrent_subtrees=4,
+                 pruning_threshold=50, value_threshold=80, initial_prompt=task)
+print(agent.solve())
+print(agent.subtree_scheduler.stats())  # explorers started, calls made, calls dfs found answered and explorer calls it never used'''
@@ -0,0 +1,188 @@
+import copy
+import re
+import unicodedata
+import zlib
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Mersenne prime for the universal hash family, keeps a * x + b inside uint64 for 32 bit x
+_PRIME = np.uint64((1 << 31) - 1)
+
+# A bullet needs whitespace after it and no digit, '-5 + 3' starts with a negative number
+_LIST_MARKER = re.compile(r"^\s*(?:step\s*\d+\s*[:.)-]|\d+\s*[.)]|[-*•](?=\s+\D))\s*", re.IGNORECASE)
+# Numbers, operators and single capital letters (set and variable names)
+_CONTENT_TOKEN = re.compile(r"\d+(?:\.\d+)?|[-+*/×÷=<>≤≥≠^%∪∩∖⊂⊆∈∉]|\b[A-Z]\b")
+
+def normalize_thought(thought: str) -> str:
+    """
+    Canonical form of a thought for comparisons: unicode and case folded, list markers
+    such as '1.', '-' or 'Step 2:' dropped, whitespace collapsed and trailing punctuation
+    removed. Operators and numbers are kept, they carry the content of most AoT thoughts.
+    """
+    text = _LIST_MARKER.sub("", unicodedata.normalize("NFKC", str(thought))).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" .;,!")
+
+def content_tokens(thought: str) -> tuple:
+    """
+    The numbers, operators and variable names of a thought in order. Two thoughts that
+    differ in one number or swap two sets read almost the same, but are different steps.
+    """
+    return tuple(_CONTENT_TOKEN.findall(_LIST_MARKER.sub("", unicodedata.normalize("NFKC", str(thought)))))
+
+class MinHasher():
+    """
+    MinHash signatures over character shingles, the share of equal signature slots
+    estimates the Jaccard similarity of two texts' shingle sets.
+
+    Args:
+        num_perm: Signature length, more is more accurate and slower.
+        shingle_size: Characters per shingle.
+        seed: Seed of the hash family.
+    """
+    num_perm: int
+    shingle_size: int
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        n = self.shingle_size
+        pieces = {text[i:i + n] for i in range(max(len(text) - n + 1, 1))}
+        return np.fromiter((zlib.crc32(piece.encode("utf-8")) for piece in pieces), dtype=np.uint64, count=len(pieces))
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self.shingles(text)
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    @staticmethod
+    def similarity(signature1: np.ndarray, signature2: np.ndarray) -> float:
+        return float(np.mean(signature1 == signature2))
+
+class ThoughtDeduplicator():
+    """
+    Finds thoughts that repeat an earlier one with different whitespace, formatting or
+    wording, so their evaluation and subtree can be reused instead of paid for again.
+
+    A thought is first compared by its normalized text, then by MinHash similarity
+    against the known thoughts found through locality sensitive hashing, and finally,
+    when an embedder is given, by cosine similarity of embeddings. A near match only
+    counts when both thoughts have exactly the same numbers, operators and variable
+    names (content_tokens), similar wording around a changed number is not a duplicate.
+
+    Args:
+        threshold: Estimated Jaccard similarity of shingles from which thoughts are merged.
+        num_perm: MinHash signature length, must be divisible by bands.
+        bands: LSH bands, more bands find candidates at lower similarities.
+        embedder: Optional function from text to an embedding vector,
+            e.g. TextEmbeddings.get_embedding. Costs one call per new thought.
+        embedding_threshold: Cosine similarity from which embedded thoughts are merged.
+    """
+    threshold: float
+    embedding_threshold: float
+
+    def __init__(self,
+                 threshold: float = 0.85,
+                 num_perm: int = 64,
+                 bands: int = 16,
+                 embedder: Callable[[str], List[float]] = None,
+                 embedding_threshold: float = 0.95):
+        if num_perm % bands:
+            raise ValueError(f"num_perm {num_perm} must be divisible by bands {bands}")
+        self.threshold = threshold
+        self.embedder = embedder
+        self.embedding_threshold = embedding_threshold
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.bands = bands
+        self._rows = num_perm // bands
+        self._normalized: Dict[str, str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._content: Dict[str, tuple] = {}
+        self._buckets: Dict[tuple, List[str]] = {}
+        self._embeddings: Dict[str, np.ndarray] = {}
+        self.merges = {"exact": 0, "minhash": 0, "embedding": 0}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield (band, signature[band * self._rows:(band + 1) * self._rows].tobytes())
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embedder(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def find(self, thought: str) -> Optional[str]:
+        """The known thought this one duplicates, or None"""
+        normalized = normalize_thought(thought)
+        content = content_tokens(thought)
+        exact = self._normalized.get(normalized)
+        if exact is not None and self._content[exact] == content:
+            self.merges["exact"] += 1
+            return exact
+        signature = self.hasher.signature(normalized)
+        candidates = {known for key in self._band_keys(signature) for known in self._buckets.get(key, ()) if self._content[known] == content}
+        best, best_similarity = None, self.threshold
+        for known in candidates:
+            similarity = MinHasher.similarity(signature, self._signatures[known])
+            if similarity >= best_similarity:
+                best, best_similarity = known, similarity
+        if best is not None:
+            self.merges["minhash"] += 1
+            return best
+        if self.embedder is not None and self._embeddings:
+            known = [k for k in self._embeddings if self._content[k] == content]
+            if not known:
+                return None
+            similarities = np.stack([self._embeddings[k] for k in known]) @ self._embed(normalized)
+            index = int(similarities.argmax())
+            if similarities[index] >= self.embedding_threshold:
+                self.merges["embedding"] += 1
+                return known[index]
+        return None
+
+    def add(self, thought: str) -> None:
+        """Register a thought as the canonical version of its near duplicates"""
+        if thought in self._signatures:
+            return
+        normalized = normalize_thought(thought)
+        self._normalized.setdefault(normalized, thought)
+        signature = self.hasher.signature(normalized)
+        self._signatures[thought] = signature
+        self._content[thought] = content_tokens(thought)
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(thought)
+        if self.embedder is not None:
+            self._embeddings[thought] = self._embed(normalized)
+
+    def copy(self) -> "ThoughtDeduplicator":
+        """An independent copy of the known thoughts, sharing the hasher and the embedder"""
+        duplicate = copy.copy(self)
+        duplicate._normalized = dict(self._normalized)
+        duplicate._signatures = dict(self._signatures)
+        duplicate._content = dict(self._content)
+        duplicate._buckets = {key: list(thoughts) for key, thoughts in self._buckets.items()}
+        duplicate._embeddings = dict(self._embeddings)
+        duplicate.merges = dict(self.merges)
+        return duplicate
+
+    def clear(self) -> None:
+        self._normalized.clear()
+        self._signatures.clear()
+        self._content.clear()
+        self._buckets.clear()
+        self._embeddings.clear()
+
+'''Example Usage'''
+'''dedup = ThoughtDeduplicator(threshold=0.85)
+dedup.add("1. Multiply 4 by 6 to get 24.")
+print(dedup.find("Multiply 4  by 6 to get 24"))      # exact after normalization
+print(dedup.find("Multiply 4 by 6 and you get 24."))  # near duplicate through MinHash
+print(dedup.merges)'''
@@ -0,0 +1,534 @@
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from termcolor import colored
+
+from framework.agents.AlgorithmOfThought.modelProcesses import AlgorithmModelProcesses
+from framework.agents.AlgorithmOfThought.runJournal import RunJournal, journal_key
+from framework.models.ResponseCache import ResponseCache
+
+class Broker(ABC):
+    """
+    Carries node-expansion jobs from coordinators to workers and results back, and holds
+    the response cache every worker shares. Jobs and results are plain dicts.
+    """
+
+    @abstractmethod
+    def put_job(self, job: Dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    def get_job(self, timeout: float) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def put_result(self, result: Dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    def get_result(self, reply_to: str, timeout: float) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def cache_get(self, key: str, index: int) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def cache_add(self, key: str, response: str, max_samples: int) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+class LocalBroker(Broker):
+    """
+    Broker for worker processes on this machine, backed by a multiprocessing manager.
+    Stands in for RedisBroker when everything runs on one host.
+    """
+
+    def __init__(self, start_method: str = "spawn"):
+        self._manager = multiprocessing.get_context(start_method).Manager()
+        self._jobs = self._manager.Queue()
+        self._results = self._manager.Queue()
+        self._cache = self._manager.dict()
+        self._cache_lock = self._manager.Lock()
+
+    def __getstate__(self):
+        # Workers get the proxies, the manager itself stays with the coordinator
+        state = dict(self.__dict__)
+        state.pop("_manager", None)
+        return state
+
+    def put_job(self, job: Dict[str, Any]) -> None:
+        self._jobs.put(job)
+
+    def get_job(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return self._jobs.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put_result(self, result: Dict[str, Any]) -> None:
+        self._results.put(result)
+
+    def get_result(self, reply_to: str, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def cache_get(self, key: str, index: int) -> Optional[str]:
+        responses = self._cache.get(key)
+        return responses[index] if responses is not None and index < len(responses) else None
+
+    def cache_add(self, key: str, response: str, max_samples: int) -> None:
+        with self._cache_lock:
+            responses = self._cache.get(key, [])
+            if len(responses) < max_samples:
+                self._cache[key] = responses + [response]
+
+    def close(self) -> None:
+        if getattr(self, "_manager", None) is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+class RedisBroker(Broker):
+    """
+    Broker for workers on other machines, jobs, results and the cache live in Redis.
+    Needs the redis package ('pip install redis'). Jobs travel as JSON, so integer
+    dict keys in job arguments arrive as strings.
+
+    Args:
+        url: Redis URL, e.g. 'redis://10.0.0.5:6379/0'.
+        namespace: Prefix of every key, lets several farms share one Redis.
+        cache_ttl: Seconds a cached response is kept.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", namespace: str = "aot", cache_ttl: int = 24 * 3600):
+        self.url = url
+        self.namespace = namespace
+        self.cache_ttl = cache_ttl
+        self._client = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_client"] = None
+        return state
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError("redis is required for RedisBroker, install it with 'pip install redis'") from e
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def _pop(self, key: str, timeout: float) -> Optional[Dict[str, Any]]:
+        item = self.client.brpop(key, timeout=max(timeout, 0.01))
+        return json.loads(item[1]) if item is not None else None
+
+    def put_job(self, job: Dict[str, Any]) -> None:
+        self.client.lpush(f"{self.namespace}:jobs", json.dumps(job, ensure_ascii=False))
+
+    def get_job(self, timeout: float) -> Optional[Dict[str, Any]]:
+        return self._pop(f"{self.namespace}:jobs", timeout)
+
+    def put_result(self, result: Dict[str, Any]) -> None:
+        self.client.lpush(f"{self.namespace}:results:{result['reply_to']}", json.dumps(result, ensure_ascii=False))
+
+    def get_result(self, reply_to: str, timeout: float) -> Optional[Dict[str, Any]]:
+        return self._pop(f"{self.namespace}:results:{reply_to}", timeout)
+
+    def cache_get(self, key: str, index: int) -> Optional[str]:
+        response = self.client.lindex(f"{self.namespace}:cache:{key}", index)
+        return response.decode("utf-8") if response is not None else None
+
+    def cache_add(self, key: str, response: str, max_samples: int) -> None:
+        name = f"{self.namespace}:cache:{key}"
+        if self.client.llen(name) < max_samples:
+            self.client.rpush(name, response)
+            self.client.expire(name, self.cache_ttl)
+
+class BrokerResponseCache(ResponseCache):
+    """ResponseCache whose entries live in the broker, so every worker process shares them"""
+
+    def __init__(self, broker: Broker, max_samples: int = 8):
+        super().__init__(max_samples=max_samples)
+        self.broker = broker
+
+    def get(self, key: str, index: int = 0) -> Optional[str]:
+        response = self.broker.cache_get(key, index)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+
+    def add(self, key: str, response: str) -> None:
+        self.broker.cache_add(key, response, self.max_samples)
+
+# Jobs a worker runs, each builds its prompt, calls the model and returns the call for the coordinator's journal
+def _thought_job(model: AlgorithmModelProcesses, state, initial_prompt, accepted_solutions, max_steps, current_step, sample) -> Dict[str, Any]:
+    system_prompt, prompt, _ = model.thought_prompts(state, initial_prompt, accepted_solutions, max_steps, current_step)
+    response = model.run_llm(query=prompt, system_prompt=system_prompt, max_tokens=1000, temperature=1, role="thought", sample=sample)
+    return {"system_prompt": system_prompt, "query": prompt, "max_tokens": 1000, "temperature": 1, "response": response}
+
+def _evaluate_job(model: AlgorithmModelProcesses, state, initial_prompt, previous_score, current_step, previous_best_thoughts) -> Dict[str, Any]:
+    prompt, _ = model.evaluate_prompt(state, initial_prompt, previous_score, current_step, previous_best_thoughts)
+    response = model.run_llm(query=prompt, max_tokens=10, temperature=1, role="evaluate")
+    return {"system_prompt": "", "query": prompt, "max_tokens": 10, "temperature": 1, "response": response}
+
+def _solution_job(model: AlgorithmModelProcesses, initial_prompt, best_steps, rejected_solutions, alternatives=None) -> Dict[str, Any]:
+    prompt = model.solution_prompt(initial_prompt, best_steps, rejected_solutions, alternatives)
+    response = model.run_llm(query=prompt, max_tokens=2048, temperature=0, role="solution")
+    return {"system_prompt": "", "query": prompt, "max_tokens": 2048, "temperature": 0, "response": response}
+
+JOBS: Dict[str, Callable[..., Dict[str, Any]]] = {"thought": _thought_job, "evaluate": _evaluate_job, "solution": _solution_job}
+
+def build_model_processes(model_config: Dict[str, Any], broker: Broker, pool_size: int = 8) -> AlgorithmModelProcesses:
+    """The model a worker runs its jobs on, sharing the broker's response cache"""
+    from framework.models import Models
+    model = AlgorithmModelProcesses(model_config.get("model_type", "OpenAI"), response_cache=BrokerResponseCache(broker))
+    model.LLM.set_api_info(base_api_key=model_config.get("api_key"), base_url=model_config.get("api_base"))
+    model.LLM.model = model_config.get("model")
+    model.set_role_models(model_config.get("role_models"))
+    Models.use_pooled_session(pool_size=pool_size)
+    return model
+
+def _run_job(model: AlgorithmModelProcesses, broker: Broker, job: Dict[str, Any]) -> None:
+    try:
+        broker.put_result({"id": job["id"], "reply_to": job["reply_to"], "result": JOBS[job["kind"]](model, **job["kwargs"])})
+    except Exception as error:
+        broker.put_result({"id": job["id"], "reply_to": job["reply_to"], "error": f"{type(error).__name__}: {error}"})
+
+def run_worker(broker: Broker, model_config: Dict[str, Any], threads: int = 8) -> None:
+    """
+    Worker loop: take jobs from the broker and run up to threads of them at once, they
+    mostly wait on the network. Returns when it takes a 'stop' job.
+    """
+    model = build_model_processes(model_config, broker, pool_size=threads)
+    slots = threading.BoundedSemaphore(threads)
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="aot-worker") as pool:
+        while True:
+            slots.acquire()
+            job = broker.get_job(timeout=1.0)
+            if job is None or job["kind"] == "stop":
+                slots.release()
+                if job is None:
+                    continue
+                break
+            pool.submit(_run_job, model, broker, job).add_done_callback(lambda _: slots.release())
+
+class FarmModelProcesses(AlgorithmModelProcesses):
+    """
+    The coordinator's side of AlgorithmModelProcesses: generations, evaluations and the
+    solution are sent to the farm's workers, while the journal, score parsing and sample
+    positions stay here, so journaled runs replay as they do without a farm.
+    """
+
+    def __init__(self, farm: "WorkerFarm", journal: RunJournal = None):
+        self.farm = farm
+        self.journal = journal
+        self.LLM = None
+        self.response_cache = None
+        self.role_llms = {}
+        self.cascade = None
+        self._samples = {}
+        self._sample_lock = threading.Lock()
+
+    def set_role_models(self, role_models: Dict[str, object] = None, cascade=None) -> None:
+        if role_models or cascade is not None:
+            raise ValueError("With a WorkerFarm, role models are set on the farm and cascades are not supported")
+
+    def call(self, kind: str, key: str, role: str, **kwargs) -> Future:
+        """Future of the response text of a farm job, served from and recorded in the journal"""
+        result = Future()
+        recorded = self.journal.next_response(key) if self.journal is not None else None
+        if recorded is not None:
+            result.set_result(recorded)
+            return result
+
+        def finish(job: Future) -> None:
+            try:
+                call = job.result()
+            except Exception as error:
+                result.set_exception(error)
+                return
+            if self.journal is not None:
+                self.journal.record_llm(key, role, call["system_prompt"], call["query"], call["max_tokens"], call["temperature"], call["response"])
+            result.set_result(call["response"])
+
+        self.farm.submit(kind, **kwargs).add_done_callback(finish)
+        return result
+
+    def submit_thoughts(self, executor, state: str, initial_prompt: str, k: int = 1, accepted_solutions = None, max_steps: int = 3, current_step: int = 0) -> List[Future]:
+        """The k generations as farm jobs, executor is not needed"""
+        state_text = state if type(state) == str else "\n".join(state)
+        key = journal_key("thought", initial_prompt, state_text, current_step)
+        # Each job gets its own cache position, workers in other processes cannot see this search's cursors
+        with self._sample_lock:
+            first = self._samples.get(key, 0)
+            self._samples[key] = first + k
+        return [self.call("thought", key, "thought", state=state, initial_prompt=initial_prompt, accepted_solutions=dict(accepted_solutions or {}),
+                          max_steps=max_steps, current_step=current_step, sample=sample)
+                for sample in range(first, first + k)]
+
+    def generate_thoughts(self, state: str, initial_prompt: str, k: int = 1, accepted_solutions = None, rejected_solutions=None, max_steps: int = 3, current_step: int = 0) -> List[str]:
+        return [future.result() for future in self.submit_thoughts(None, state, initial_prompt, k, accepted_solutions, max_steps, current_step)]
+
+    def submit_evaluation(self, state: str, initial_prompt: str, previous_score: float, current_step: int = 0, previous_best_thoughts = None) -> Future:
+        state_text = state if type(state) == str else "\n".join(state)
+        return self.call("evaluate", journal_key("evaluate", initial_prompt, state_text, current_step), "evaluate", state=state, initial_prompt=initial_prompt,
+                         previous_score=previous_score, current_step=current_step, previous_best_thoughts=previous_best_thoughts)
+
+    def record_evaluation(self, state: str, current_step: int, response: str) -> Optional[float]:
+        state_text = state if type(state) == str else "\n".join(state)
+        value = self.parse_score(response)
+        if value is not None:
+            print(colored(f"Evaluated Thought Value: {value} at step: {current_step} with context being {state_text}", "green"))
+            if self.journal is not None:
+                self.journal.record_score(state_text, current_step, value)
+        return value
+
+    def evaluate_state(self, state: str, initial_prompt: str, previous_score: float, current_step: int = 0, previous_best_thoughts = None) -> Optional[float]:
+        response = self.submit_evaluation(state, initial_prompt, previous_score, current_step, previous_best_thoughts).result()
+        return self.record_evaluation(state, current_step, response)
+
+    def evaluate_states(self, states: List[str], initial_prompt: str, previous_score: float, current_step: int = 0, previous_best_thoughts = None) -> Dict[str, float]:
+        # Every evaluation is in flight at once, spread over the workers
+        futures = [(state, self.submit_evaluation(state, initial_prompt, previous_score, current_step, previous_best_thoughts)) for state in states]
+        state_values = {}
+        for state, future in futures:
+            value = self.record_evaluation(state, current_step, future.result())
+            if value is not None:
+                state_values[state] = value
+        return state_values
+
+    def generate_solution(self, initial_prompt: str, best_steps, rejected_solutions=None, alternatives=None) -> str:
+        try:
+            answer = self.call("solution", journal_key("solution", initial_prompt), "solution", initial_prompt=initial_prompt,
+                               best_steps=best_steps, rejected_solutions=rejected_solutions, alternatives=alternatives).result()
+            if not answer:
+                raise ValueError("No solution generated")
+            return [answer]
+        except Exception as e:
+            logging.error(colored(f"Error in generate_solutions: {e}", "red"))
+            return None
+
+class WorkerFarm():
+    """
+    Spreads the node expansions of AoT searches over worker processes, on this machine
+    or, through a RedisBroker, on others.
+
+    Pass the farm to AoTAgent(farm=...) (or AoTBatchSolver, which hands it to every agent):
+    the agent keeps the search tree, thought cache and journal, and its thought
+    generations, evaluations and final solution run as jobs on the workers, which build
+    the prompts, call the model and share one response cache through the broker. Many
+    searches can use one farm at the same time.
+
+    Parameters
+    ----------
+    broker : Broker
+        Where jobs and results go, a LocalBroker by default.
+    processes : int
+        Worker processes started here, 0 when only remote workers (see main) take jobs.
+    threads_per_process : int
+        Jobs each worker process runs at once.
+    model_type, model, api_key, api_base :
+        The workers' model, as for AoTAgent.
+    role_models : dict
+        Model names per role ('generate', 'evaluate', 'solve') on the same endpoint.
+    start_method : str
+        multiprocessing start method of the local workers.
+    job_timeout : float
+        Seconds a job may wait for its result before its future fails with a TimeoutError,
+        e.g. because the worker that took it died. None waits forever, which is only safe
+        while every worker is local: when all local workers have exited, the pending jobs
+        fail anyway.
+    """
+    broker: Broker
+    processes: int
+    threads_per_process: int
+    job_timeout: float
+
+    def __init__(self,
+                 broker: Broker = None,
+                 processes: int = None,
+                 threads_per_process: int = 8,
+                 model_type: str = 'OpenAI',
+                 model: str = "gpt-3.5-turbo",
+                 api_key: str = None,
+                 api_base: str = 'https://api.openai.com/v1',
+                 role_models: Dict[str, str] = None,
+                 start_method: str = "spawn",
+                 job_timeout: float = 600.0):
+        self.broker = broker if broker is not None else LocalBroker(start_method)
+        self.processes = processes if processes is not None else (os.cpu_count() or 1)
+        self.threads_per_process = threads_per_process
+        self.model_config = {"model_type": model_type, "model": model, "api_key": api_key, "api_base": api_base, "role_models": role_models or {}}
+        self.start_method = start_method
+        self.job_timeout = job_timeout
+        self.farm_id = uuid.uuid4().hex[:12]
+        self._ids = itertools.count()
+        self._futures: Dict[str, Future] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._workers = []
+        self._collector = None
+        self._closed = threading.Event()
+        self.submitted = 0
+        self.failed = 0
+        self.expired = 0
+
+    def start(self) -> "WorkerFarm":
+        context = multiprocessing.get_context(self.start_method)
+        for i in range(self.processes):
+            worker = context.Process(target=run_worker, args=(self.broker, self.model_config, self.threads_per_process),
+                                     name=f"aot-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        self._collector = threading.Thread(target=self._collect, name="aot-farm-results", daemon=True)
+        self._collector.start()
+        return self
+
+    def submit(self, kind: str, **kwargs) -> Future:
+        """Queue a job for the workers, the future resolves to its result"""
+        if self._closed.is_set():
+            raise RuntimeError("WorkerFarm is closed")
+        if self._collector is None:
+            self.start()
+        job_id = f"{self.farm_id}:{next(self._ids)}"
+        future = Future()
+        with self._lock:
+            self._futures[job_id] = future
+            if self.job_timeout is not None:
+                self._deadlines[job_id] = time.monotonic() + self.job_timeout
+            self.submitted += 1
+        self.broker.put_job({"id": job_id, "reply_to": self.farm_id, "kind": kind, "kwargs": kwargs})
+        return future
+
+    def _fail_pending(self, error: Exception, job_ids: List[str] = None) -> None:
+        """Fail the futures of job_ids, or of every pending job, whose results will never come"""
+        with self._lock:
+            job_ids = list(self._futures) if job_ids is None else job_ids
+            futures = [self._futures.pop(job_id) for job_id in job_ids if job_id in self._futures]
+            for job_id in job_ids:
+                self._deadlines.pop(job_id, None)
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+
+    def _check_pending(self) -> None:
+        """Fail jobs past their deadline, and every job once no local worker is left to run it"""
+        if self._workers and not any(worker.is_alive() for worker in self._workers):
+            self._fail_pending(RuntimeError("Every worker process of the farm exited"))
+            return
+        now = time.monotonic()
+        with self._lock:
+            expired = [job_id for job_id, deadline in self._deadlines.items() if deadline <= now]
+            self.expired += len(expired)
+        if expired:
+            logging.error(colored(f"{len(expired)} farm jobs got no result within {self.job_timeout}s", "red"))
+            self._fail_pending(TimeoutError(f"Worker job got no result within {self.job_timeout}s"), expired)
+
+    def _collect(self) -> None:
+        checked = time.monotonic()
+        while not self._closed.is_set():
+            if time.monotonic() - checked >= 1.0:
+                self._check_pending()
+                checked = time.monotonic()
+            try:
+                result = self.broker.get_result(self.farm_id, timeout=0.2)
+            except (EOFError, OSError, ConnectionError):
+                # The manager went away, nothing can answer the pending jobs anymore
+                self._fail_pending(RuntimeError("WorkerFarm broker connection lost"))
+                break
+            if result is None:
+                continue
+            with self._lock:
+                future = self._futures.pop(result["id"], None)
+                self._deadlines.pop(result["id"], None)
+                if "error" in result:
+                    self.failed += 1
+            if future is None:
+                continue
+            if "error" in result:
+                future.set_exception(RuntimeError(f"Worker job failed: {result['error']}"))
+            else:
+                future.set_result(result["result"])
+
+    def model_processes(self, journal: RunJournal = None) -> FarmModelProcesses:
+        return FarmModelProcesses(self, journal=journal)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"workers": len(self._workers), "submitted": self.submitted, "pending": len(self._futures), "failed": self.failed, "expired": self.expired}
+
+    def close(self) -> None:
+        for _ in self._workers:
+            self.broker.put_job({"kind": "stop"})
+        for worker in self._workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        self._closed.set()
+        if self._collector is not None:
+            self._collector.join(timeout=5)
+        # Nobody collects results anymore, waiters must not block forever
+        self._fail_pending(RuntimeError("WorkerFarm closed before the job finished"))
+        self.broker.close()
+
+    def __enter__(self) -> "WorkerFarm":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def main():
+    """Run worker processes on this machine for a farm whose coordinator uses a RedisBroker"""
+    parser = argparse.ArgumentParser(description="Run AoT farm workers against a Redis broker")
+    parser.add_argument("--redis", default="redis://localhost:6379/0")
+    parser.add_argument("--namespace", default="aot")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--model-type", default="OpenAI")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--api-base", default="https://api.openai.com/v1")
+    args = parser.parse_args()
+    broker = RedisBroker(args.redis, namespace=args.namespace)
+    model_config = {"model_type": args.model_type, "model": args.model, "api_key": os.environ.get("OPENAI_API_KEY", ""), "api_base": args.api_base}
+    workers = [multiprocessing.Process(target=run_worker, args=(broker, model_config, args.threads), name=f"aot-worker-{i}")
+               for i in range(args.processes)]
+    for worker in workers:
+        worker.start()
+    print(f"{len(workers)} workers taking jobs from {args.redis}")
+    for worker in workers:
+        worker.join()
+
+if __name__ == "__main__":
+    main()
+
+'''Example Usage'''
+'''if __name__ == "__main__":
+    with WorkerFarm(processes=4, threads_per_process=8, model="gpt-3.5-turbo", api_key=OPENAI_API_KEY) as farm:
+        solver = AoTBatchSolver(max_concurrent_tasks=32, farm=farm, num_thoughts=2, max_steps=3)
+        for result in solver.solve_iter(tasks):
+            print(result.task_id, result.solution)
+
+# Across machines: python -m framework.agents.AlgorithmOfThought.workerFarm --redis redis://10.0.0.5:6379/0 on every worker host,
+# and WorkerFarm(broker=RedisBroker("redis://10.0.0.5:6379/0"), processes=0) on the coordinator'''
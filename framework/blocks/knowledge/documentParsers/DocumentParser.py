@@ -3,6 +3,7 @@ from typing import Dict, Union
 from pypdf import PdfReader
 from abc import ABC, abstractmethod
 import pandas as pd
+from framework.models.TokenCounter import get_token_counter
 
 class DocumentParserBase(ABC):
     
@@ -22,6 +23,7 @@ class PDFParser(DocumentParserBase):
         document: The reader.outline or str of the document. Used in a recursive call
         reader: The PdfReader object. Used in a recursive call
         max_tokens: The maximum number of tokens to include in each bookmark section chunk.
+        encoding_name: The tiktoken encoding max_tokens is counted in.
 
     Returns:
         A dictionary mapping PDF bookmark sections to their content
@@ -29,7 +31,7 @@ class PDFParser(DocumentParserBase):
     Examples:
         Download the PDF from https://zenodo.org/record/50395 to give it a try
     """
-    def breakdown_document(document, reader: PdfReader = None, max_tokens: int = 1000, only_alphaNumeric: bool = False, bookmarks_to_ignore: set = set(), strip_bookmarks: set = set(), list_of_bookmarks = {}) -> Dict[Union[str, int], str]:
+    def breakdown_document(document, reader: PdfReader = None, max_tokens: int = 1000, only_alphaNumeric: bool = False, bookmarks_to_ignore: set = set(), strip_bookmarks: set = set(), list_of_bookmarks = {}, encoding_name: str = "cl100k_base") -> Dict[Union[str, int], str]:
         if isinstance(document, str):
             pdfReader = PdfReader(document).outline
             reader = PdfReader(document)
@@ -43,7 +45,7 @@ class PDFParser(DocumentParserBase):
             item = bookmarks[i]
             if isinstance(item, list):
                 # Recursive call with updated strip_bookmarks set
-                result.update(PDFParser.breakdown_document(document=item, reader=reader, bookmarks_to_ignore=bookmarks_to_ignore, strip_bookmarks=strip_bookmarks, list_of_bookmarks=list_of_bookmarks))
+                result.update(PDFParser.breakdown_document(document=item, reader=reader, max_tokens=max_tokens, only_alphaNumeric=only_alphaNumeric, bookmarks_to_ignore=bookmarks_to_ignore, strip_bookmarks=strip_bookmarks, list_of_bookmarks=list_of_bookmarks, encoding_name=encoding_name))
             else:
                 page_index = reader.get_destination_page_number(item)
                 bookmark_name = item.title
@@ -105,13 +107,12 @@ class PDFParser(DocumentParserBase):
                         if next_bookmark_name not in strip_bookmarks and next_bookmark_start != -1:
                             break
                         
-                    # Split the content into chunks of max_tokens
-                    tokens = bookmark_content.split()
+                    # Split the whitespace-normalised content into chunks of max_tokens model tokens
+                    chunks = get_token_counter(encoding_name).split(" ".join(bookmark_content.split()), max_tokens)
                     
-                    for j in range(0, len(tokens), max_tokens):
-                        chunk = " ".join(tokens[j:j+max_tokens])
-                        #print('Adding: ' + f"{bookmark_name}_{j//max_tokens}")
-                        result[f"{bookmark_name}_{j//max_tokens}"] = chunk 
+                    for j, chunk in enumerate(chunks):
+                        #print('Adding: ' + f"{bookmark_name}_{j}")
+                        result[f"{bookmark_name}_{j}"] = chunk.strip() 
         return result
     
     def flatten(lst):
@@ -146,6 +147,11 @@ class PDFParser(DocumentParserBase):
         #df.drop(columns=df.columns[0], axis=1, inplace=True)
         #df.columns = ['content']
         df.to_csv(csv_file, header=True)
+    
+    def save_to_columnar(data_dict: dict, file_name: str):
+        """Save the chunks as a [topic, content] Parquet (.parquet) or Arrow IPC (.arrow) file, no index column"""
+        from framework.blocks.knowledge.embeddings.ColumnarFiles import write_table
+        write_table({'topic': [str(topic) for topic in data_dict.keys()], 'content': list(data_dict.values())}, file_name)
         
 
 '''Example Usage'''
@@ -0,0 +1,187 @@
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+def _pyarrow():
+    # pyarrow is only needed by the columnar formats, the CSV paths keep working without it
+    try:
+        import pyarrow as pa
+        return pa
+    except ImportError as e:
+        raise ImportError("pyarrow is required for Parquet/Arrow files, install it with 'pip install pyarrow'") from e
+
+def file_format(path: str) -> str:
+    """'parquet' or 'arrow', from the file extension"""
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension in PARQUET_EXTENSIONS:
+        return "parquet"
+    if extension in ARROW_EXTENSIONS:
+        return "arrow"
+    raise ValueError(f"Unknown columnar file extension {extension}, use one of {PARQUET_EXTENSIONS + ARROW_EXTENSIONS}")
+
+def chunks_schema():
+    pa = _pyarrow()
+    return pa.schema([("topic", pa.string()), ("content", pa.string())])
+
+def embeddings_schema(dimension: int, text_columns: Sequence[str] = ("topic", "content")):
+    """Text columns plus an 'embeddings' column of fixed-size float32 lists"""
+    pa = _pyarrow()
+    return pa.schema([(name, pa.string()) for name in text_columns] + [("embeddings", pa.list_(pa.float32(), dimension))])
+
+def embeddings_array(vectors, dimension: int = None):
+    """Fixed-size-list float32 array from a list of vectors or a 2-D matrix, one contiguous buffer"""
+    pa = _pyarrow()
+    matrix = np.asarray(vectors, dtype=np.float32)
+    dimension = matrix.shape[-1] if dimension is None else dimension
+    matrix = matrix.reshape(-1, dimension)
+    return pa.FixedSizeListArray.from_arrays(pa.array(matrix.reshape(-1), type=pa.float32()), dimension)
+
+def embeddings_matrix(column) -> np.ndarray:
+    """(rows, dimension) float32 view of a fixed-size-list column, without a copy where possible"""
+    pa = _pyarrow()
+    if isinstance(column, pa.ChunkedArray):
+        column = pa.concat_arrays(column.chunks) if column.num_chunks != 1 else column.chunk(0)
+    dimension = column.type.list_size
+    return column.flatten().to_numpy(zero_copy_only=False).reshape(-1, dimension)
+
+class ColumnarWriter():
+    """
+    Writes a Parquet or Arrow IPC file incrementally, one batch at a time, so large
+    outputs never have to be held in memory. Parquet batches are buffered into row
+    groups of row_group_size rows, which later readers can fetch one by one.
+
+    Args:
+        path: Output file, the format comes from its extension.
+        schema: The pyarrow schema of every batch.
+        row_group_size: Rows per Parquet row group.
+        compression: Parquet compression codec.
+    """
+    path: str
+    row_group_size: int
+
+    def __init__(self, path: str, schema, row_group_size: int = 4096, compression: str = "zstd"):
+        pa = _pyarrow()
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.format = file_format(path)
+        self.rows = 0
+        self._pending: List = []
+        self._pending_rows = 0
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, schema, compression=compression)
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, schema)
+
+    def write(self, columns: Dict[str, object]) -> None:
+        """Append rows given as {column: values}, embeddings as vectors or a 2-D matrix"""
+        pa = _pyarrow()
+        arrays = []
+        for field in self.schema:
+            values = columns[field.name]
+            if pa.types.is_fixed_size_list(field.type):
+                arrays.append(embeddings_array(values, field.type.list_size))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        self.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def write_batch(self, batch) -> None:
+        self.rows += batch.num_rows
+        if self.format == "arrow":
+            self._writer.write_batch(batch)
+            return
+        self._pending.append(batch)
+        self._pending_rows += batch.num_rows
+        if self._pending_rows >= self.row_group_size:
+            self._flush_row_group()
+
+    def _flush_row_group(self) -> None:
+        pa = _pyarrow()
+        if self._pending:
+            self._writer.write_table(pa.Table.from_batches(self._pending, schema=self.schema), row_group_size=self.row_group_size)
+            self._pending = []
+            self._pending_rows = 0
+
+    def close(self) -> None:
+        if self.format == "parquet":
+            self._flush_row_group()
+            self._writer.close()
+        else:
+            self._writer.close()
+            self._sink.close()
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def write_table(columns: Dict[str, object], path: str, schema=None, row_group_size: int = 4096) -> None:
+    """Write {column: values} to a Parquet or Arrow file in one go"""
+    if schema is None:
+        schema = chunks_schema() if "embeddings" not in columns else embeddings_schema(
+            len(columns["embeddings"][0]) if len(columns["embeddings"]) else 0, [name for name in columns if name != "embeddings"])
+    with ColumnarWriter(path, schema, row_group_size=row_group_size) as writer:
+        writer.write(columns)
+
+def read_table(path: str, columns: Optional[List[str]] = None):
+    """Read a whole Parquet or Arrow file as a pyarrow Table, only the given columns"""
+    pa = _pyarrow()
+    if file_format(path) == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns)
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns else table
+
+def iter_batches(path: str, columns: Optional[List[str]] = None, batch_size: int = 1024, row_groups: Optional[Iterable[int]] = None) -> Iterator:
+    """
+    Stream a Parquet or Arrow file as record batches of at most batch_size rows, reading
+    only the given columns (and row groups, for Parquet). Arrow files are memory mapped.
+    """
+    pa = _pyarrow()
+    if file_format(path) == "parquet":
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        yield from parquet_file.iter_batches(batch_size=batch_size, columns=columns,
+                                             row_groups=list(row_groups) if row_groups is not None else None)
+        return
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns:
+                batch = batch.select(columns)
+            for start in range(0, batch.num_rows, batch_size):
+                yield batch.slice(start, batch_size)
+
+def count_rows(path: str) -> int:
+    """Row count from the file metadata, without reading the data"""
+    pa = _pyarrow()
+    if file_format(path) == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+def read_embeds_dict(path: str, key_column: str = "content") -> Dict[str, np.ndarray]:
+    """A {content: embedding} dict, as taken by the vector stores' upsert_embeddings_from_dict"""
+    embeds = {}
+    for batch in iter_batches(path, columns=[key_column, "embeddings"], batch_size=8192):
+        matrix = embeddings_matrix(batch.column(1))
+        embeds.update(zip(batch.column(0).to_pylist(), matrix))
+    return embeds
+
+'''Example Usage'''
+'''bms = PDFParser.breakdown_document("RAP.pdf", max_tokens=500)
+PDFParser.save_to_columnar(bms, "RAP.chunks.parquet")
+embeddings.columnar_to_embeds_columnar("RAP.chunks.parquet", "RAP.embeds.parquet")
+for batch in iter_batches("RAP.embeds.parquet", columns=["embeddings"], batch_size=256):
+    vectors = embeddings_matrix(batch.column(0))  # (rows, 1536) float32'''
@@ -1,8 +1,12 @@
+import codecs
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
 import openai
 import pandas as pd
 import chardet
 from abc import ABC, abstractmethod
+from framework.models.TokenCounter import get_token_counter
+from framework.tracing.Tracer import span
 
 class OpenAIEmbeddings(ABC):
     """
@@ -29,21 +33,34 @@ class OpenAIEmbeddings(ABC):
             openai.api_key = base_api_key
         
     
+    def fit_to_max_tokens(self, text):
+        # Inputs over the model's limit are rejected by the API, cut them down to max_tokens
+        counter = get_token_counter(self.embedding_encoding)
+        tokens = counter.encode(text)
+        if len(tokens) > self.max_tokens:
+            print(f"Truncating embedding input from {len(tokens)} to {self.max_tokens} tokens")
+            return counter.decode(tokens[:self.max_tokens])
+        return text
+    
     def get_embedding(self, text, model: str ='text-embedding-ada-002'):
-        # create embeddings (try-except added to avoid RateLimitError)
-        try:
-            response = openai.Embedding.create(input = text, model=model)
-        except:
-            done = False
-            count = 0
-            while not done or count == 5 :
-                sleep(5)
-                count += 1
-                try:
-                    response = openai.Embedding.create(input = text, model=model)
-                    done = True
-                except:
-                    pass
+        text = self.fit_to_max_tokens(text)
+        with span("embedding", "embedding", model=model) as traced_call:
+            # create embeddings (try-except added to avoid RateLimitError)
+            try:
+                response = openai.Embedding.create(input = text, model=model)
+            except:
+                done = False
+                count = 0
+                while not done or count == 5 :
+                    sleep(5)
+                    count += 1
+                    try:
+                        response = openai.Embedding.create(input = text, model=model)
+                        done = True
+                    except:
+                        pass
+            if traced_call:
+                traced_call.set(tokens=(response.get("usage") or {}).get("total_tokens"))
         
         return response['data'][0]['embedding']
     
@@ -117,44 +134,82 @@ class TextEmbeddings(OpenAIEmbeddings):
             print(content[i],embeds[content[i]])
         return embeds
     
-    # Convert an unfiltered CSV file to a CSV file with a new embeddings cell for each contnt cell
-    def unfiltered_csv_to_embeds_csv(self, data_path: str, output_path: str, model: str ='text-embedding-ada-002'):
-        # Read the file with the detected encoding
+    # Convert a {topic:content} dict to a [topic, content, embeddings] Parquet/Arrow file with a float32 embeddings column
+    def dict_to_embeds_columnar(self, data_dict: dict, output_path: str, model: str ='text-embedding-ada-002', batch_size: int = 256):
+        topics = [str(topic) for topic in data_dict.keys()]
+        contents = list(data_dict.values())
+        self._write_embeds_columnar(output_path, ((topics[i:i+batch_size], contents[i:i+batch_size]) for i in range(0, len(topics), batch_size)), model)
+    
+    # Convert a [topic, content] Parquet/Arrow file to a [topic, content, embeddings] one, streamed batch by batch
+    def columnar_to_embeds_columnar(self, data_path: str, output_path: str, model: str ='text-embedding-ada-002', batch_size: int = 256):
+        from framework.blocks.knowledge.embeddings.ColumnarFiles import iter_batches
+        batches = ((batch.column(0).to_pylist(), batch.column(1).to_pylist())
+                   for batch in iter_batches(data_path, columns=['topic', 'content'], batch_size=batch_size))
+        self._write_embeds_columnar(output_path, batches, model)
+    
+    def _write_embeds_columnar(self, output_path: str, batches, model: str):
+        from framework.blocks.knowledge.embeddings.ColumnarFiles import ColumnarWriter, embeddings_schema
+        writer = None
         try:
-            # Try common file encodings
-            encoding = self.try_encodings(data_path)
-            df = pd.read_csv(data_path, encoding=encoding,  header=None)
-        except:
-            # Detect the file's encoding
-            with open(data_path, 'rb') as f:
-                result = chardet.detect(f.read())
-            df = pd.read_csv(data_path, encoding=result['encoding'], header=None)
+            for topics, contents in batches:
+                vectors = [self.get_embedding(str(content), model=model) for content in contents]
+                if writer is None:
+                    # The dimension is only known once the first embedding is back
+                    writer = ColumnarWriter(output_path, embeddings_schema(len(vectors[0])))
+                writer.write({'topic': topics, 'content': [str(content) for content in contents], 'embeddings': vectors})
+        finally:
+            if writer is not None:
+                writer.close()
+    
+    # Convert an unfiltered CSV file to a CSV file with a new embeddings cell for each contnt cell
+    # The file is streamed chunksize rows at a time and each chunk is appended to the output as soon as it is embedded,
+    # so memory stays bounded. Per chunk only the unique non-empty values are embedded, empty cells get an empty embeddings cell.
+    def unfiltered_csv_to_embeds_csv(self, data_path: str, output_path: str, model: str ='text-embedding-ada-002', chunksize: int = 1000, max_workers: int = 8):
+        # Detect the encoding from a sample instead of reading the whole file
+        encoding = self.try_encodings(data_path)
+        reader = pd.read_csv(data_path, encoding=encoding, encoding_errors='replace', header=None, dtype=str, keep_default_na=False, chunksize=chunksize)
 
-        # Create a new DataFrame to store the embeddings
-        df_embeddings = pd.DataFrame()
+        calls = cells = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for n, df in enumerate(reader):
+                # Embed every distinct non-empty value of the chunk once
+                values = {str(value) for column in df.columns for value in df[column] if str(value).strip()}
+                values = list(values)
+                embeds = dict(zip(values, pool.map(lambda value: self.get_embedding(value, model=model), values)))
+                calls += len(values)
+                cells += df.size
 
-        # Iterate over each column in the DataFrame
-        for column in df.columns:
-            # Handle NaN values
-            df[column] = df[column].fillna('')
-            # Add the original column to the new DataFrame
-            df_embeddings[str(column)] = df[column]
-            # Add the embeddings column to the new DataFrame
-            df_embeddings['embeddings_' + str(column)] = df[column].apply(lambda x: [self.get_embedding(str(x), model=model)])
+                # Create a new DataFrame to store the embeddings
+                df_embeddings = pd.DataFrame(index=df.index)
+                # Iterate over each column in the DataFrame
+                for column in df.columns:
+                    # Add the original column to the new DataFrame
+                    df_embeddings[str(column)] = df[column]
+                    # Add the embeddings column to the new DataFrame
+                    df_embeddings['embeddings_' + str(column)] = df[column].map(lambda x: [embeds[str(x)]] if str(x) in embeds else '')
 
-        # Save the DataFrame to a CSV file
-        df_embeddings.to_csv(output_path, index=False)
+                # Append the chunk to the CSV file, the header is written with the first one
+                df_embeddings.to_csv(output_path, index=False, mode='w' if n == 0 else 'a', header=(n == 0))
+        print(f"Embedded {calls} unique values for {cells} cells")
 
-    # Detect the encoding of a CSV file
-    def try_encodings(data_path):
-        encodings = ['utf-8', 'iso-8859-1', 'windows-1252']  # Add more encodings if necessary
-        for enc in encodings:
-            try:
-                df = pd.read_csv(data_path, encoding=enc)
-                return df
-            except UnicodeDecodeError:
-                pass
-        raise ValueError('None of the tried encodings work')
+    # Detect the encoding of a CSV file from its first sample_size bytes
+    @staticmethod
+    def try_encodings(data_path, sample_size: int = 1 << 20):
+        with open(data_path, 'rb') as f:
+            sample = f.read(sample_size)
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        try:
+            # Incremental decoding tolerates a multi-byte character cut off at the end of the sample
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+        detected = chardet.detect(sample)
+        if detected['encoding'] and detected['confidence'] >= 0.5:
+            return detected['encoding']
+        # A low confidence guess is worse than the western default, which decodes nearly any byte
+        return 'windows-1252'
 
 
 '''from dotenv import load_dotenv
@@ -0,0 +1,232 @@
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+QUANTIZERS = ("int8", "pq")
+
+class ScalarQuantizer():
+    """
+    int8 scalar quantization, 1 byte per dimension instead of 4 (4x smaller).
+
+    Each dimension is mapped linearly from its [min, max] over the training vectors onto
+    the 256 int8 levels, values outside the range are clipped.
+    """
+    kind = "int8"
+    dimension: int
+    trained: bool
+
+    def __init__(self, dimension: int = 1536):
+        self.dimension = dimension
+        self.low = np.zeros(dimension, dtype=np.float32)
+        self.scale = np.ones(dimension, dtype=np.float32)
+        self.trained = False
+
+    @property
+    def code_size(self) -> int:
+        return self.dimension
+
+    @property
+    def code_dtype(self):
+        return np.int8
+
+    def train(self, vectors: np.ndarray) -> "ScalarQuantizer":
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        self.low = vectors.min(axis=0)
+        self.scale = np.maximum(vectors.max(axis=0) - self.low, 1e-12) / 255.0
+        self.trained = True
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        levels = np.rint((vectors - self.low) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) + 128.0) * self.scale + self.low
+
+    def dot(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Inner product of the query with every encoded row, without decoding them"""
+        return codes.astype(np.float32) @ (query * self.scale) + float((128.0 * self.scale + self.low) @ query)
+
+    def squared_distance(self, codes: np.ndarray, query: np.ndarray, block: int = 16384) -> np.ndarray:
+        """Squared euclidean distance of the query to every encoded row, decoded in blocks"""
+        distances = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block):
+            distances[start:start + block] = ((self.decode(codes[start:start + block]) - query) ** 2).sum(axis=1)
+        return distances
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"low": self.low, "scale": self.scale}
+
+    @classmethod
+    def from_state(cls, dimension: int, state: Dict[str, np.ndarray]) -> "ScalarQuantizer":
+        quantizer = cls(dimension)
+        quantizer.low = np.asarray(state["low"], dtype=np.float32)
+        quantizer.scale = np.asarray(state["scale"], dtype=np.float32)
+        quantizer.trained = True
+        return quantizer
+
+class ProductQuantizer():
+    """
+    Product quantization: the vector is cut into n_subvectors slices and each slice is
+    replaced by the index of its nearest centroid from a per-slice k-means codebook.
+
+    A 1536-dim float32 vector (6144 bytes) becomes n_subvectors bytes, 192 by default (32x
+    smaller). Queries are scored by asymmetric distance computation: one table of query-to-
+    centroid scores per slice, then a lookup and sum per row.
+
+    Args:
+        dimension: The vector length, must be divisible by n_subvectors.
+        n_subvectors: Bytes per encoded vector.
+        n_centroids: Codebook size per slice, at most 256 so codes fit in a byte.
+        iterations: k-means iterations when training.
+        max_train: Training vectors are sampled down to this many.
+        seed: Seed of the k-means initialisation and sampling.
+    """
+    kind = "pq"
+    dimension: int
+    n_subvectors: int
+    n_centroids: int
+    trained: bool
+
+    def __init__(self, dimension: int = 1536, n_subvectors: int = 192, n_centroids: int = 256, iterations: int = 20, max_train: int = 50000, seed: int = 0):
+        if dimension % n_subvectors:
+            raise ValueError(f"dimension {dimension} is not divisible by n_subvectors {n_subvectors}")
+        if not 1 <= n_centroids <= 256:
+            raise ValueError("n_centroids must be between 1 and 256")
+        self.dimension = dimension
+        self.n_subvectors = n_subvectors
+        self.n_centroids = n_centroids
+        self.iterations = iterations
+        self.max_train = max_train
+        self.seed = seed
+        self.sub_dimension = dimension // n_subvectors
+        self.codebooks = np.zeros((n_subvectors, n_centroids, self.sub_dimension), dtype=np.float32)
+        self.trained = False
+
+    @property
+    def code_size(self) -> int:
+        return self.n_subvectors
+
+    @property
+    def code_dtype(self):
+        return np.uint8
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        # (rows, dimension) -> (n_subvectors, rows, sub_dimension)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.n_subvectors, self.sub_dimension)
+        return vectors.transpose(1, 0, 2)
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (points ** 2).sum(axis=1)[:, None] - 2 * points @ centroids.T + (centroids ** 2).sum(axis=1)[None, :]
+        return distances.argmin(axis=1)
+
+    def train(self, vectors: np.ndarray) -> "ProductQuantizer":
+        rng = np.random.default_rng(self.seed)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if len(vectors) > self.max_train:
+            vectors = vectors[rng.choice(len(vectors), self.max_train, replace=False)]
+        # Fewer training vectors than centroids would leave empty clusters, shrink the codebook
+        self.n_centroids = min(self.n_centroids, len(vectors))
+        self.codebooks = np.zeros((self.n_subvectors, self.n_centroids, self.sub_dimension), dtype=np.float32)
+        for m, points in enumerate(self._split(vectors)):
+            centroids = points[rng.choice(len(points), self.n_centroids, replace=False)].copy()
+            for _ in range(self.iterations):
+                assignment = self._nearest(points, centroids)
+                counts = np.bincount(assignment, minlength=self.n_centroids)
+                sums = np.stack([np.bincount(assignment, weights=points[:, j], minlength=self.n_centroids) for j in range(self.sub_dimension)], axis=1)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            self.codebooks[m] = centroids
+        self.trained = True
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        slices = self._split(vectors)
+        codes = np.empty((slices.shape[1], self.n_subvectors), dtype=np.uint8)
+        for m, points in enumerate(slices):
+            codes[:, m] = self._nearest(points, self.codebooks[m])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        codes = codes.reshape(-1, self.n_subvectors)
+        parts = [self.codebooks[m][codes[:, m]] for m in range(self.n_subvectors)]
+        return np.concatenate(parts, axis=1)
+
+    def _lookup(self, codes: np.ndarray, table: np.ndarray, block: int = 16384) -> np.ndarray:
+        # Sum the per-slice table entries picked by each row's codes, in blocks to bound memory
+        scores = np.empty(len(codes), dtype=np.float32)
+        columns = np.arange(self.n_subvectors)
+        for start in range(0, len(codes), block):
+            scores[start:start + block] = table[columns, codes[start:start + block]].sum(axis=1)
+        return scores
+
+    def dot(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate inner product of the query with every encoded row"""
+        table = np.einsum("mkd,md->mk", self.codebooks, self._split(query)[:, 0, :])
+        return self._lookup(codes, table)
+
+    def squared_distance(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate squared euclidean distance of the query to every encoded row"""
+        table = ((self.codebooks - self._split(query)) ** 2).sum(axis=2)
+        return self._lookup(codes, table)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    @classmethod
+    def from_state(cls, dimension: int, state: Dict[str, np.ndarray]) -> "ProductQuantizer":
+        codebooks = np.asarray(state["codebooks"], dtype=np.float32)
+        quantizer = cls(dimension, n_subvectors=codebooks.shape[0], n_centroids=codebooks.shape[1])
+        quantizer.codebooks = codebooks
+        quantizer.trained = True
+        return quantizer
+
+Quantizer = Union[ScalarQuantizer, ProductQuantizer]
+
+def get_quantizer(kind: str, dimension: int = 1536, **kwargs) -> Quantizer:
+    """Build a quantizer by name, 'int8' or 'pq', kwargs go to ProductQuantizer"""
+    if kind == "int8":
+        return ScalarQuantizer(dimension)
+    if kind == "pq":
+        return ProductQuantizer(dimension, **kwargs)
+    raise ValueError(f"Invalid quantizer {kind}, choose from {QUANTIZERS}")
+
+def save_quantized_embeds(embeds: dict, path: str, quantizer: Optional[Quantizer] = None, keep_float32: bool = False) -> Quantizer:
+    """
+    Write a {content: embeddings} dict as a compressed .npz of codes, the quantizer's
+    parameters and the contents, instead of a CSV of float lists. The quantizer is trained
+    on the embeddings when it is not trained yet. keep_float32 also stores the original
+    vectors so they can be used for re-ranking.
+    """
+    contents = list(embeds.keys())
+    vectors = np.asarray([np.asarray(embeds[content], dtype=np.float32) for content in contents], dtype=np.float32)
+    if quantizer is None:
+        quantizer = ScalarQuantizer(vectors.shape[1])
+    if not quantizer.trained:
+        quantizer.train(vectors)
+    arrays = {f"quantizer_{name}": value for name, value in quantizer.state().items()}
+    if keep_float32:
+        arrays["float32"] = vectors
+    np.savez_compressed(path, kind=quantizer.kind, dimension=vectors.shape[1], contents=np.asarray(contents, dtype=str),
+                        codes=quantizer.encode(vectors), **arrays)
+    return quantizer
+
+def load_quantized_embeds(path: str, decode: bool = True):
+    """
+    Read a file written by save_quantized_embeds. Returns ({content: vector}, quantizer),
+    the vectors are decoded approximations unless decode is False, then they are the codes.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        kind, dimension = str(data["kind"]), int(data["dimension"])
+        state = {name[len("quantizer_"):]: data[name] for name in data.files if name.startswith("quantizer_")}
+        quantizer = (ScalarQuantizer if kind == "int8" else ProductQuantizer).from_state(dimension, state)
+        codes = data["codes"]
+        rows = quantizer.decode(codes) if decode else codes
+        return dict(zip(data["contents"].tolist(), rows)), quantizer
+
+'''Example Usage'''
+'''embeds = embeddings.dict_to_embeds_dict(data_dict=bms, model='text-embedding-ada-002')
+save_quantized_embeds(embeds, "RAP.pq.npz", quantizer=ProductQuantizer(1536, n_subvectors=192))
+approximate_embeds, pq = load_quantized_embeds("RAP.pq.npz")'''
@@ -0,0 +1,176 @@
+import json
+import math
+import re
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Union
+
+import numpy as np
+
+SparseVector = Dict[str, list]
+
+DEFAULT_STOPWORDS = frozenset("""
+a an and are as at be but by for from has have if in into is it its of on or such that the their then there these
+they this to was were will with which what when where who how
+""".split())
+
+class SparseMatrix():
+    """
+    Compact CSR storage for many sparse vectors: one uint32 index array, one float32
+    value array and the row offsets into them, instead of a list of dicts per row.
+    """
+    indptr: np.ndarray
+    indices: np.ndarray
+    values: np.ndarray
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, values: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.values = values
+
+    @classmethod
+    def from_vectors(cls, vectors: List[SparseVector]) -> "SparseMatrix":
+        indptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+        for i, vector in enumerate(vectors):
+            indptr[i + 1] = indptr[i] + len(vector["indices"])
+        indices = np.fromiter((index for vector in vectors for index in vector["indices"]), dtype=np.uint32, count=int(indptr[-1]))
+        values = np.fromiter((value for vector in vectors for value in vector["values"]), dtype=np.float32, count=int(indptr[-1]))
+        return cls(indptr, indices, values)
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def row(self, i: int) -> SparseVector:
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return {"indices": self.indices[start:end].tolist(), "values": self.values[start:end].tolist()}
+
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.indices.nbytes + self.values.nbytes
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, indptr=self.indptr, indices=self.indices, values=self.values)
+
+    @classmethod
+    def load(cls, path: str) -> "SparseMatrix":
+        data = np.load(path)
+        return cls(data["indptr"], data["indices"], data["values"])
+
+class BM25Encoder():
+    """
+    Local BM25 sparse encoder, fitted over the chunks PDFParser produces.
+
+    Tokens are hashed to stable uint32 indices (crc32), so no vocabulary has to be shipped
+    with the vectors and the output is directly usable as Pinecone sparse_values.
+    Documents are encoded with BM25's saturated, length-normalised term frequency and
+    queries with each term's IDF, so the dot product of a query and a document vector is
+    the document's BM25 score for that query.
+
+    Args:
+        k1: Term frequency saturation.
+        b: Document length normalisation.
+        stopwords: Lower-case tokens that are ignored.
+    """
+    k1: float
+    b: float
+    n_docs: int
+    avg_doc_length: float
+    doc_freq: Dict[int, int]
+
+    _token_pattern = re.compile(r"[a-z0-9]+(?:[._\-+#][a-z0-9]+)*")
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, stopwords: Iterable[str] = DEFAULT_STOPWORDS):
+        self.k1 = k1
+        self.b = b
+        self.stopwords = frozenset(stopwords)
+        self.n_docs = 0
+        self.avg_doc_length = 0.0
+        self.doc_freq = {}
+
+    def tokenize(self, text: str) -> List[str]:
+        # Keeps technical terms like gpt-3.5, c++ or node.js together
+        return [token for token in self._token_pattern.findall(str(text).lower()) if token not in self.stopwords]
+
+    @staticmethod
+    def hash_token(token: str) -> int:
+        return zlib.crc32(token.encode("utf-8"))
+
+    def _term_counts(self, text: str) -> Counter:
+        return Counter(self.hash_token(token) for token in self.tokenize(text))
+
+    def fit(self, corpus: Union[Iterable[str], Dict[str, str]]) -> "BM25Encoder":
+        """Learn document frequencies and the average length, a dict is read as {topic: content}"""
+        texts = corpus.values() if isinstance(corpus, dict) else corpus
+        doc_freq = Counter()
+        total_length = 0
+        n_docs = 0
+        for text in texts:
+            counts = self._term_counts(text)
+            doc_freq.update(counts.keys())
+            total_length += sum(counts.values())
+            n_docs += 1
+        self.n_docs = n_docs
+        self.avg_doc_length = total_length / n_docs if n_docs else 0.0
+        self.doc_freq = dict(doc_freq)
+        return self
+
+    def idf(self, index: int) -> float:
+        df = self.doc_freq.get(index, 0)
+        return math.log((self.n_docs - df + 0.5) / (df + 0.5) + 1.0)
+
+    def encode_document(self, text: str) -> SparseVector:
+        if not self.n_docs:
+            raise ValueError("BM25Encoder must be fitted before encoding")
+        counts = self._term_counts(text)
+        length = sum(counts.values())
+        norm = self.k1 * (1.0 - self.b + self.b * length / self.avg_doc_length) if self.avg_doc_length else self.k1
+        indices = sorted(counts)
+        return {"indices": indices, "values": [counts[i] * (self.k1 + 1.0) / (counts[i] + norm) for i in indices]}
+
+    def encode_query(self, text: str) -> SparseVector:
+        if not self.n_docs:
+            raise ValueError("BM25Encoder must be fitted before encoding")
+        indices = sorted(set(self._term_counts(text)))
+        return {"indices": indices, "values": [self.idf(i) for i in indices]}
+
+    def encode_documents(self, texts: Iterable[str]) -> List[SparseVector]:
+        return [self.encode_document(text) for text in texts]
+
+    def encode_queries(self, texts: Iterable[str]) -> List[SparseVector]:
+        return [self.encode_query(text) for text in texts]
+
+    def encode_corpus(self, texts: Iterable[str]) -> SparseMatrix:
+        """Encode documents straight into compact CSR arrays"""
+        return SparseMatrix.from_vectors(self.encode_documents(texts))
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "n_docs": self.n_docs, "avg_doc_length": self.avg_doc_length,
+                       "stopwords": sorted(self.stopwords),
+                       "doc_freq": [[index, df] for index, df in self.doc_freq.items()]}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Encoder":
+        with open(path, encoding="utf-8") as f:
+            params = json.load(f)
+        encoder = cls(k1=params["k1"], b=params["b"], stopwords=params["stopwords"])
+        encoder.n_docs = params["n_docs"]
+        encoder.avg_doc_length = params["avg_doc_length"]
+        encoder.doc_freq = {int(index): df for index, df in params["doc_freq"]}
+        return encoder
+
+def hybrid_scale(dense: List[float], sparse: SparseVector, alpha: float):
+    """
+    Weight a dense and a sparse query for a single dotproduct hybrid search,
+    alpha=1 is dense only and alpha=0 is sparse only.
+    """
+    if not 0 <= alpha <= 1:
+        raise ValueError("alpha must be between 0 and 1")
+    return ([value * alpha for value in dense],
+            {"indices": list(sparse["indices"]), "values": [value * (1 - alpha) for value in sparse["values"]]})
+
+'''Example Usage'''
+'''chunks = PDFParser.breakdown_document("RAP.pdf", max_tokens=500)
+bm25 = BM25Encoder().fit(chunks)
+bm25.save("RAP.bm25.json")
+sparse = bm25.encode_documents(chunks.values())
+query_sparse = bm25.encode_query("monte carlo tree search rollout")'''
@@ -1,6 +1,8 @@
-from typing import List
+from typing import List, Tuple
 from framework.blocks.tools import Tool
 from abc import ABC, abstractmethod
+from string import Formatter
+from framework.models.TokenCounter import get_token_counter
 
 class PromptBase(ABC):
     
@@ -40,6 +42,97 @@ class PromptTemplate(PromptBase):
     def __str__(self):
         return self.format_messages(template=self.template, tools=self.tools, input_variables=self.input_variables)
     
+    def compile(self, encoding_name: str = "cl100k_base") -> "CompiledPromptTemplate":
+        return CompiledPromptTemplate(self.template, self.tools, self.input_variables, encoding_name)
+    
+    
+class CompiledPromptTemplate(PromptBase):
+    """
+    A PromptTemplate parsed once.
+    
+    The tools, tool names and fixed input_variables are rendered when the template is
+    compiled and merged with the literal text around them, so format_messages only fills
+    the dynamic fields and joins the pieces. Token counts of the static text are cached,
+    which makes count_tokens a cheap prompt-size check before calling the model.
+    """
+    template: str
+    tools: List[Tool.Tool]
+    input_variables: dict[str: any]
+    encoding_name: str
+    # Rendered pieces, a None entry is filled by the dynamic field at the same index of _fields
+    _parts: List[str]
+    _fields: List[Tuple[str, str, str]]
+    
+    _formatter = Formatter()
+    
+    def __init__(self, template, tools, input_variables, encoding_name: str = "cl100k_base"):
+        self.template = template
+        self.tools = tools
+        self.input_variables = input_variables
+        self.encoding_name = encoding_name
+        
+        static = dict(input_variables)
+        static["tools"] = "\n".join([f"{tool.name}: {tool.description}" for tool in tools])
+        static["tool_names"] = ", ".join([tool.name for tool in tools])
+        
+        self._parts = []
+        self._fields = []
+        text = []
+        for literal, field_name, format_spec, conversion in self._formatter.parse(template):
+            text.append(literal)
+            if field_name is None:
+                continue
+            if field_name.split(".")[0].split("[")[0] in static and "{" not in (format_spec or ""):
+                text.append(self._render_field(field_name, format_spec, conversion, static))
+            else:
+                self._parts.append("".join(text))
+                text = []
+                self._parts.append(None)
+                self._fields.append((field_name, format_spec, conversion))
+        self._parts.append("".join(text))
+        self._static_tokens = None
+        
+    @property
+    def dynamic_fields(self) -> List[str]:
+        return [field_name for field_name, _, _ in self._fields]
+        
+    def _render_field(self, field_name, format_spec, conversion, values) -> str:
+        value, _ = self._formatter.get_field(field_name, (), values)
+        value = self._formatter.convert_field(value, conversion)
+        if format_spec and "{" in format_spec:
+            format_spec = self._formatter.vformat(format_spec, (), values)
+        return self._formatter.format_field(value, format_spec or "")
+        
+    def format_messages(self, *args, **kwargs) -> str:
+        parts = list(self._parts)
+        fields = iter(self._fields)
+        for i, part in enumerate(parts):
+            if part is None:
+                field_name, format_spec, conversion = next(fields)
+                parts[i] = self._render_field(field_name, format_spec, conversion, kwargs)
+        return "".join(parts)
+        
+    @property
+    def static_tokens(self) -> int:
+        """Tokens in the pre-rendered text, counted once"""
+        if self._static_tokens is None:
+            self._static_tokens = sum(get_token_counter(self.encoding_name).count_batch([part for part in self._parts if part]))
+        return self._static_tokens
+        
+    def count_tokens(self, **kwargs) -> int:
+        """
+        Token count of the prompt for these dynamic values, only the dynamic values are encoded.
+        Tokens can merge across a field boundary, so this may be off by a token or two per field.
+        """
+        values = [self._render_field(field_name, format_spec, conversion, kwargs) for field_name, format_spec, conversion in self._fields]
+        return self.static_tokens + sum(get_token_counter(self.encoding_name).count_batch(values))
+        
+    def fits(self, max_tokens: int, **kwargs) -> bool:
+        return self.count_tokens(**kwargs) <= max_tokens
+        
+    def __str__(self):
+        return self.format_messages()
+    
     
 #Example usage
 '''from search import search
@@ -0,0 +1,117 @@
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from framework.blocks.knowledge.vectorStores.LocalVectorStore import LocalVectorStore
+
+class FakeIndex():
+    """
+    An index of FakePinecone: a LocalVectorStore, which already answers upsert, query,
+    fetch, delete and describe_index_stats in Pinecone's shapes, behind the data plane
+    latency of its FakePinecone.
+    """
+    def __init__(self, service: "FakePinecone", name: str, store: LocalVectorStore):
+        self.service = service
+        self.name = name
+        self.store = store
+
+    def upsert(self, vectors: list, namespace: str = None, **kwargs) -> Dict[str, int]:
+        self.service._call("upsert", self.service.latency)
+        return self.store.upsert(vectors, namespace=namespace)
+
+    def query(self, namespace: str = None, **kwargs) -> Dict[str, Any]:
+        self.service._call("query", self.service.latency)
+        kwargs.pop("queries", None)
+        return self.store.query(namespace=namespace, **kwargs)
+
+    def fetch(self, ids: List[str], namespace: str = None, **kwargs) -> Dict[str, Any]:
+        self.service._call("fetch", self.service.latency)
+        return self.store.fetch(ids, namespace=namespace)
+
+    def delete(self, ids: List[str] = None, namespace: str = None, delete_all: bool = False, **kwargs) -> Dict[str, Any]:
+        self.service._call("delete", self.service.latency)
+        return self.store.delete(ids, namespace=namespace, delete_all=delete_all)
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        self.service._call("describe_index_stats", self.service.latency)
+        return self.store.describe_index_stats()
+
+    def close(self) -> None:
+        pass
+
+class FakePinecone():
+    """
+    In-process stand-in for the pinecone module, for offline tests and benchmarks.
+    Give it to a PineconePool as its client and the Pinecone wrapper runs unchanged
+    against local indexes.
+
+    Calls are counted in calls. The delays mimic the round trips to the service:
+    control_latency for init, list_indexes, create_index and describe_index, plus one
+    more for the whoami lookup of an init without a project name. latency applies to
+    every index operation.
+
+    Args:
+        latency: Seconds added to every upsert, query, fetch, delete and stats call.
+        control_latency: Seconds added to every control plane call, latency when None.
+        project_name: Project name whoami reports.
+    """
+    latency: float
+    control_latency: float
+
+    def __init__(self, latency: float = 0.0, control_latency: float = None, project_name: str = "fake-project"):
+        self.latency = latency
+        self.control_latency = latency if control_latency is None else control_latency
+        self.project_name = project_name
+        self.indexes: Dict[str, LocalVectorStore] = {}
+        self.Config = SimpleNamespace(API_KEY=None, ENVIRONMENT=None, PROJECT_NAME=None)
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _call(self, name: str, delay: float) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if delay > 0:
+            time.sleep(delay)
+
+    def init(self, api_key: str = None, environment: str = None, project_name: str = None, **kwargs) -> None:
+        self._call("init", self.control_latency)
+        if not project_name:
+            self._call("whoami", self.control_latency)
+            project_name = self.project_name
+        self.Config = SimpleNamespace(API_KEY=api_key, ENVIRONMENT=environment, PROJECT_NAME=project_name)
+
+    def list_indexes(self) -> List[str]:
+        self._call("list_indexes", self.control_latency)
+        with self._lock:
+            return list(self.indexes)
+
+    def create_index(self, name: str, dimension: int, metric: str = 'cosine', **kwargs) -> None:
+        self._call("create_index", self.control_latency)
+        with self._lock:
+            if name in self.indexes:
+                raise ValueError(f"Index {name} already exists")
+            self.indexes[name] = LocalVectorStore(dimension=dimension, metric=metric)
+
+    def describe_index(self, name: str) -> Dict[str, Any]:
+        self._call("describe_index", self.control_latency)
+        store = self.indexes[name]
+        return {"name": name, "dimension": store.dimension, "metric": store.metric, "replicas": 1, "shards": 1,
+                "pods": 1, "pod_type": "fake", "status": {"ready": True, "state": "Ready"}}
+
+    def delete_index(self, name: str, **kwargs) -> None:
+        self._call("delete_index", self.control_latency)
+        with self._lock:
+            del self.indexes[name]
+
+    def Index(self, name: str, pool_threads: int = 1) -> FakeIndex:
+        if name not in self.indexes:
+            raise ValueError(f"Index {name} does not exist")
+        return FakeIndex(self, name, self.indexes[name])
+
+'''Example Usage'''
+'''service = FakePinecone(latency=0.005, control_latency=0.2)
+store = Pinecone(api_key="offline", index_name="library", pool=PineconePool(client=service))
+store.upsert_embeddings_from_dict(embeds, document="RAP.pdf")
+print(store.query(vector=embeds[line], top_k=3, include_metadata=True))
+print(service.calls)  # one init, whoami and list_indexes however many wrappers are built'''
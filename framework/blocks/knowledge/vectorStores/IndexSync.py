@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List
+
+from framework.blocks.knowledge.vectorStores.Partitions import namespace_router
+
+def document_key(document: str) -> str:
+    """Short stable key of a document name, e.g. its path relative to the library root"""
+    return hashlib.sha1(str(document).encode("utf-8")).hexdigest()[:12]
+
+def document_name(path: str, root: str) -> str:
+    """A document's path relative to root with '/' separators, the same wherever the library is moved"""
+    return os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/")
+
+def content_id(content: str, document: str = "") -> str:
+    """
+    Stable vector ID of a chunk: '<document key>#<hash of content>'. The same chunk gets
+    the same ID on every ingestion, whether it goes through IndexSync or
+    upsert_embeddings_from_dict, chunks of different documents never collide, and all IDs
+    of a document share its prefix. The bookmark is metadata, not part of the ID.
+    """
+    digest = hashlib.sha1(str(content).encode("utf-8")).hexdigest()[:32]
+    return f"{document_key(document)}#{digest}" if document else digest
+
+def chunk_bookmark(chunk_key: str) -> str:
+    # PDFParser keys chunks as '<bookmark>_<chunk number>'
+    return chunk_key.rsplit("_", 1)[0] if "_" in str(chunk_key) else str(chunk_key)
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IndexManifest():
+    """
+    JSON record of what is in a vector index: per document (its path relative to the
+    library root) its file hash, size and modification time and the IDs of its chunks
+    with their bookmarks.
+
+    Args:
+        path: The manifest file, created on the first save.
+    """
+    path: str
+    documents: Dict[str, Dict[str, Any]]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.documents = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.documents = json.load(f).get("documents", {})
+
+    def save(self) -> None:
+        # Write to a temporary file and swap it in, a crash never leaves a half written manifest
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "documents": self.documents}, f, ensure_ascii=False, indent=1)
+        os.replace(temporary, self.path)
+
+    def chunk_ids(self, document: str) -> List[str]:
+        return list(self.documents.get(document, {}).get("chunks", {}))
+
+    def is_unchanged(self, document: str, path: str) -> bool:
+        """True when the file still has the recorded content, the hash is only computed when size or mtime moved"""
+        record = self.documents.get(document)
+        if record is None:
+            return False
+        stat = os.stat(path)
+        if record.get("size") == stat.st_size and record.get("mtime") == stat.st_mtime:
+            return True
+        if record.get("file_hash") == file_hash(path):
+            record["size"], record["mtime"] = stat.st_size, stat.st_mtime
+            return True
+        return False
+
+    def record(self, document: str, path: str, chunks: Dict[str, Dict[str, str]]) -> None:
+        stat = os.stat(path)
+        self.documents[document] = {"file_hash": file_hash(path), "size": stat.st_size, "mtime": stat.st_mtime,
+                                    "indexed_at": time.time(), "chunks": chunks}
+
+    def remove(self, document: str) -> None:
+        self.documents.pop(document, None)
+
+class SyncReport():
+    """What a sync changed"""
+
+    def __init__(self):
+        self.upserted = 0
+        self.deleted = 0
+        self.unchanged = 0
+        self.skipped_documents: List[str] = []
+        self.synced_documents: List[str] = []
+        self.removed_documents: List[str] = []
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (f"SyncReport(upserted={self.upserted}, deleted={self.deleted}, unchanged={self.unchanged}, "
+                f"synced={len(self.synced_documents)}, skipped={len(self.skipped_documents)}, "
+                f"removed={len(self.removed_documents)}, seconds={self.seconds:.2f})")
+
+class IndexSync():
+    """
+    Keeps a vector index in step with a library of PDFs, touching only what changed.
+
+    Unchanged files (same size and mtime, or same content hash) are not parsed at all.
+    Changed files are parsed, and their chunks are given stable content IDs (content_id).
+    Only the chunks whose ID is not in the manifest are embedded and upserted, and IDs
+    that disappeared are deleted. The manifest is saved after every document, so an
+    interrupted sync continues where it stopped.
+
+    Args:
+        store: Vector store with upsert(vectors) and delete(ids), e.g. Pinecone or LocalVectorStore.
+        embeddings: TextEmbeddings-like object with get_embedding(text), or a function text -> vector.
+        manifest: The manifest, or a path to one.
+        metadata_name: Metadata field the chunk text is stored under.
+        max_workers: Embedding calls made at once.
+        batch_size: Vectors per upsert call.
+        partition_by: Namespace of each document's chunks: None for the default namespace,
+            'document' for one namespace per document, or a dict or function mapping a
+            document name to its namespace, e.g. its tenant's.
+        root: Directory documents are named relative to, so equally named files in
+            different folders stay apart and a moved library keeps its IDs. The current
+            directory when None.
+        parse_kwargs: Passed to PDFParser.breakdown_document, e.g. max_tokens.
+    """
+    manifest: IndexManifest
+    root: str
+
+    def __init__(self, store, embeddings, manifest, metadata_name: str = 'content', max_workers: int = 8, batch_size: int = 32, partition_by=None, root: str = None, **parse_kwargs):
+        self.store = store
+        self._embed = embeddings.get_embedding if hasattr(embeddings, "get_embedding") else embeddings
+        self.manifest = manifest if isinstance(manifest, IndexManifest) else IndexManifest(manifest)
+        self.metadata_name = metadata_name
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.namespace_for = namespace_router(partition_by)
+        self.root = os.path.abspath(root if root is not None else os.getcwd())
+        self.parse_kwargs = parse_kwargs
+
+    def namespace_kwargs(self, document: str) -> Dict[str, str]:
+        # Stores without namespaces keep working as long as everything goes to the default one
+        namespace = self.namespace_for(document)
+        return {"namespace": namespace} if namespace else {}
+
+    def parse(self, path: str) -> Dict[str, str]:
+        from framework.blocks.knowledge.documentParsers.DocumentParser import PDFParser
+        return PDFParser.breakdown_document(path, **self.parse_kwargs)
+
+    def sync_chunks(self, document: str, chunks: Dict[str, str], report: SyncReport = None) -> Dict[str, Dict[str, str]]:
+        """
+        Bring the index in line with a document's {bookmark_n: content} chunks.
+        Returns the manifest entries of the chunks.
+        """
+        report = report if report is not None else SyncReport()
+        entries = {}
+        for key, content in chunks.items():
+            if not content:
+                continue
+            bookmark = chunk_bookmark(key)
+            # A chunk repeated under another bookmark is the same vector, the first bookmark is kept
+            entries.setdefault(content_id(content, document), {"bookmark": bookmark, "content": content})
+        known = set(self.manifest.chunk_ids(document))
+        new_ids = [id for id in entries if id not in known]
+        stale_ids = [id for id in known if id not in entries]
+        report.unchanged += len(entries) - len(new_ids)
+        namespace = self.namespace_kwargs(document)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            vectors = list(pool.map(lambda id: self._embed(entries[id]["content"]), new_ids))
+        for start in range(0, len(new_ids), self.batch_size):
+            batch = new_ids[start:start + self.batch_size]
+            self.store.upsert(vectors=[{"id": id, "values": vector,
+                                        "metadata": {self.metadata_name: entries[id]["content"], "document": document, "bookmark": entries[id]["bookmark"]}}
+                                       for id, vector in zip(batch, vectors[start:start + self.batch_size])], **namespace)
+        report.upserted += len(new_ids)
+        for start in range(0, len(stale_ids), 1000):
+            self.store.delete(ids=stale_ids[start:start + 1000], **namespace)
+        report.deleted += len(stale_ids)
+        return {id: {"bookmark": entry["bookmark"]} for id, entry in entries.items()}
+
+    def sync_document(self, path: str, report: SyncReport = None, force: bool = False) -> SyncReport:
+        report = report if report is not None else SyncReport()
+        start = time.perf_counter()
+        document = document_name(path, self.root)
+        if not force and self.manifest.is_unchanged(document, path):
+            report.skipped_documents.append(document)
+        else:
+            chunks = self.sync_chunks(document, self.parse(path), report)
+            self.manifest.record(document, path, chunks)
+            self.manifest.save()
+            report.synced_documents.append(document)
+        report.seconds += time.perf_counter() - start
+        return report
+
+    def remove_document(self, document: str, report: SyncReport = None) -> SyncReport:
+        """Delete every chunk of a document from the index and the manifest"""
+        report = report if report is not None else SyncReport()
+        ids = self.manifest.chunk_ids(document)
+        namespace = self.namespace_kwargs(document)
+        for start in range(0, len(ids), 1000):
+            self.store.delete(ids=ids[start:start + 1000], **namespace)
+        report.deleted += len(ids)
+        self.manifest.remove(document)
+        self.manifest.save()
+        report.removed_documents.append(document)
+        return report
+
+    def sync_library(self, paths: Iterable[str], prune: bool = True, force: bool = False) -> SyncReport:
+        """
+        Sync every document in paths. With prune, documents in the manifest that are no
+        longer in paths are removed from the index.
+        """
+        report = SyncReport()
+        paths = list(paths)
+        for path in paths:
+            self.sync_document(path, report, force=force)
+        if prune:
+            current = {document_name(path, self.root) for path in paths}
+            for document in [document for document in self.manifest.documents if document not in current]:
+                self.remove_document(document, report)
+        # is_unchanged may have refreshed stat fields of touched but identical files
+        self.manifest.save()
+        print(report)
+        return report
+
+'''Example Usage'''
+'''embeddings = TextEmbeddings(base_api_key=OPENAI_API_KEY)
+index = Pinecone(api_key=PINECONE_API_KEY, index_name="library")
+sync = IndexSync(index, embeddings, manifest="library.manifest.json", root="library", max_tokens=500)
+sync.sync_library(glob.glob("library/**/*.pdf", recursive=True))  # first run embeds everything
+sync.sync_library(glob.glob("library/**/*.pdf", recursive=True))  # later runs only embed edited chunks and delete stale ones
+
+tenants = IndexSync(index, embeddings, manifest="tenants.manifest.json", partition_by=document_tenants)  # {document: tenant}
+index.query_namespaces(["acme", "globex"], vector=embeddings.get_embedding(question), top_k=5, include_metadata=True)'''
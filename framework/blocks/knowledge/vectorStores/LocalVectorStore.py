@@ -0,0 +1,357 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from framework.blocks.knowledge.vectorStores.IndexSync import content_id
+from framework.blocks.knowledge.vectorStores.Partitions import fan_out_query
+from framework.tracing.Tracer import annotate, traced
+
+METRICS = ("cosine", "dotproduct", "euclidean")
+FUSIONS = ("convex", "rrf")
+
+#In-process vector store with the same upsert/query surface as the Pinecone wrapper
+class LocalVectorStore():
+    """
+    Exact nearest neighbour search over a contiguous float32 matrix, kept in memory.
+
+    Vectors are upserted as (id, values, metadata) tuples or dicts like Pinecone's
+    index.upsert and query() answers in Pinecone's response shape, so it can stand in
+    for the Pinecone wrapper in offline runs, tests and benchmarks.
+
+    Dict upserts may carry 'sparse_values' (e.g. from BM25Encoder), which go into an
+    inverted index. A query with both a dense vector and a sparse_vector fuses the two
+    rankings, either as a convex combination of the scores or by reciprocal rank fusion.
+
+    Like Pinecone, upsert, query, fetch and delete take a namespace. Every namespace is a
+    separate store of its own, so a query only scans the rows of the namespace it asks
+    for, and query_namespaces searches several at once and merges their matches.
+
+    Args:
+        dimension: The length of every vector.
+        metric: 'cosine', 'dotproduct' or 'euclidean'.
+        initial_capacity: Rows allocated up front, the matrix doubles when it fills up.
+    """
+    dimension: int
+    metric: str
+
+    def __init__(self, dimension: int = 1536, metric: str = 'cosine', initial_capacity: int = 1024):
+        if metric not in METRICS:
+            raise ValueError(f"Invalid metric {metric}, choose from {METRICS}")
+        self.dimension = dimension
+        self.metric = metric
+        self._vectors = self._allocate(max(initial_capacity, 1))
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._sparse: List[Optional[Tuple[np.ndarray, np.ndarray]]] = []
+        self._postings: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None
+        self._partitions: Dict[str, "LocalVectorStore"] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # Storage hooks, QuantizedVectorStore overrides them to keep compressed rows instead
+    def _allocate(self, capacity: int) -> np.ndarray:
+        return np.zeros((capacity, self.dimension), dtype=np.float32)
+
+    def _grow(self, capacity: int) -> None:
+        grown = self._allocate(capacity)
+        grown[:len(self._ids)] = self._vectors[:len(self._ids)]
+        self._vectors = grown
+
+    def _store(self, indices: List[int], rows: np.ndarray) -> None:
+        self._vectors[indices] = rows
+
+    def _move(self, source: int, target: int) -> None:
+        self._vectors[target] = self._vectors[source]
+
+    def _values(self, index: int) -> List[float]:
+        return self._vectors[index].tolist()
+
+    def _refine(self, vector: np.ndarray, scores: np.ndarray, top_k: int) -> np.ndarray:
+        return scores
+
+    def _new_partition(self) -> "LocalVectorStore":
+        return LocalVectorStore(dimension=self.dimension, metric=self.metric, initial_capacity=64)
+
+    def partition(self, namespace: Optional[str] = None, create: bool = True) -> Optional["LocalVectorStore"]:
+        """The store of a namespace, this one for the default namespace ('' or None)"""
+        if not namespace:
+            return self
+        with self._lock:
+            store = self._partitions.get(namespace)
+            if store is None and create:
+                store = self._partitions[namespace] = self._new_partition()
+            return store
+
+    def list_namespaces(self) -> List[str]:
+        with self._lock:
+            return ([""] if self._ids else []) + [namespace for namespace, store in self._partitions.items() if len(store)]
+
+    @staticmethod
+    def _unpack(vector) -> Tuple[str, List[float], Dict[str, Any], Optional[Dict[str, list]]]:
+        if isinstance(vector, dict):
+            return str(vector["id"]), vector["values"], vector.get("metadata") or {}, vector.get("sparse_values")
+        if len(vector) == 2:
+            return str(vector[0]), vector[1], {}, None
+        return str(vector[0]), vector[1], vector[2] or {}, None
+
+    def _prepare(self, values) -> np.ndarray:
+        row = np.asarray(values, dtype=np.float32).reshape(-1)
+        if row.shape[0] != self.dimension:
+            raise ValueError(f"Vector dimension {row.shape[0]} does not match the store dimension {self.dimension}")
+        if self.metric == 'cosine':
+            # Normalise once on the way in so a cosine query is a single matrix product
+            norm = np.linalg.norm(row)
+            if norm > 0:
+                row = row / norm
+        return row
+
+    @traced("vector.upsert", "vector")
+    def upsert(self, vectors: List[Union[Tuple, Dict[str, Any]]], namespace: Optional[str] = None, **kwargs) -> Dict[str, int]:
+        if namespace:
+            return self.partition(namespace).upsert(vectors, **kwargs)
+        annotate(store="local", vectors=len(vectors))
+        with self._lock:
+            indices, rows = [], []
+            for vector in vectors:
+                id, values, metadata, sparse = self._unpack(vector)
+                row = self._prepare(values)
+                if id in self._rows:
+                    index = self._rows[id]
+                else:
+                    index = len(self._ids)
+                    if index == self._vectors.shape[0]:
+                        # An empty store, e.g. one loaded from a save without rows, still grows
+                        self._grow(max(self._vectors.shape[0] * 2, 64))
+                    self._ids.append(id)
+                    self._metadata.append({})
+                    self._sparse.append(None)
+                    self._rows[id] = index
+                indices.append(index)
+                rows.append(row)
+                self._metadata[index] = dict(metadata)
+                if sparse is not None:
+                    self._sparse[index] = (np.asarray(sparse["indices"], dtype=np.uint32), np.asarray(sparse["values"], dtype=np.float32))
+                    self._postings = None
+                elif self._sparse[index] is not None:
+                    self._sparse[index] = None
+                    self._postings = None
+            if rows:
+                # One write for the batch, a repeated id keeps its last values
+                self._store(indices, np.stack(rows))
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids: List[str] = None, namespace: Optional[str] = None, delete_all: bool = False, **kwargs) -> Dict[str, Any]:
+        if namespace:
+            store = self.partition(namespace, create=False)
+            if store is not None and delete_all:
+                with self._lock:
+                    del self._partitions[namespace]
+            elif store is not None:
+                store.delete(ids)
+            return {}
+        if delete_all:
+            ids = list(self._ids)
+        with self._lock:
+            for id in ids or ():
+                index = self._rows.pop(str(id), None)
+                if index is None:
+                    continue
+                # Move the last row into the hole so the matrix stays dense
+                last = len(self._ids) - 1
+                if index != last:
+                    self._move(last, index)
+                    self._ids[index] = self._ids[last]
+                    self._metadata[index] = self._metadata[last]
+                    self._sparse[index] = self._sparse[last]
+                    self._rows[self._ids[index]] = index
+                self._ids.pop()
+                self._metadata.pop()
+                self._sparse.pop()
+                # Postings hold row numbers, which the swap just changed
+                self._postings = None
+        return {}
+
+    def fetch(self, ids: List[str], namespace: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        if namespace:
+            store = self.partition(namespace, create=False)
+            return store.fetch(ids) if store is not None else {"vectors": {}}
+        with self._lock:
+            vectors = {}
+            for id in ids:
+                index = self._rows.get(str(id))
+                if index is not None:
+                    vectors[str(id)] = {"id": str(id), "values": self._values(index), "metadata": self._metadata[index]}
+        return {"vectors": vectors}
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {namespace: {"vector_count": len(store)} for namespace, store in self._partitions.items() if len(store)}
+        if self._ids:
+            namespaces[""] = {"vector_count": len(self)}
+        return {"dimension": self.dimension, "total_vector_count": sum(count["vector_count"] for count in namespaces.values()),
+                "namespaces": namespaces}
+
+    @staticmethod
+    def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+        """Metadata filter supporting plain equality and the $eq, $ne, $in and $nin operators"""
+        if not filter:
+            return True
+        for key, condition in filter.items():
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        return True
+
+    def scores(self, vector) -> np.ndarray:
+        """Similarity of the query against every stored row, higher is better"""
+        query = self._prepare(vector)
+        matrix = self._vectors[:len(self._ids)]
+        if self.metric == 'euclidean':
+            return -np.linalg.norm(matrix - query, axis=1)
+        return matrix @ query
+
+    def _build_postings(self) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        # Inverted index of term -> (rows, weights), rebuilt lazily after writes
+        if self._postings is None:
+            rows: Dict[int, List[int]] = {}
+            weights: Dict[int, List[float]] = {}
+            for row, sparse in enumerate(self._sparse):
+                if sparse is None:
+                    continue
+                for index, value in zip(sparse[0].tolist(), sparse[1].tolist()):
+                    rows.setdefault(index, []).append(row)
+                    weights.setdefault(index, []).append(value)
+            self._postings = {index: (np.asarray(rows[index], dtype=np.int64), np.asarray(weights[index], dtype=np.float32)) for index in rows}
+        return self._postings
+
+    def sparse_scores(self, sparse_vector: Dict[str, list]) -> np.ndarray:
+        """Dot product of a sparse query with every stored sparse vector, 0 for rows without one"""
+        postings = self._build_postings()
+        scores = np.zeros(len(self._ids), dtype=np.float32)
+        for index, weight in zip(sparse_vector["indices"], sparse_vector["values"]):
+            posting = postings.get(int(index))
+            if posting is not None:
+                np.add.at(scores, posting[0], posting[1] * weight)
+        return scores
+
+    @staticmethod
+    def fuse(dense: np.ndarray, sparse: np.ndarray, fusion: str = "convex", alpha: float = 0.5, rrf_k: int = 60) -> np.ndarray:
+        """
+        Combine dense and sparse scores. 'convex' mixes alpha * dense with (1 - alpha) * sparse,
+        sparse scaled into [0, 1] by its maximum. 'rrf' sums 1 / (rrf_k + rank) over both rankings.
+        """
+        if fusion not in FUSIONS:
+            raise ValueError(f"Invalid fusion {fusion}, choose from {FUSIONS}")
+        if fusion == "convex":
+            peak = sparse.max() if len(sparse) else 0
+            return alpha * dense + (1 - alpha) * (sparse / peak if peak > 0 else sparse)
+        fused = np.zeros(len(dense), dtype=np.float64)
+        for scores in (dense, sparse):
+            ranks = np.empty(len(scores), dtype=np.int64)
+            ranks[np.argsort(-scores, kind="stable")] = np.arange(1, len(scores) + 1)
+            fused += 1.0 / (rrf_k + ranks)
+        return fused
+
+    @traced("vector.query", "vector")
+    def query(self,
+              vector: Optional[List[float]] = None,
+              id: Optional[str] = None,
+              top_k: int = 10,
+              filter: Optional[Dict[str, Any]] = None,
+              include_values: Optional[bool] = None,
+              include_metadata: Optional[bool] = None,
+              sparse_vector: Optional[Dict[str, list]] = None,
+              fusion: str = "convex",
+              alpha: float = 0.5,
+              namespace: Optional[str] = None,
+              **kwargs) -> Dict[str, Any]:
+        if namespace:
+            store = self.partition(namespace, create=False)
+            if store is None:
+                return {"matches": [], "namespace": namespace}
+            result = store.query(vector=vector, id=id, top_k=top_k, filter=filter, include_values=include_values, include_metadata=include_metadata,
+                                 sparse_vector=sparse_vector, fusion=fusion, alpha=alpha, **kwargs)
+            result["namespace"] = namespace
+            return result
+        annotate(store="local", top_k=top_k, rows=len(self._ids), hybrid=sparse_vector is not None)
+        with self._lock:
+            if vector is None and id is not None:
+                vector = self._values(self._rows[str(id)])
+            if not self._ids:
+                return {"matches": [], "namespace": ""}
+            if vector is not None:
+                vector = np.asarray(vector, dtype=np.float32)
+                if vector.ndim == 2:
+                    # test.py style [xq] queries hold a single vector
+                    vector = vector[0]
+                scores = self.scores(vector)
+                if sparse_vector is not None:
+                    scores = self.fuse(scores, self.sparse_scores(sparse_vector), fusion, alpha)
+            elif sparse_vector is not None:
+                scores = self.sparse_scores(sparse_vector)
+            else:
+                raise ValueError("query needs a vector, an id or a sparse_vector")
+            if filter:
+                mask = np.array([self.matches_filter(metadata, filter) for metadata in self._metadata])
+                scores = np.where(mask, scores, -np.inf)
+            top_k = min(top_k, len(self._ids))
+            if vector is not None and sparse_vector is None:
+                scores = self._refine(vector, scores, top_k)
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            matches = []
+            for index in best:
+                if scores[index] == -np.inf:
+                    break
+                match = {"id": self._ids[index], "score": float(scores[index])}
+                if include_values:
+                    match["values"] = self._values(index)
+                if include_metadata:
+                    match["metadata"] = self._metadata[index]
+                matches.append(match)
+        return {"matches": matches, "namespace": ""}
+
+    def query_namespaces(self, namespaces: List[str], top_k: int = 10, parallel: bool = True, **query_kwargs) -> Dict[str, Any]:
+        """
+        Query several namespaces, in parallel threads unless parallel is False, and merge
+        their best top_k matches, each tagged with its namespace.
+        """
+        return fan_out_query(self.query, namespaces, top_k=top_k, parallel=parallel, **query_kwargs)
+
+    # upsert embeddings from a dictionary of {content: embeddings} key value pairs, IDs are stable content hashes, the same IndexSync gives
+    # namespace puts them in a partition of their own, e.g. the document name or a tenant id
+    def upsert_embeddings_from_dict(self, dict: dict, metadata_name: str = 'content', sparse_encoder=None, document: str = "", namespace: str = None):
+        lines = list(dict.keys())
+        if sparse_encoder is None:
+            self.upsert(vectors=[(content_id(line, document), dict[line], {metadata_name: line}) for line in lines], namespace=namespace)
+        else:
+            sparse = sparse_encoder.encode_documents(lines)
+            self.upsert(vectors=[{"id": content_id(line, document), "values": dict[line], "metadata": {metadata_name: line}, "sparse_values": s}
+                                 for line, s in zip(lines, sparse)], namespace=namespace)
+
+    def get_top_k_responses(self,
+                            metadata_to_get: str,
+                            top_k: int,
+                            res):
+        #check if top_k is a valid number
+        if top_k > len(res['matches']):
+            raise Exception(f"Top k: {top_k} is greater than the number of responses: {len(res['matches'])}")
+
+        #add responses to dictionary
+        responses = {}
+        for i in range(top_k):
+            responses[f"{res['matches'][i]['score']:.2f}"] = {res['matches'][i]['metadata'][metadata_to_get]}
+        return responses
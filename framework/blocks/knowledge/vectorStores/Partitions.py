@@ -0,0 +1,73 @@
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Shared by every store, a fan-out spends its time in numpy or waiting on Pinecone, both release the GIL
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_executor(max_workers: int = 16) -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vector-fanout")
+        return _executor
+
+def as_dict(match) -> Dict[str, Any]:
+    """A query match as a plain dict, Pinecone returns model objects"""
+    if isinstance(match, dict):
+        return dict(match)
+    return match.to_dict() if hasattr(match, "to_dict") else dict(match)
+
+def merge_matches(results: Dict[str, Any], top_k: int, higher_is_better: bool = True) -> List[Dict[str, Any]]:
+    """
+    The best top_k matches of several namespaces' query results, {namespace: result}. Each
+    match is tagged with the namespace it came from.
+    """
+    matches = [dict(as_dict(match), namespace=namespace) for namespace, result in results.items() for match in result["matches"]]
+    select = heapq.nlargest if higher_is_better else heapq.nsmallest
+    return select(top_k, matches, key=lambda match: match["score"])
+
+def fan_out_query(query: Callable[..., Any],
+                  namespaces: Iterable[str],
+                  top_k: int = 10,
+                  higher_is_better: bool = True,
+                  parallel: bool = True,
+                  **query_kwargs) -> Dict[str, Any]:
+    """
+    Run query(namespace=..., top_k=..., **query_kwargs) on every namespace, at the same time
+    when parallel, and merge the answers into one result in the query response shape.
+    """
+    namespaces = list(dict.fromkeys(namespaces))
+    if parallel and len(namespaces) > 1:
+        executor = get_executor()
+        futures = {namespace: executor.submit(query, namespace=namespace, top_k=top_k, **query_kwargs) for namespace in namespaces}
+        results = {namespace: future.result() for namespace, future in futures.items()}
+    else:
+        results = {namespace: query(namespace=namespace, top_k=top_k, **query_kwargs) for namespace in namespaces}
+    return {"matches": merge_matches(results, top_k, higher_is_better), "namespaces": namespaces}
+
+def namespace_router(partition_by=None) -> Callable[[str], str]:
+    """
+    Function from a document name to the namespace its chunks go to: partition_by None keeps
+    everything in the default namespace, 'document' gives every document its own, and a dict
+    or function maps documents to e.g. tenant namespaces.
+    """
+    if partition_by is None:
+        return lambda document: ""
+    if partition_by == "document":
+        return lambda document: document
+    if isinstance(partition_by, dict):
+        return lambda document: partition_by.get(document, "")
+    if callable(partition_by):
+        return partition_by
+    raise ValueError(f"Invalid partition_by {partition_by}, use None, 'document', a dict or a function")
+
+'''Example Usage'''
+'''store = LocalVectorStore(dimension=1536)
+for document, embeds in library_embeds.items():  # {document: {content: embedding}}
+    store.upsert_embeddings_from_dict(embeds, document=document, namespace=document)
+vector = embeddings.get_embedding(question)
+store.query(vector=vector, top_k=5, namespace="RAP.pdf")  # scans one document's rows only
+store.query_namespaces(["RAP.pdf", "Handbook.pdf"], vector=vector, top_k=5, include_metadata=True)  # both at once, merged'''
@@ -4,51 +4,108 @@ import re
 from typing import Union, List, Tuple, Optional, Dict
 from pinecone.core.client.models import QueryVector
 from pinecone.core.client.model.sparse_values import SparseValues
+
+from framework.blocks.knowledge.embeddings.SparseEmbeddings import hybrid_scale
+from framework.blocks.knowledge.vectorStores.IndexSync import content_id
+from framework.blocks.knowledge.vectorStores.Partitions import fan_out_query
+from framework.blocks.knowledge.vectorStores.PineconePool import PineconePool, get_pinecone_pool
+from framework.tracing.Tracer import annotate, traced
    
 #Pinecone vector store wrapper
 class Pinecone():
-    index: pinecone.Index
+    """
+    Pinecone index wrapper with the same upsert/query surface as LocalVectorStore.
+
+    Nothing connects until the index is first used. Connections, index handles and index
+    metadata come from a PineconePool, the process-wide one by default, so building many
+    wrappers, or one per worker, costs one pinecone.init and list_indexes per API key
+    instead of one each. Pass PineconePool(client=FakePinecone()) to run offline.
+
+    Args:
+        api_key: Pinecone API key.
+        index_name: Index to use, lower cased with non alphanumerics as dashes. Created
+            with dimension and metric when it doesn't exist.
+        environment: Pinecone environment of the key.
+        dimension: Vector length of a created index.
+        metric: 'cosine', 'dotproduct' or 'euclidean'.
+        pool: Connection pool to use instead of the process-wide one.
+        lazy: Connect on first use, False connects right away.
+    """
+    index_name: str
+    environment: str
+    dimension: int
+    metric: str
     
-    def __init__(self, api_key: str, index_name: str, environment: str = 'gcp-starter', dimension: int = 1536, metric: str = 'cosine'):
+    def __init__(self, api_key: str, index_name: str, environment: str = 'gcp-starter', dimension: int = 1536, metric: str = 'cosine',
+                 pool: PineconePool = None, lazy: bool = True):
         # set index name to all lower cases and change any non-alphanumeric characters to dashes
         index_name = index_name.lower()
         index_name = re.sub('[^0-9a-zA-Z]+', '-', index_name)
-        
-        # initialize connection to pinecone (get API key at app.pinecone.io)
-        pinecone.init(
-            api_key=api_key,
-            environment=environment  # find next to API key in console
-        )    
-        # check if index already exists (only create index if not)
-        if index_name not in pinecone.list_indexes():
-            self.index = pinecone.create_index(
-                                    index_name, 
-                                    dimension=dimension,
-                                    metric=metric,
-                                    )
-        # connect to index
-        self.index = pinecone.Index(index_name)
-        print(f"Connected to index: {index_name}")
+        self.api_key = api_key
+        self.index_name = index_name
+        self.environment = environment
+        self.dimension = dimension
+        self.metric = metric
+        self.pool = pool if pool is not None else get_pinecone_pool()
+        self._index = None
+        if not lazy:
+            self.connect()
+    
+    def connect(self) -> pinecone.Index:
+        """The pool's handle of the index, which is created first if it doesn't exist"""
+        if self._index is None:
+            self._index = self.pool.index(self.api_key, self.environment, self.index_name, dimension=self.dimension, metric=self.metric)
+        return self._index
+    
+    @property
+    def index(self) -> pinecone.Index:
+        return self._index if self._index is not None else self.connect()
+    
+    def describe(self, refresh: bool = False) -> Dict:
+        """The index's dimension, metric, pods and status, from the pool's metadata cache"""
+        self.connect()
+        return self.pool.describe_index(self.api_key, self.environment, self.index_name, refresh=refresh)
     
     # upsert embeddings from a dictionary of {content: embeddings} key value pairs
-    def upsert_embeddings_from_dict(self, dict: dict, metadata_name: str = 'content'):
+    # IDs are content hashes (prefixed by document when given), the same IDs IndexSync gives, so re-upserting the same content overwrites instead of duplicating
+    # pass a fitted BM25Encoder as sparse_encoder to also store sparse vectors for hybrid search (needs a dotproduct index)
+    # namespace puts them in a partition of their own, e.g. the document name or a tenant id, which queries can then target alone
+    def upsert_embeddings_from_dict(self, dict: dict, metadata_name: str = 'content', sparse_encoder=None, document: str = "", namespace: str = None):
         batch_size = 32  # process everything in batches of 32
-        for i in tqdm(range(0, len(list(dict.keys())), batch_size)):
+        lines = list(dict.keys())
+        for i in tqdm(range(0, len(lines), batch_size)):
             # set end position of batch
-            i_end = min(i+batch_size, len(list(dict.keys())))
+            i_end = min(i+batch_size, len(lines))
             # get batch of lines and IDs
-            lines_batch = list(dict.keys())[i: i+batch_size]
-            ids_batch = [str(n) for n in range(i, i_end)]
-            
+            lines_batch = lines[i: i_end]
+            ids_batch = [content_id(line, document) for line in lines_batch]
             
             # store embeddings
-            embeds = list(dict.values())
+            embeds = [dict[line] for line in lines_batch]
             # prep metadata and upsert batch
             meta = [{metadata_name: line} for line in lines_batch]
-            to_upsert = zip(ids_batch, embeds, meta)
+            if sparse_encoder is None:
+                to_upsert = list(zip(ids_batch, embeds, meta))
+            else:
+                sparse = sparse_encoder.encode_documents(lines_batch)
+                to_upsert = [{"id": id, "values": embed, "metadata": m, "sparse_values": s} for id, embed, m, s in zip(ids_batch, embeds, meta, sparse)]
             # upsert to Pinecone
-            self.index.upsert(vectors=list(to_upsert))
+            self.upsert(vectors=to_upsert, namespace=namespace)
+    
+    @traced("vector.upsert", "vector")
+    def upsert(self, vectors: list, namespace: Optional[str] = None, **kwargs):
+        annotate(store="pinecone", vectors=len(vectors), namespace=namespace)
+        if namespace:
+            kwargs["namespace"] = namespace
+        return self.index.upsert(vectors=vectors, **kwargs)
+    
+    def delete(self, ids: List[str] = None, **kwargs):
+        return self.index.delete(ids=ids, **kwargs)
     
+    def list_namespaces(self) -> List[str]:
+        return list(self.index.describe_index_stats()["namespaces"].keys())
+    
+    @traced("vector.query", "vector")
     def query(self,
               vector: Optional[List[float]] = None,
               id: Optional[str] = None,
@@ -60,8 +117,30 @@ class Pinecone():
               include_metadata: Optional[bool] = None,
               sparse_vector: Optional[Union[SparseValues, Dict[str, Union[List[float], List[int]]]]] = None,
               **kwargs):
+        annotate(store="pinecone", top_k=top_k, namespace=namespace)
         return self.index.query(vector=vector, id=id, queries=queries, top_k=top_k, namespace=namespace, filter=filter, include_values=include_values, include_metadata=include_metadata, sparse_vector=sparse_vector, **kwargs)
 
+    def query_namespaces(self, namespaces: List[str], top_k: int = 10, parallel: bool = True, **query_kwargs):
+        """
+        Query several namespaces, as concurrent requests unless parallel is False, and merge
+        their best top_k matches, each tagged with its namespace. Euclidean scores are
+        distances, so those are merged smallest first.
+        """
+        return fan_out_query(self.query, namespaces, top_k=top_k, higher_is_better=self.metric != "euclidean", parallel=parallel, **query_kwargs)
+
+    def hybrid_query(self,
+                     vector: List[float],
+                     sparse_vector: Dict[str, Union[List[float], List[int]]],
+                     alpha: float = 0.5,
+                     top_k: Optional[int] = None,
+                     **kwargs):
+        """
+        Dense and sparse query in one request, alpha=1 is dense only and alpha=0 is sparse only.
+        Pinecone sums the two dot products, so the index has to use the dotproduct metric.
+        """
+        vector, sparse_vector = hybrid_scale(vector, sparse_vector, alpha)
+        return self.query(vector=vector, sparse_vector=sparse_vector, top_k=top_k, **kwargs)
+
     def get_top_k_responses(self, 
                             metadata_to_get: str,
                             top_k: int,
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+class PineconePool():
+    """
+    Process-wide Pinecone connections shared by every Pinecone wrapper.
+
+    - pinecone.init (and the whoami round trip behind it) runs once per API key and
+      environment, not once per wrapper.
+    - Every wrapper on the same index reuses one Index handle and its HTTP connection pool.
+    - list_indexes and describe_index answers are cached for metadata_ttl seconds.
+
+    With cache_path, project names and index metadata also go to a JSON file, so a fresh
+    worker process skips whoami and list_indexes on startup. API keys are only stored
+    hashed.
+
+    Args:
+        client: The pinecone module, imported on first use when None, or a stand-in with
+            the same init, list_indexes, create_index, describe_index, Index and Config,
+            e.g. FakePinecone.
+        metadata_ttl: Seconds index lists and descriptions are trusted.
+        cache_path: Optional JSON file sharing the metadata between processes.
+        pool_threads: Threads of every Index handle, used by its async_req calls.
+    """
+    metadata_ttl: float
+    cache_path: str
+    pool_threads: int
+
+    def __init__(self, client=None, metadata_ttl: float = 300.0, cache_path: str = None, pool_threads: int = 1):
+        self._client = client
+        self.metadata_ttl = metadata_ttl
+        self.cache_path = cache_path
+        self.pool_threads = pool_threads
+        self._lock = threading.RLock()
+        self._active: Optional[str] = None  # the account pinecone.init was last called for
+        self._handles: Dict[Tuple[str, str], Any] = {}
+        self._metadata: Optional[Dict[str, Dict[str, Any]]] = None  # account -> project, index list and descriptions
+        self._stats = {"inits": 0, "list_calls": 0, "describe_calls": 0, "creates": 0, "handles": 0, "handle_hits": 0, "metadata_hits": 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            import pinecone
+            self._client = pinecone
+        return self._client
+
+    @staticmethod
+    def account(api_key: str, environment: str) -> str:
+        return f"{environment}:{hashlib.sha256(str(api_key).encode('utf-8')).hexdigest()[:16]}"
+
+    def _entry(self, account: str) -> Dict[str, Any]:
+        if self._metadata is None:
+            self._metadata = {}
+            if self.cache_path and os.path.exists(self.cache_path):
+                try:
+                    with open(self.cache_path, encoding="utf-8") as file:
+                        self._metadata = json.load(file)
+                except (OSError, ValueError):
+                    # A broken cache file only costs the round trips it would have saved
+                    self._metadata = {}
+        return self._metadata.setdefault(account, {"project_name": None, "indexes": None, "listed_at": 0.0, "descriptions": {}})
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self._metadata, file)
+        os.replace(temporary, self.cache_path)
+
+    def _fresh(self, stamp: float) -> bool:
+        return time.time() - stamp < self.metadata_ttl
+
+    def _connect(self, api_key: str, environment: str) -> str:
+        """Point the client at an account, init only runs when it changes"""
+        account = self.account(api_key, environment)
+        if self._active != account:
+            entry = self._entry(account)
+            # A known project name spares init its whoami request
+            self.client.init(api_key=api_key, environment=environment, project_name=entry["project_name"] or None)
+            self._active = account
+            self._stats["inits"] += 1
+            project_name = getattr(getattr(self.client, "Config", None), "PROJECT_NAME", None)
+            if project_name and project_name != entry["project_name"]:
+                entry["project_name"] = project_name
+                self._save()
+        return account
+
+    def list_indexes(self, api_key: str, environment: str, refresh: bool = False) -> List[str]:
+        with self._lock:
+            entry = self._entry(self.account(api_key, environment))
+            if not refresh and entry["indexes"] is not None and self._fresh(entry["listed_at"]):
+                self._stats["metadata_hits"] += 1
+                return list(entry["indexes"])
+            self._connect(api_key, environment)
+            entry["indexes"] = list(self.client.list_indexes())
+            entry["listed_at"] = time.time()
+            self._stats["list_calls"] += 1
+            self._save()
+            return list(entry["indexes"])
+
+    def describe_index(self, api_key: str, environment: str, index_name: str, refresh: bool = False) -> Dict[str, Any]:
+        """The index's name, dimension, metric, pods and status, as a plain dict"""
+        with self._lock:
+            entry = self._entry(self.account(api_key, environment))
+            cached = entry["descriptions"].get(index_name)
+            if not refresh and cached is not None and self._fresh(cached["described_at"]):
+                self._stats["metadata_hits"] += 1
+                return dict(cached["description"])
+            self._connect(api_key, environment)
+            description = self.client.describe_index(index_name)
+            if hasattr(description, "_asdict"):
+                description = description._asdict()
+            description = {key: value for key, value in dict(description).items()
+                           if isinstance(value, (str, int, float, bool, dict, list)) or value is None}
+            entry["descriptions"][index_name] = {"description": description, "described_at": time.time()}
+            self._stats["describe_calls"] += 1
+            self._save()
+            return dict(description)
+
+    def index(self, api_key: str, environment: str, index_name: str, dimension: int = 1536, metric: str = 'cosine', create: bool = True):
+        """The shared Index handle of an index, created first when it doesn't exist and create is True"""
+        with self._lock:
+            account = self.account(api_key, environment)
+            handle = self._handles.get((account, index_name))
+            if handle is not None:
+                self._stats["handle_hits"] += 1
+                return handle
+            asked = time.time()
+            indexes = self.list_indexes(api_key, environment)
+            if index_name not in indexes and self._entry(account)["listed_at"] < asked:
+                # The cached list may predate an index another process created
+                indexes = self.list_indexes(api_key, environment, refresh=True)
+            if index_name not in indexes:
+                if not create:
+                    raise ValueError(f"Pinecone index {index_name} does not exist")
+                self._connect(api_key, environment)
+                self.client.create_index(index_name, dimension=dimension, metric=metric)
+                self._stats["creates"] += 1
+                self._entry(account)["indexes"].append(index_name)
+                self._save()
+            # Index copies the client configuration, so it has to be built while init points at this account
+            self._connect(api_key, environment)
+            handle = self.client.Index(index_name, pool_threads=self.pool_threads)
+            self._handles[(account, index_name)] = handle
+            self._stats["handles"] += 1
+            print(f"Connected to index: {index_name}")
+            return handle
+
+    def invalidate(self, api_key: str = None, environment: str = None) -> None:
+        """Forget cached metadata, of one account or of all, e.g. after indexes were changed elsewhere"""
+        with self._lock:
+            self._entry("")  # loads the cache file when that didn't happen yet
+            if api_key is None:
+                self._metadata = {}
+            else:
+                self._metadata.pop(self.account(api_key, environment), None)
+            self._save()
+
+    def close(self) -> None:
+        """Drop every handle, closing their thread pools"""
+        with self._lock:
+            handles, self._handles = list(self._handles.values()), {}
+            self._active = None
+        for handle in handles:
+            close = getattr(handle, "close", None)
+            if close is not None:
+                close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+# The pool Pinecone wrappers use unless given one
+_pool: Optional[PineconePool] = None
+_pool_lock = threading.Lock()
+
+def get_pinecone_pool() -> PineconePool:
+    """The process-wide pool, its metadata goes to the file named by PINECONE_METADATA_CACHE when set"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PineconePool(cache_path=os.getenv("PINECONE_METADATA_CACHE"))
+        return _pool
+
+'''Example Usage'''
+'''pool = PineconePool(cache_path=".cache/pinecone.json")  # or get_pinecone_pool() for the process-wide one
+store = Pinecone(api_key=PINECONE_API_KEY, index_name="library", pool=pool)  # no network yet
+other = Pinecone(api_key=PINECONE_API_KEY, index_name="library", pool=pool)
+store.query(vector=vector, top_k=5)  # connects, later wrappers and processes reuse the connection and metadata
+other.query(vector=vector, top_k=5)
+print(pool.stats())  # one init, one list_indexes, one handle'''
@@ -0,0 +1,195 @@
+import json
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from framework.blocks.knowledge.embeddings.Quantizers import ProductQuantizer, Quantizer, ScalarQuantizer, get_quantizer
+from framework.blocks.knowledge.vectorStores.LocalVectorStore import LocalVectorStore
+
+#LocalVectorStore that keeps int8 or product quantized codes instead of float32 rows
+class QuantizedVectorStore(LocalVectorStore):
+    """
+    Compressed in-process vector store, same upsert/query surface as LocalVectorStore.
+
+    Rows are held as quantizer codes: 1 byte per dimension with 'int8' (4x smaller than
+    float32) or n_subvectors bytes with 'pq' (32x smaller at the default 192). Scores are
+    approximate. With rerank=True the float32 vectors are kept too and the best
+    top_k * rerank_factor candidates are re-scored exactly, which restores most of the
+    recall at the cost of the memory saving. save(mmap_float32=True) writes them to a
+    separate .npy that load() maps from disk, so only the candidate rows are read.
+
+    The quantizer has to be trained before the first upsert, either by calling train()
+    or on the first upserted batch, which should then be representative of the data.
+
+    Args:
+        dimension: The length of every vector.
+        metric: 'cosine', 'dotproduct' or 'euclidean'.
+        quantizer: 'int8', 'pq' or a quantizer instance.
+        rerank: Keep float32 vectors to re-score the best candidates exactly.
+        rerank_factor: Candidates re-scored per requested result.
+        initial_capacity: Rows allocated up front, the matrix doubles when it fills up.
+        quantizer_kwargs: Passed to ProductQuantizer when quantizer is 'pq'.
+    """
+    quantizer: Quantizer
+    rerank: bool
+    rerank_factor: int
+
+    def __init__(self,
+                 dimension: int = 1536,
+                 metric: str = 'cosine',
+                 quantizer: Union[str, Quantizer] = 'int8',
+                 rerank: bool = False,
+                 rerank_factor: int = 4,
+                 initial_capacity: int = 1024,
+                 **quantizer_kwargs):
+        self.quantizer = get_quantizer(quantizer, dimension, **quantizer_kwargs) if isinstance(quantizer, str) else quantizer
+        self.rerank = rerank
+        self.rerank_factor = rerank_factor
+        self._float32: Optional[np.ndarray] = np.zeros((max(initial_capacity, 1), dimension), dtype=np.float32) if rerank else None
+        super().__init__(dimension=dimension, metric=metric, initial_capacity=initial_capacity)
+
+    def train(self, vectors) -> "QuantizedVectorStore":
+        """Fit the quantizer, vectors are prepared (normalised for cosine) like upserted ones"""
+        self.quantizer.train(np.stack([self._prepare(vector) for vector in vectors]))
+        return self
+
+    def upsert(self, vectors: List[Any], **kwargs) -> Dict[str, int]:
+        if not self.quantizer.trained:
+            print(f"Training the {self.quantizer.kind} quantizer on the first {len(vectors)} upserted vectors")
+            self.train([self._unpack(vector)[1] for vector in vectors])
+        return super().upsert(vectors, **kwargs)
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        return np.zeros((capacity, self.quantizer.code_size), dtype=self.quantizer.code_dtype)
+
+    def _new_partition(self) -> "QuantizedVectorStore":
+        # Namespaces share the quantizer, its codes mean the same in all of them
+        return QuantizedVectorStore(dimension=self.dimension, metric=self.metric, quantizer=self.quantizer, rerank=self.rerank,
+                                    rerank_factor=self.rerank_factor, initial_capacity=64)
+
+    def _grow(self, capacity: int) -> None:
+        super()._grow(capacity)
+        if self._float32 is not None:
+            grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+            grown[:len(self._ids)] = self._float32[:len(self._ids)]
+            self._float32 = grown
+
+    def _writable_float32(self) -> np.ndarray:
+        # Vectors mapped from disk by load() are copied into memory on the first write
+        if not self._float32.flags.writeable:
+            self._float32 = np.array(self._float32)
+        return self._float32
+
+    def _store(self, indices: List[int], rows: np.ndarray) -> None:
+        self._vectors[indices] = self.quantizer.encode(rows)
+        if self._float32 is not None:
+            self._writable_float32()[indices] = rows
+
+    def _move(self, source: int, target: int) -> None:
+        super()._move(source, target)
+        if self._float32 is not None:
+            self._writable_float32()[target] = self._float32[source]
+
+    def _values(self, index: int) -> List[float]:
+        if self._float32 is not None:
+            return self._float32[index].tolist()
+        return self.quantizer.decode(self._vectors[index:index + 1])[0].tolist()
+
+    def scores(self, vector) -> np.ndarray:
+        """Approximate similarity of the query against every stored row, higher is better"""
+        query = self._prepare(vector)
+        codes = self._vectors[:len(self._ids)]
+        if self.metric == 'euclidean':
+            return -np.sqrt(np.maximum(self.quantizer.squared_distance(codes, query), 0))
+        return self.quantizer.dot(codes, query)
+
+    def exact_scores(self, vector, rows: np.ndarray) -> np.ndarray:
+        query = self._prepare(vector)
+        matrix = np.asarray(self._float32[rows])
+        if self.metric == 'euclidean':
+            return -np.linalg.norm(matrix - query, axis=1)
+        return matrix @ query
+
+    def _refine(self, vector: np.ndarray, scores: np.ndarray, top_k: int) -> np.ndarray:
+        if not self.rerank:
+            return scores
+        candidates = min(len(scores), top_k * self.rerank_factor)
+        rows = np.argpartition(-scores, candidates - 1)[:candidates]
+        rows = np.sort(rows[np.isfinite(scores[rows])])
+        refined = np.full(len(scores), -np.inf, dtype=np.float32)
+        if len(rows):
+            refined[rows] = self.exact_scores(vector, rows)
+        return refined
+
+    def nbytes(self) -> Dict[str, int]:
+        """Bytes held for the stored rows: codes, float32 re-rank vectors and their total"""
+        codes = self._vectors[:len(self._ids)].nbytes
+        float32 = 0
+        if self._float32 is not None and not isinstance(self._float32, np.memmap):
+            float32 = self._float32[:len(self._ids)].nbytes
+        return {"codes": codes, "float32": float32, "total": codes + float32}
+
+    def save(self, path: str, mmap_float32: bool = True) -> None:
+        """
+        Write the store to path (an .npz), with the float32 re-rank vectors in path + '.f32.npy'
+        when mmap_float32 is set so load() can map them instead of reading them into memory.
+        Only the default namespace is written, save partition(namespace) to a file of its own.
+        """
+        n = len(self._ids)
+        arrays = {f"quantizer_{name}": value for name, value in self.quantizer.state().items()}
+        if self._float32 is not None and not mmap_float32:
+            arrays["float32"] = self._float32[:n]
+        np.savez_compressed(path, kind=self.quantizer.kind, dimension=self.dimension, metric=self.metric, trained=self.quantizer.trained,
+                            codes=self._vectors[:n], ids=np.asarray(self._ids, dtype=str),
+                            metadata=np.asarray(json.dumps(self._metadata)), **arrays)
+        if self._float32 is not None and mmap_float32:
+            np.save(path + ".f32.npy", self._float32[:n])
+
+    @classmethod
+    def load(cls, path: str, rerank: Optional[bool] = None, rerank_factor: int = 4) -> "QuantizedVectorStore":
+        """Read a store written by save(), rerank defaults to whether float32 vectors were saved"""
+        with np.load(path if path.endswith(".npz") else path + ".npz", allow_pickle=False) as data:
+            kind, dimension = str(data["kind"]), int(data["dimension"])
+            state = {name[len("quantizer_"):]: data[name] for name in data.files if name.startswith("quantizer_")}
+            quantizer = (ScalarQuantizer if kind == "int8" else ProductQuantizer).from_state(dimension, state)
+            # A store saved before its first upsert trains on the next one, like a new store
+            quantizer.trained = bool(data["trained"]) if "trained" in data.files else True
+            float32 = data["float32"] if "float32" in data.files else None
+            if float32 is None:
+                try:
+                    float32 = np.load(path + ".f32.npy", mmap_mode="r")
+                except FileNotFoundError:
+                    pass
+            rerank = float32 is not None if rerank is None else rerank
+            if rerank and float32 is None:
+                raise ValueError(f"{path} has no float32 vectors to re-rank with")
+            store = cls(dimension=dimension, metric=str(data["metric"]), quantizer=quantizer, rerank=False, rerank_factor=rerank_factor,
+                        initial_capacity=len(data["ids"]))
+            store._vectors = np.array(data["codes"], dtype=quantizer.code_dtype)
+            store._ids = data["ids"].tolist()
+            store._metadata = json.loads(str(data["metadata"]))
+        store._rows = {id: i for i, id in enumerate(store._ids)}
+        store._sparse = [None] * len(store._ids)
+        if rerank:
+            store.rerank = True
+            store._float32 = float32
+        return store
+
+def recall_at_k(store: LocalVectorStore, reference: LocalVectorStore, queries, top_k: int = 10) -> float:
+    """Share of the reference store's (exact) top_k ids that store also returns, averaged over queries"""
+    found = 0
+    for query in queries:
+        expected = {match["id"] for match in reference.query(vector=query, top_k=top_k)["matches"]}
+        returned = {match["id"] for match in store.query(vector=query, top_k=top_k)["matches"]}
+        found += len(expected & returned) / max(len(expected), 1)
+    return found / max(len(queries), 1)
+
+'''Example Usage'''
+'''embeds = embeddings.dict_to_embeds_dict(data_dict=bms, model='text-embedding-ada-002')
+exact = LocalVectorStore(dimension=1536)
+exact.upsert_embeddings_from_dict(embeds)
+pq = QuantizedVectorStore(dimension=1536, quantizer='pq', rerank=True)
+pq.upsert_embeddings_from_dict(embeds)
+pq.save("RAP.pq")
+print(pq.nbytes(), recall_at_k(pq, exact, [embeddings.get_embedding("monte carlo tree search")]))
+res = QuantizedVectorStore.load("RAP.pq").query(vector=embeddings.get_embedding("monte carlo tree search"), top_k=3, include_metadata=True)'''
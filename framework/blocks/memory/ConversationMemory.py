@@ -0,0 +1,214 @@
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from framework.blocks.knowledge.vectorStores.LocalVectorStore import LocalVectorStore
+from framework.models.Models import ModelBase
+from framework.models.TokenCounter import TokenCounter, get_token_counter
+
+SUMMARY_SYSTEM_PROMPT = """You keep a running summary of a conversation.
+Extend the current summary with the new lines of conversation and return only the new summary.
+Keep names, numbers, decisions and open questions, drop small talk. Be concise."""
+
+class Turn():
+    """One message of the conversation"""
+    __slots__ = ("number", "role", "content", "tokens")
+
+    def __init__(self, number: int, role: str, content: str, tokens: int):
+        self.number = number
+        self.role = role
+        self.content = content
+        self.tokens = tokens
+
+    def message(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+class ConversationMemory():
+    """
+    Conversation history that keeps prompts a bounded size however long the session runs.
+
+    The most recent turns are kept word for word in a buffer of at most max_tokens tokens,
+    appending is O(1) and the oldest turns are evicted once the budget is exceeded. Evicted
+    turns are folded into a rolling summary by summarizer in batches of summary_batch_tokens,
+    so the summary costs one call per batch rather than per turn, and stay in the prompt word
+    for word until then. When embeddings are given they are also embedded into a vector
+    store, so they can be recalled when a later query is about them.
+
+    Every prompt then holds the summary, up to recall_max_tokens of recalled turns and the
+    buffer, whose sizes are all capped, instead of the whole history.
+
+    Args:
+        max_tokens: Token budget of the word for word buffer.
+        summarizer: Model that writes the rolling summary, without one evicted turns are only recalled.
+        summary_max_tokens: Length cap of the summary.
+        summary_batch_tokens: Evicted tokens folded into the summary at once, half of max_tokens by default.
+        embeddings: TextEmbeddings-like object with get_embedding(text), or a function text -> vector.
+        vector_store: Index of evicted turns, with upsert and query like Pinecone. A
+            LocalVectorStore of the given dimension by default.
+        dimension: Embedding length for the default vector store.
+        recall_top_k: Evicted turns recalled per query at most.
+        recall_min_score: Similarity from which an evicted turn is recalled.
+        recall_max_tokens: Token budget of the recalled turns.
+        token_counter: Counter used for the budgets, the shared cl100k one by default.
+    """
+    max_tokens: int
+    summary: str
+    recall_top_k: int
+    recall_min_score: float
+    token_counter: TokenCounter
+
+    def __init__(self,
+                 max_tokens: int = 2000,
+                 summarizer: ModelBase = None,
+                 summary_max_tokens: int = 300,
+                 summary_batch_tokens: int = None,
+                 embeddings=None,
+                 vector_store=None,
+                 dimension: int = 1536,
+                 recall_top_k: int = 3,
+                 recall_min_score: float = 0.75,
+                 recall_max_tokens: int = 500,
+                 token_counter: TokenCounter = None):
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_batch_tokens = summary_batch_tokens or max(max_tokens // 2, 1)
+        self._embed: Optional[Callable[[str], List[float]]] = None
+        if embeddings is not None:
+            self._embed = embeddings.get_embedding if hasattr(embeddings, "get_embedding") else embeddings
+        if vector_store is None and self._embed is not None:
+            vector_store = LocalVectorStore(dimension=dimension, metric='cosine', initial_capacity=256)
+        self.vector_store = vector_store
+        self.recall_top_k = recall_top_k
+        self.recall_min_score = recall_min_score
+        self.recall_max_tokens = recall_max_tokens
+        self.token_counter = token_counter or get_token_counter("cl100k_base")
+        self.summary = ""
+        self._buffer: Deque[Turn] = deque()
+        self._buffer_tokens = 0
+        self._unsummarized: List[Turn] = []
+        self._unsummarized_tokens = 0
+        self._turns = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    @property
+    def buffer_tokens(self) -> int:
+        return self._buffer_tokens
+
+    def add(self, role: str, content: str) -> None:
+        """Append a message, evicting the oldest ones past the token budget"""
+        with self._lock:
+            tokens = self.token_counter.count(content) + TokenCounter.TOKENS_PER_MESSAGE
+            self._buffer.append(Turn(self._turns, role, content, tokens))
+            self._turns += 1
+            self._buffer_tokens += tokens
+            evicted = []
+            # The newest turn always stays, even when it is larger than the budget on its own
+            while self._buffer_tokens > self.max_tokens and len(self._buffer) > 1:
+                turn = self._buffer.popleft()
+                self._buffer_tokens -= turn.tokens
+                evicted.append(turn)
+            if evicted:
+                self._evict(evicted)
+
+    def add_exchange(self, query: str, response: str) -> None:
+        self.add("user", query)
+        self.add("assistant", response)
+
+    def _evict(self, turns: List[Turn]) -> None:
+        if self.vector_store is not None and self._embed is not None:
+            self.vector_store.upsert(vectors=[{"id": f"turn-{turn.number}", "values": self._embed(turn.content),
+                                               "metadata": {"role": turn.role, "content": turn.content, "turn": turn.number}}
+                                              for turn in turns])
+        if self.summarizer is not None:
+            self._unsummarized.extend(turns)
+            self._unsummarized_tokens += sum(turn.tokens for turn in turns)
+            if self._unsummarized_tokens >= self.summary_batch_tokens:
+                self.update_summary()
+
+    def update_summary(self) -> str:
+        """Fold the turns evicted since the last update into the rolling summary"""
+        with self._lock:
+            if not self._unsummarized or self.summarizer is None:
+                return self.summary
+            lines = "\n".join(f"{turn.role}: {turn.content}" for turn in self._unsummarized)
+            query = f"Current summary:\n{self.summary or '(empty)'}\n\nNew lines of conversation:\n{lines}\n\nNew summary:"
+            self.summary = self.token_counter.truncate(
+                self.summarizer.run(query=query, system_prompt=SUMMARY_SYSTEM_PROMPT, max_tokens=self.summary_max_tokens, temperature=0),
+                self.summary_max_tokens)
+            self._unsummarized = []
+            self._unsummarized_tokens = 0
+            return self.summary
+
+    def recall(self, query: str, top_k: int = None) -> List[Dict[str, Any]]:
+        """
+        Evicted turns similar to query, oldest first, within recall_max_tokens. Turns still
+        in the prompt word for word, waiting for the summary or in the buffer, are skipped.
+        """
+        if self.vector_store is None or self._embed is None or not query:
+            return []
+        top_k = top_k or self.recall_top_k
+        embedding = self._embed(query)
+        with self._lock:
+            in_prompt = {turn.number for turn in self._unsummarized}
+            in_prompt.update(turn.number for turn in self._buffer)
+            # Ask for more matches so the skipped turns don't crowd out the ones to recall
+            matches = self.vector_store.query(vector=embedding, top_k=top_k + len(self._unsummarized),
+                                              include_metadata=True)["matches"]
+        recalled, tokens = [], 0
+        for match in matches:
+            if match["score"] < self.recall_min_score or len(recalled) >= top_k:
+                break
+            if match["metadata"]["turn"] in in_prompt:
+                continue
+            count = self.token_counter.count(match["metadata"]["content"]) + TokenCounter.TOKENS_PER_MESSAGE
+            if tokens + count > self.recall_max_tokens:
+                continue
+            recalled.append(match["metadata"])
+            tokens += count
+        return sorted(recalled, key=lambda metadata: metadata["turn"])
+
+    def messages(self, query: str = None) -> List[Dict[str, str]]:
+        """
+        Chat history for the next call: the summary, the earlier turns relevant to query and
+        the buffer, ready to be passed as history to Models.run.
+        """
+        with self._lock:
+            history = []
+            if self.summary:
+                history.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+            recalled = self.recall(query)
+            if recalled:
+                lines = "\n".join(f"{turn['role']}: {turn['content']}" for turn in recalled)
+                history.append({"role": "system", "content": f"Earlier messages relevant to this question:\n{lines}"})
+            # Evicted turns the summary does not cover yet come right before the buffer
+            history.extend(turn.message() for turn in self._unsummarized)
+            history.extend(turn.message() for turn in self._buffer)
+            return history
+
+    def run(self, llm: ModelBase, query: str, system_prompt: str = "", max_tokens: int = 1000, temperature: float = 0) -> str:
+        """Answer query with llm given the remembered conversation, then remember the exchange"""
+        response = llm.run(query=query, system_prompt=system_prompt, max_tokens=max_tokens, temperature=temperature,
+                           history=self.messages(query))
+        self.add_exchange(query, response)
+        return response
+
+    def clear(self) -> None:
+        """Forget the buffer and the summary, recalled turns stay in the vector store"""
+        with self._lock:
+            self._buffer.clear()
+            self._buffer_tokens = 0
+            self._unsummarized = []
+            self._unsummarized_tokens = 0
+            self.summary = ""
+
+'''Example Usage'''
+'''llm = Models.get_Model("OpenAI")
+memory = ConversationMemory(max_tokens=1500, summarizer=llm, embeddings=TextEmbeddings(base_api_key=OPENAI_API_KEY))
+print(memory.run(llm, query="My project is a PDF search engine called Atlas."))
+for question in questions:
+    print(memory.run(llm, query=question))  # prompt size stays flat however many questions are asked
+print(memory.run(llm, query="What was my project called again?"))  # recalled from the vector store once evicted'''
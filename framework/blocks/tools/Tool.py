@@ -1,3 +1,6 @@
+import asyncio
+import functools
+import inspect
 from typing import Callable, Optional
 from abc import ABC, abstractmethod
 
@@ -14,19 +17,41 @@ class Tool(BaseTool):
     name: str
     """The unique name of the tool that clearly communicates its purpose."""
     func: Optional[Callable[..., str]]
+    """A plain function or an async (coroutine) function."""
     description: str
     """Used to tell the model how/when/why to use the tool.
     
     You can provide few-shot examples as a part of the description.
     """
+    timeout: Optional[float]
+    """Seconds a call may take when run through a ToolExecutor, None for no limit."""
+    max_concurrency: Optional[int]
+    """How many calls of this tool a ToolExecutor runs at once, None for no limit."""
+    cache_ttl: Optional[float]
+    """Seconds a result is reused for the same arguments. Only set it for pure or idempotent tools."""
     
-    def __init__(self, name, func, description):
+    def __init__(self, name, func, description, timeout: float = None, max_concurrency: int = None, cache_ttl: float = None):
         self.name = name
         self.func = func
         self.description = description
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache_ttl = cache_ttl
         
-    def run(self, *args):
-        return self.func(*args)
+    @property
+    def is_async(self) -> bool:
+        return inspect.iscoroutinefunction(self.func)
+        
+    def run(self, *args, **kwargs):
+        if self.is_async:
+            return asyncio.run(self.func(*args, **kwargs))
+        return self.func(*args, **kwargs)
+    
+    async def arun(self, *args, executor=None, **kwargs):
+        """Run the tool without blocking the event loop, sync functions run in a worker thread of executor"""
+        if self.is_async:
+            return await self.func(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(self.func, *args, **kwargs))
         
 #Example usage
 '''from search import search
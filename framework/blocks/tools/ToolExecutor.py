@@ -0,0 +1,221 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from framework.blocks.tools.Tool import Tool
+
+class ToolCall():
+    """A single call of a named tool with its arguments"""
+    name: str
+    args: tuple
+    kwargs: dict
+
+    def __init__(self, name: str, *args, **kwargs):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+
+    def __repr__(self) -> str:
+        return f"ToolCall({self.name!r}, args={self.args!r}, kwargs={self.kwargs!r})"
+
+class ToolResult():
+    """The outcome of a ToolCall, output is None when error is set"""
+    call: ToolCall
+    output: Any
+    error: Optional[BaseException]
+    cached: bool
+    seconds: float
+
+    def __init__(self, call: ToolCall, output: Any = None, error: BaseException = None, cached: bool = False, seconds: float = 0.0):
+        self.call = call
+        self.output = output
+        self.error = error
+        self.cached = cached
+        self.seconds = seconds
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        status = f"error={self.error!r}" if self.error is not None else f"output={self.output!r}"
+        return f"ToolResult({self.call.name!r}, {status}, cached={self.cached}, seconds={self.seconds:.3f})"
+
+class ToolResultCache():
+    """Thread-safe result cache keyed on tool name and arguments, every entry expires after its tool's TTL"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(call: ToolCall) -> str:
+        return json.dumps([call.name, call.args, sorted(call.kwargs.items())], default=repr, ensure_ascii=False)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False, None
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first, then the oldest ones
+                now = time.monotonic()
+                for stale in [k for k, (expires, _) in self._entries.items() if expires < now]:
+                    del self._entries[stale]
+                while len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class ToolExecutor():
+    """
+    Runs independent tool calls in parallel.
+
+    Each call is bounded by its tool's timeout (or default_timeout) and max_concurrency,
+    sync tools run in the executor's worker threads and async tools on the event loop.
+    Tools with a cache_ttl have their results cached on name and arguments, and identical
+    calls already running are awaited instead of started twice. Failures and timeouts are
+    returned as ToolResult errors so one slow tool never loses the other results.
+
+    Args:
+        tools: The tools that can be called, looked up by name.
+        default_timeout: Timeout for tools that do not set one.
+        max_concurrency: Cap on calls running at once across all tools.
+        cache: Result cache, a new one is created when not given.
+        max_threads: Worker threads for sync tools. A sync call that times out keeps its thread,
+            and its concurrency slots, until the function returns, but it no longer holds up the caller.
+    """
+    tools: Dict[str, Tool]
+
+    def __init__(self, tools: List[Tool], default_timeout: float = None, max_concurrency: int = None, cache: ToolResultCache = None, max_threads: int = 16):
+        self.tools = {tool.name: tool for tool in tools}
+        self.default_timeout = default_timeout
+        self.max_concurrency = max_concurrency
+        self.cache = cache if cache is not None else ToolResultCache()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._threads = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="tool")
+
+    def _semaphore(self, tool: Tool) -> Optional[asyncio.Semaphore]:
+        if not tool.max_concurrency:
+            return None
+        if tool.name not in self._semaphores:
+            self._semaphores[tool.name] = asyncio.Semaphore(tool.max_concurrency)
+        return self._semaphores[tool.name]
+
+    async def _invoke(self, tool: Tool, call: ToolCall):
+        timeout = tool.timeout if tool.timeout is not None else self.default_timeout
+        limits = [semaphore for semaphore in (self._global_semaphore, self._semaphore(tool)) if semaphore is not None]
+        for semaphore in limits:
+            await semaphore.acquire()
+        if tool.is_async:
+            # A timed out coroutine is cancelled, so its slots are free once wait_for returns
+            try:
+                return await asyncio.wait_for(tool.arun(*call.args, **call.kwargs), timeout)
+            finally:
+                self._release(limits)
+        # A timed out thread can't be stopped, its slots stay taken until the function returns
+        loop = asyncio.get_running_loop()
+        try:
+            job = self._threads.submit(functools.partial(tool.func, *call.args, **call.kwargs))
+        except BaseException:
+            self._release(limits)
+            raise
+        job.add_done_callback(lambda _: self._release_threadsafe(loop, limits))
+        return await asyncio.wait_for(asyncio.wrap_future(job), timeout)
+
+    @staticmethod
+    def _release(limits: List[asyncio.Semaphore]) -> None:
+        for semaphore in reversed(limits):
+            semaphore.release()
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop, limits: List[asyncio.Semaphore]) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release, limits)
+        except RuntimeError:
+            # The loop is closed, its semaphores went with it
+            pass
+
+    async def run(self, call: Union[ToolCall, Tuple]) -> ToolResult:
+        """Run one call, a tuple is read as (tool name, *args)"""
+        if not isinstance(call, ToolCall):
+            call = ToolCall(call[0], *call[1:])
+        start = time.perf_counter()
+        tool = self.tools.get(call.name)
+        if tool is None:
+            return ToolResult(call, error=KeyError(f"Unknown tool {call.name}, available: {', '.join(self.tools)}"))
+        if self.max_concurrency and self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if not tool.cache_ttl:
+            try:
+                return ToolResult(call, output=await self._invoke(tool, call), seconds=time.perf_counter() - start)
+            except Exception as e:
+                return ToolResult(call, error=e, seconds=time.perf_counter() - start)
+
+        key = ToolResultCache.key(call)
+        hit, value = self.cache.get(key)
+        if hit:
+            return ToolResult(call, output=value, cached=True, seconds=time.perf_counter() - start)
+        if key in self._in_flight:
+            # The same call is already running, share its result
+            try:
+                return ToolResult(call, output=await asyncio.shield(self._in_flight[key]), cached=True, seconds=time.perf_counter() - start)
+            except Exception as e:
+                return ToolResult(call, error=e, seconds=time.perf_counter() - start)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            output = await self._invoke(tool, call)
+            self.cache.set(key, output, tool.cache_ttl)
+            future.set_result(output)
+            return ToolResult(call, output=output, seconds=time.perf_counter() - start)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            return ToolResult(call, error=e, seconds=time.perf_counter() - start)
+        finally:
+            if not future.done():
+                # Cancelled, let anyone sharing this call retry on their own
+                future.cancel()
+            del self._in_flight[key]
+
+    async def run_all(self, calls: List[Union[ToolCall, Tuple]]) -> List[ToolResult]:
+        """Run independent calls concurrently, results come back in call order"""
+        return list(await asyncio.gather(*(self.run(call) for call in calls)))
+
+    def run_all_sync(self, calls: List[Union[ToolCall, Tuple]]) -> List[ToolResult]:
+        """run_all for code without an event loop"""
+        # Semaphores belong to the loop that first uses them, a fresh loop needs fresh ones
+        self._semaphores = {}
+        self._global_semaphore = None
+        return asyncio.run(self.run_all(calls))
+
+#Example usage
+'''from search import search, async_search
+
+searchTool = Tool(name="Search", func=async_search, description="useful for current events", timeout=10, max_concurrency=3, cache_ttl=300)
+calculatorTool = Tool(name="Calculator", func=eval, description="evaluates arithmetic", cache_ttl=3600)
+
+executor = ToolExecutor(tools=[searchTool, calculatorTool], default_timeout=30)
+results = executor.run_all_sync([("Search", "weather in New York"), ("Search", "weather in Paris"), ("Calculator", "2**10")])
+for result in results:
+    print(result.call.name, result.output if result.ok else result.error)'''
@@ -0,0 +1,91 @@
+import statistics
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from framework.models.Models import ModelBase
+
+def resolve_model(spec: Union[ModelBase, str], base: ModelBase) -> ModelBase:
+    """
+    A model instance for spec: instances are used as they are, a model name gives
+    base.with_model(spec), base's endpoint, key and connection settings asking for that
+    model. Bases that can't switch models raise instead of silently keeping their own.
+    """
+    if spec is None or not isinstance(spec, str):
+        return spec
+    return base.with_model(spec)
+
+class CascadePolicy():
+    """
+    Scores with a small, fast model first and only asks the large one when the small
+    model's answer is not trustworthy enough to act on:
+
+    - none of its responses held a number,
+    - its samples disagree by more than max_spread, or
+    - the score lies within margin of a decision threshold, where an error flips the
+      decision. AoTAgent uses its pruning and value thresholds when none are given.
+
+    Scores far from every threshold are used as they are, which is most of them, so most
+    scoring calls are served by the small model.
+
+    Args:
+        small: The model tried first, an instance or a model name on the agent's endpoint.
+        large: The model escalated to, the role's own model when None.
+        samples: Small model scores drawn per state, their spread measures its confidence.
+        max_spread: Difference between the highest and lowest sample from which to escalate.
+        margin: Distance to a threshold within which to escalate.
+        thresholds: The decision thresholds scores are compared against.
+    """
+    samples: int
+    max_spread: float
+    margin: float
+    thresholds: Tuple[float, ...]
+
+    def __init__(self,
+                 small: Union[ModelBase, str],
+                 large: Union[ModelBase, str] = None,
+                 samples: int = 2,
+                 max_spread: float = 20.0,
+                 margin: float = 5.0,
+                 thresholds: Sequence[float] = None):
+        self.small = small
+        self.large = large
+        self.samples = max(samples, 1)
+        self.max_spread = max_spread
+        self.margin = margin
+        self.thresholds = tuple(thresholds) if thresholds is not None else None
+        self._lock = threading.Lock()
+        self.decisions = 0
+        self.escalations = 0
+        self.reasons = {"no_score": 0, "spread": 0, "margin": 0}
+
+    def decide(self, scores: List[Optional[float]]) -> Tuple[Optional[float], bool]:
+        """(combined small model score, whether to escalate) for the small model's sample scores"""
+        valid = [score for score in scores if score is not None]
+        reason = None
+        score = statistics.mean(valid) if valid else None
+        if score is None:
+            reason = "no_score"
+        elif max(valid) - min(valid) > self.max_spread:
+            reason = "spread"
+        elif any(abs(score - threshold) < self.margin for threshold in self.thresholds or ()):
+            reason = "margin"
+        with self._lock:
+            self.decisions += 1
+            if reason is not None:
+                self.escalations += 1
+                self.reasons[reason] += 1
+        return score, reason is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"decisions": self.decisions, "escalations": self.escalations,
+                    "escalation_rate": self.escalations / self.decisions if self.decisions else 0.0,
+                    "reasons": dict(self.reasons)}
+
+'''Example Usage'''
+'''agent = AoTAgent(api_key=OPENAI_API_KEY, model="gpt-4-32k",
+                 role_models={"generate": "gpt-4", "evaluate": "gpt-4", "solve": "gpt-4-32k"},
+                 cascade=CascadePolicy(small="gpt-3.5-turbo", samples=2, margin=5),
+                 pruning_threshold=50, value_threshold=80, initial_prompt=task)
+print(agent.solve())
+print(agent.model.cascade.stats())  # share of scoring calls that needed the large model'''
@@ -1,10 +1,15 @@
 from abc import ABC, abstractmethod
+import contextlib
+import copy
+import threading
 import time
 import openai
 from termcolor import colored
-import tiktoken
 import os
+from framework.models.TokenCounter import TokenCounter, get_token_counter
+from framework.tracing.Tracer import span
 from enum import Enum
+from typing import Dict, List
         
 class ModelBase(ABC):
     
@@ -16,6 +21,23 @@ class ModelBase(ABC):
     def run(self):
         pass
     
+    def with_model(self, model: str) -> "ModelBase":
+        """A copy of this model that asks for another model name on the same endpoint"""
+        raise TypeError(f"{type(self).__name__} can't be copied for model {model}, pass a model instance instead of its name")
+    
+def use_pooled_session(pool_size: int = 32):
+    """
+    Make every thread share one requests session with a connection pool of pool_size,
+    instead of the session per thread the openai client builds by default.
+    """
+    import requests
+    if not isinstance(openai.requestssession, requests.Session):
+        session = requests.Session()
+        for prefix in ("https://", "http://"):
+            session.mount(prefix, requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=2))
+        openai.requestssession = session
+    return openai.requestssession
+    
 class OpenAI(ModelBase):
     """
     The OpenAI model for usage in an Agent.
@@ -23,23 +45,29 @@ class OpenAI(ModelBase):
     model: str
     stream: bool
     chatEncoding: object
+    token_counter: TokenCounter
     strategy: str
     evaluation_strategy: str
     base_api_key: str
     base_url :str
+    max_in_flight: int
         
     def __init__(self, 
                  base_api_key: str = "", 
-                 chatEncoding = tiktoken.get_encoding("cl100k_base"), 
+                 chatEncoding = None, 
                  model: str = "gpt-3.5-turbo", 
                  base_url :str = 'https://api.openai.com/v1', 
                  stream: bool = True,
                  strategy="cot",
-                 evaluation_strategy="value",):
+                 evaluation_strategy="value",
+                 max_in_flight: int = None,):
         
         self.model = model
         self.stream = stream
         self.chatEncoding = chatEncoding
+        # The shared cl100k counter unless a specific encoding was given
+        self.token_counter = TokenCounter(encoding=chatEncoding) if chatEncoding is not None else get_token_counter("cl100k_base")
+        self.set_max_in_flight(max_in_flight)
         
         if base_api_key == "" or base_api_key is None:
             from dotenv import load_dotenv
@@ -53,73 +81,97 @@ class OpenAI(ModelBase):
         self.strategy = strategy
         self.evaluation_strategy = evaluation_strategy
         
+    def get_chat_encoding(self):
+        # tiktoken is only loaded the first time tokens are counted, not at import time
+        return self.token_counter.encoding
+        
+    def set_max_in_flight(self, max_in_flight: int = None):
+        """Cap the number of requests this instance has open at once, shared by every thread using it"""
+        self.max_in_flight = max_in_flight
+        self._in_flight = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        
+    def in_flight(self):
+        return self._in_flight if self._in_flight is not None else contextlib.nullcontext()
+        
     def set_api_info(self, base_api_key: str = "", base_url :str = 'https://api.openai.com/v1'):
         openai.api_base = base_url
         openai.api_key =  base_api_key
         
+    def with_model(self, model: str) -> "OpenAI":
+        """A copy asking for another model, sharing the endpoint, the in-flight cap and the token counter"""
+        llm = copy.copy(self)
+        llm.model = model
+        return llm
+        
     def run_with_streaming(self, 
                          query: str,
                          system_prompt: str = "", 
                          show_token_consumption: bool = True, 
                          total_session_tokens: int = 0,
                          temperature: int = 0,
-                         max_tokens: int = 1000):
-        memory = ([
-        { "role": "system", "content": system_prompt},
-        { "role": "user", "content": query },
-        ])
-        
-        total_session_tokens = sum([len(self.chatEncoding.encode(message["content"])) for message in memory])
-        
-        response = openai.ChatCompletion.create(
-            model=self.model,
-            messages=memory,
-            temperature=temperature,
-            stream=self.stream,
-            max_tokens=max_tokens,) 
-        '''with open("openai.logs", "a", encoding='utf-8') as log_file:
-                    log_file.write(
-                        "\n" + "-----------" + "\n" + "System Prompt : " + system_prompt + "\n" +
-                        "\n" + "-----------" + "\n" + "Prompt : " + query + "\n"
-                    )'''
-        if(self.stream):
-            tokens_used = 0
-            responses = ''
+                         max_tokens: int = 1000,
+                         history: List[Dict[str, str]] = None):
+        memory = self.build_messages(query, system_prompt, history)
+        
+        total_session_tokens = self.token_counter.count_messages(memory)
+        
+        # The in-flight slot is held until the stream has been read to the end
+        with self.in_flight():
+            response = openai.ChatCompletion.create(
+                model=self.model,
+                messages=memory,
+                temperature=temperature,
+                stream=self.stream,
+                max_tokens=max_tokens,) 
+            '''with open("openai.logs", "a", encoding='utf-8') as log_file:
+                        log_file.write(
+                            "\n" + "-----------" + "\n" + "System Prompt : " + system_prompt + "\n" +
+                            "\n" + "-----------" + "\n" + "Prompt : " + query + "\n"
+                        )'''
+            if(self.stream):
+                tokens_used = 0
+                responses = ''
             
-            #process each chunk of the response
-            for chunk in response:
-                if "role" in chunk["choices"][0]["delta"]:
-                    continue
-                elif "content" in chunk["choices"][0]["delta"]:
-                    tokens_used += 1
+                #process each chunk of the response
+                for chunk in response:
+                    if "role" in chunk["choices"][0]["delta"]:
+                        continue
+                    elif "content" in chunk["choices"][0]["delta"]:
+                        tokens_used += 1
                     
-                    r_text = chunk["choices"][0]["delta"]["content"]
-                    responses += r_text
-                    print(colored(r_text, "green"), end='', flush=True)
+                        r_text = chunk["choices"][0]["delta"]["content"]
+                        responses += r_text
+                        print(colored(r_text, "green"), end='', flush=True)
                 
-            total_session_tokens += tokens_used
+                total_session_tokens += tokens_used
             
-            if show_token_consumption:
-                print(colored("\nTokens used this time: " + str(tokens_used), "red"))
-                print(colored("\nTokens used so far: " + str(total_session_tokens), "yellow"))
+                if show_token_consumption:
+                    print(colored("\nTokens used this time: " + str(tokens_used), "red"))
+                    print(colored("\nTokens used so far: " + str(total_session_tokens), "yellow"))
             
-            return responses
-        else:
-            return response["choices"][0]["message"]["content"]
+                return responses
+            else:
+                return response["choices"][0]["message"]["content"]
+        
+    @staticmethod
+    def build_messages(query: str, system_prompt: str = "", history: List[Dict[str, str]] = None) -> List[Dict[str, str]]:
+        """The system prompt, then the earlier conversation (e.g. ConversationMemory.messages()), then the query"""
+        return [{ "role": "system", "content": system_prompt}, *(history or ()), {"role": "user", "content": query}]
         
-    def run(self, query, system_prompt: str = "", max_tokens: int = 1000, temperature: int = 0):
+    def run(self, query, system_prompt: str = "", max_tokens: int = 1000, temperature: int = 0, history: List[Dict[str, str]] = None):
         while True:
             try:
-                messages = [
-                    { "role": "system", "content": system_prompt},
-                    {"role": "user", "content": query}
-                    ]
-                response = openai.ChatCompletion.create(
-                    model=self.model,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    temperature=temperature
-                    )
+                messages = self.build_messages(query, system_prompt, history)
+                with span("openai.chat", "llm", model=self.model, max_tokens=max_tokens) as traced_call, self.in_flight():
+                    response = openai.ChatCompletion.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature
+                        )
+                    if traced_call:
+                        usage = response.get("usage") or {}
+                        traced_call.set(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
                 '''with open("openai.logs", "a", encoding='utf-8') as log_file:
                     log_file.write(
                         "\n" + "-----------" + "\n" + "System Prompt : " + system_prompt + "\n" +
@@ -127,20 +179,21 @@ class OpenAI(ModelBase):
                     )'''
                 return response["choices"][0]["message"]["content"]
             except Exception as e:
-                sleep_duration = os.environ.get("OPENAI_RATE_TIMEOUT", 10)
+                sleep_duration = float(os.environ.get("OPENAI_RATE_TIMEOUT", 10))
                 print(
                     f"ERROR, sleeping for {sleep_duration}s and retrying..."
                 )
                 time.sleep(sleep_duration)
 
 class Models(Enum):
-    OpenAI = OpenAI()
+    # Members hold the model classes, an instance is only built when get_Model is called
+    OpenAI = OpenAI
     
     @staticmethod
     def get_Model(model_name: str):
         for model in Models:
             if model.name == model_name:
-                return model.value
+                return model.value()
         return None
         
          
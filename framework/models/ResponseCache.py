@@ -0,0 +1,63 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+class ResponseCache():
+    """
+    Thread-safe exact-match cache of LLM responses, shareable between agents.
+
+    Each prompt key holds the list of responses seen for it, in order. Callers ask for
+    a response by position: greedy calls (temperature 0) always read position 0, while
+    sampled calls keep their own per-key counter, so the k samples an agent draws for a
+    state stay distinct and a second agent asking the same thing reuses them in order
+    before going to the model. Keys are evicted least recently used past max_entries.
+
+    Args:
+        max_entries: The number of prompt keys kept.
+        max_samples: The number of responses kept per key for sampled calls.
+    """
+    max_entries: int
+    max_samples: int
+
+    def __init__(self, max_entries: int = 10000, max_samples: int = 8):
+        self.max_entries = max_entries
+        self.max_samples = max_samples
+        self._entries: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, system_prompt: str, query: str, max_tokens: int, temperature: float) -> str:
+        return hashlib.sha1(json.dumps([model, system_prompt, query, max_tokens, temperature], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key: str, index: int = 0) -> Optional[str]:
+        with self._lock:
+            responses = self._entries.get(key)
+            if responses is None or index >= len(responses):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return responses[index]
+
+    def add(self, key: str, response: str) -> None:
+        with self._lock:
+            responses = self._entries.setdefault(key, [])
+            if len(responses) < self.max_samples:
+                responses.append(response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0}
@@ -0,0 +1,302 @@
+import copy
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import openai
+from termcolor import colored
+
+from framework.models.Models import ModelBase, OpenAI
+from framework.models.TokenCounter import TokenCounter, get_token_counter
+from framework.tracing.Tracer import span
+
+class Endpoint():
+    """
+    One OpenAI-compatible base URL with its own key, and the latency and error history
+    the router ranks it by.
+
+    After failure_threshold failures in a row the endpoint is taken out of rotation for
+    cooldown seconds, then it gets traffic again and goes back out on the next failure.
+
+    Args:
+        api_base: The base URL, e.g. 'https://api.openai.com/v1'.
+        api_key: Its key, the router's key when empty.
+        model: Model name on this endpoint, the router's model when None.
+        name: Label in stats(), the base URL by default.
+        window: Latencies kept for the percentiles.
+    """
+    api_base: str
+    api_key: str
+    model: Optional[str]
+    name: str
+
+    def __init__(self, api_base: str, api_key: str = "", model: str = None, name: str = None, window: int = 200):
+        self.api_base = api_base
+        self.api_key = api_key
+        self.model = model
+        self.name = name or api_base
+        self.latencies: "deque[float]" = deque(maxlen=window)
+        self.average_latency: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    def healthy(self, now: float = None) -> bool:
+        return (now if now is not None else time.monotonic()) >= self.down_until
+
+    def expected_latency(self) -> float:
+        """Moving average latency scaled by the requests already waiting on it, 0 until it was tried once"""
+        with self._lock:
+            if self.average_latency is None:
+                return 0.0
+            return self.average_latency * (1 + self.in_flight)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            return float(np.percentile(self.latencies, q)) if self.latencies else None
+
+    def begin(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.latencies.append(latency)
+            self.average_latency = latency if self.average_latency is None else 0.8 * self.average_latency + 0.2 * latency
+
+    def record_failure(self, failure_threshold: int, cooldown: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= failure_threshold:
+                self.down_until = time.monotonic() + cooldown
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        with self._lock:
+            return {"name": self.name, "healthy": self.healthy(), "successes": self.successes, "failures": self.failures,
+                    "in_flight": self.in_flight, "average_latency": self.average_latency, "p50": p50, "p95": p95}
+
+class RouterModel(ModelBase):
+    """
+    A model that spreads calls over a pool of OpenAI-compatible endpoints, usable anywhere
+    an OpenAI model is, e.g. AoTAgent(llm=RouterModel(...)).
+
+    Every call goes to the healthy endpoint with the lowest expected latency (untried ones
+    first, so each gets measured). A failed call is retried on the next endpoint right away,
+    and endpoints that keep failing are skipped for cooldown seconds.
+
+    With hedge=True a duplicate of a call still running after the primary endpoint's
+    p95 latency (hedge_quantile) is sent to the next endpoint, and the first answer wins.
+    That trims the slow tail for about (100 - hedge_quantile)% extra calls. The loser is
+    not cancelled, openai 0.28 calls cannot be interrupted, but its latency still counts.
+
+    Args:
+        endpoints: Endpoint instances, base URLs or dicts of Endpoint arguments.
+        model: Default model name.
+        api_key: Default key of endpoints without their own.
+        hedge: Send hedged duplicates of slow calls.
+        hedge_quantile: Latency percentile of the primary endpoint after which a call is hedged.
+        hedge_delay: Fixed hedge delay in seconds instead of the percentile.
+        default_hedge_delay: Hedge delay while an endpoint has fewer than min_samples latencies.
+        min_hedge_delay: Lower bound of the hedge delay.
+        max_hedges: Duplicates sent per call at most, failover retries are not counted.
+        failure_threshold: Failures in a row that take an endpoint out of rotation.
+        cooldown: Seconds an endpoint stays out of rotation.
+        request_timeout: Seconds before a call counts as failed.
+        max_workers: Threads running hedged calls.
+    """
+    model: str
+    endpoints: List[Endpoint]
+    hedge: bool
+    token_counter: TokenCounter
+    strategy: str
+    evaluation_strategy: str
+
+    def __init__(self,
+                 endpoints: List[Union[Endpoint, str, Dict[str, Any]]],
+                 model: str = "gpt-3.5-turbo",
+                 api_key: str = "",
+                 hedge: bool = False,
+                 hedge_quantile: float = 95,
+                 hedge_delay: float = None,
+                 default_hedge_delay: float = 1.0,
+                 min_hedge_delay: float = 0.05,
+                 min_samples: int = 20,
+                 max_hedges: int = 1,
+                 failure_threshold: int = 3,
+                 cooldown: float = 30.0,
+                 request_timeout: float = 120,
+                 max_workers: int = 32,
+                 strategy="cot",
+                 evaluation_strategy="value",):
+        if not endpoints:
+            raise ValueError("RouterModel needs at least one endpoint")
+        self.endpoints = [endpoint if isinstance(endpoint, Endpoint) else
+                          Endpoint(**endpoint) if isinstance(endpoint, dict) else Endpoint(endpoint)
+                          for endpoint in endpoints]
+        self.model = model
+        self.api_key = api_key
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.request_timeout = request_timeout
+        self.strategy = strategy
+        self.evaluation_strategy = evaluation_strategy
+        self.token_counter = get_token_counter("cl100k_base")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="router") if hedge else None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failovers = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def set_api_info(self, base_api_key: str = "", base_url: str = None):
+        """Default key of the endpoints, the base URLs come from the pool"""
+        self.api_key = base_api_key
+
+    def with_model(self, model: str) -> "RouterModel":
+        """
+        A copy asking every endpoint for another model, sharing the endpoints and their
+        health. Endpoints that set their own model would ignore it, so that raises.
+        """
+        pinned = [endpoint.name for endpoint in self.endpoints if endpoint.model]
+        if pinned:
+            raise ValueError(f"Endpoints {', '.join(pinned)} set their own model, pass a RouterModel for {model} instead of its name")
+        router = copy.copy(self)
+        router.model = model
+        return router
+
+    def rank(self) -> List[Endpoint]:
+        """Healthy endpoints fastest first, then the ones cooling down, soonest back first"""
+        now = time.monotonic()
+        healthy = sorted((endpoint for endpoint in self.endpoints if endpoint.healthy(now)), key=Endpoint.expected_latency)
+        cooling = sorted((endpoint for endpoint in self.endpoints if not endpoint.healthy(now)), key=lambda endpoint: endpoint.down_until)
+        return healthy + cooling
+
+    def hedge_delay_for(self, endpoint: Endpoint) -> float:
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        delay = self.default_hedge_delay
+        if len(endpoint.latencies) >= self.min_samples:
+            delay = endpoint.percentile(self.hedge_quantile)
+        return max(delay, self.min_hedge_delay)
+
+    def call(self, endpoint: Endpoint, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+        """One request to one endpoint, its outcome is recorded on the endpoint"""
+        endpoint.begin()
+        start = time.perf_counter()
+        with span("router.call", "llm", endpoint=endpoint.name, model=endpoint.model or self.model, max_tokens=max_tokens) as traced_call:
+            try:
+                response = openai.ChatCompletion.create(
+                    model=endpoint.model or self.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    api_base=endpoint.api_base,
+                    api_key=endpoint.api_key or self.api_key,
+                    request_timeout=self.request_timeout,
+                    )
+            except Exception:
+                endpoint.record_failure(self.failure_threshold, self.cooldown)
+                raise
+            if traced_call:
+                usage = response.get("usage") or {}
+                traced_call.set(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+        endpoint.record_success(time.perf_counter() - start)
+        return response["choices"][0]["message"]["content"]
+
+    def run(self, query, system_prompt: str = "", max_tokens: int = 1000, temperature: int = 0, history: List[Dict[str, str]] = None):
+        messages = OpenAI.build_messages(query, system_prompt, history)
+        with self._lock:
+            self.calls += 1
+        if self.hedge:
+            return self._run_hedged(messages, max_tokens, temperature)
+        last_error = None
+        for endpoint in self.rank():
+            try:
+                return self.call(endpoint, messages, max_tokens, temperature)
+            except Exception as error:
+                last_error = error
+                with self._lock:
+                    self.failovers += 1
+                print(colored(f"Endpoint {endpoint.name} failed ({error}), failing over", "red"))
+        raise RuntimeError(f"All {len(self.endpoints)} endpoints failed") from last_error
+
+    def _run_hedged(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+        candidates = iter(self.rank())
+        pending = {}
+        duplicates = set()
+
+        def launch() -> Optional[Endpoint]:
+            endpoint = next(candidates, None)
+            if endpoint is not None:
+                pending[self._executor.submit(self.call, endpoint, messages, max_tokens, temperature)] = endpoint
+            return endpoint
+
+        primary = launch()
+        hedges, last_error = 0, None
+        while pending:
+            timeout = self.hedge_delay_for(primary) if hedges < self.max_hedges else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Slower than the primary's usual tail, race a duplicate against it
+                duplicate = launch()
+                if duplicate is not None:
+                    duplicates.add(duplicate)
+                    with self._lock:
+                        self.hedged += 1
+                hedges += 1
+                continue
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as error:
+                    last_error = error
+                    with self._lock:
+                        self.failovers += 1
+                    print(colored(f"Endpoint {endpoint.name} failed ({error}), failing over", "red"))
+                    if not pending:
+                        launch()
+                    continue
+                if endpoint in duplicates:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return response
+        raise RuntimeError(f"All {len(self.endpoints)} endpoints failed") from last_error
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": self.calls, "failovers": self.failovers, "hedged": self.hedged, "hedge_wins": self.hedge_wins,
+                    "endpoints": [endpoint.stats() for endpoint in self.endpoints]}
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+'''Example Usage'''
+'''llm = RouterModel([
+        {"api_base": "https://api.openai.com/v1", "api_key": OPENAI_API_KEY},
+        {"api_base": "https://api.nova-oss.com/v1", "api_key": NOVA_API_KEY},
+        {"api_base": "https://thirdparty.webraft.in/v1", "api_key": WEBRAFT_API_KEY},
+    ], model="gpt-3.5-turbo", hedge=True)
+agent = AoTAgent(llm=llm, num_thoughts=2, max_steps=3, initial_prompt=task)
+print(agent.solve())
+print(llm.stats())'''
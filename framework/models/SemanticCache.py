@@ -0,0 +1,262 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from framework.blocks.knowledge.vectorStores.LocalVectorStore import LocalVectorStore
+from framework.models.Models import ModelBase
+
+def same_response(response1: str, response2: str) -> bool:
+    """Default false-hit check, responses are equal up to case and whitespace"""
+    normalize = lambda text: re.sub(r"\s+", " ", str(text)).strip().casefold()
+    return normalize(response1) == normalize(response2)
+
+class SemanticCache():
+    """
+    Cache of LLM responses looked up by prompt meaning instead of exact text.
+
+    Prompts are embedded (e.g. with TextEmbeddings) and searched in a LocalVectorStore per
+    model and max_tokens. The closest past prompt's response is returned when its cosine
+    similarity reaches threshold. Entries are evicted least recently used past max_entries
+    and expire max_age seconds after they were stored. Identical prompts skip the embedding.
+
+    Calls with a temperature above max_temperature bypass the cache, they ask for variety.
+
+    Tuning: every miss that had a candidate below the threshold compares the candidate's
+    response with the fresh one for free, and verify_rate re-runs that share of hits against
+    the model, so threshold_report() can show the hit and false-hit rates of other thresholds.
+
+    Args:
+        embeddings: TextEmbeddings-like object with get_embedding(text), or a function text -> vector.
+        threshold: Cosine similarity from which a cached response is returned.
+        max_entries: The number of prompts kept.
+        max_age: Seconds a response stays valid, None keeps it until evicted by size.
+        dimension: Embedding length.
+        max_temperature: Calls above this temperature are not cached.
+        verify_rate: Share of hits that are also run against the model to count false hits.
+        judge: Function telling whether two responses are equivalent, same_response by default.
+    """
+    threshold: float
+    max_entries: int
+    max_age: Optional[float]
+    verify_rate: float
+
+    def __init__(self,
+                 embeddings,
+                 threshold: float = 0.95,
+                 max_entries: int = 5000,
+                 max_age: Optional[float] = 24 * 3600,
+                 dimension: int = 1536,
+                 max_temperature: float = 0.0,
+                 verify_rate: float = 0.0,
+                 judge: Callable[[str, str], bool] = same_response,
+                 seed: int = None):
+        self._embed = embeddings.get_embedding if hasattr(embeddings, "get_embedding") else embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.dimension = dimension
+        self.max_temperature = max_temperature
+        self.verify_rate = verify_rate
+        self.judge = judge
+        self._random = random.Random(seed)
+        self._stores: Dict[str, LocalVectorStore] = {}
+        # entry id -> (partition, created, response), least recently used first
+        self._entries: "OrderedDict[str, Tuple[str, float, str]]" = OrderedDict()
+        # The most recent outcomes and lookup similarities, for threshold_report
+        self._samples: "deque[Tuple[float, bool]]" = deque(maxlen=10000)
+        self._best_similarities: "deque[float]" = deque(maxlen=10000)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.verified = 0
+        self.false_hits = 0
+        self.expired = 0
+
+    @staticmethod
+    def partition(model: str, max_tokens: int) -> str:
+        return f"{model}:{max_tokens}"
+
+    @staticmethod
+    def prompt_text(system_prompt: str, query: str) -> str:
+        return f"{system_prompt}\n\n{query}" if system_prompt else query
+
+    @staticmethod
+    def _digest(partition: str, text: str) -> str:
+        return hashlib.sha1(json.dumps([partition, text], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.max_age is not None and time.time() - created > self.max_age
+
+    def _delete(self, entry_id: str) -> None:
+        partition, _, _ = self._entries.pop(entry_id)
+        self._stores[partition].delete([entry_id])
+
+    def lookup(self, partition: str, text: str) -> Tuple[Optional[str], Optional[List[float]], float, Optional[str]]:
+        """
+        Returns (response, embedding, similarity, entry id). response is None on a miss, the
+        embedding is then passed back to add() so the prompt is not embedded twice.
+        """
+        with self._lock:
+            # Entries are keyed on the digest of their prompt, so identical prompts are found without embedding
+            entry_id = self._digest(partition, text)
+            if entry_id in self._entries:
+                created, response = self._entries[entry_id][1:]
+                if not self._expired(created):
+                    self._entries.move_to_end(entry_id)
+                    self.exact_hits += 1
+                    return response, None, 1.0, entry_id
+        embedding = self._embed(text)
+        with self._lock:
+            store = self._stores.get(partition)
+            matches = store.query(vector=embedding, top_k=1)["matches"] if store is not None and len(store) else []
+            if not matches:
+                return None, embedding, 0.0, None
+            entry_id, similarity = matches[0]["id"], matches[0]["score"]
+            created, response = self._entries[entry_id][1:]
+            if self._expired(created):
+                self._delete(entry_id)
+                self.expired += 1
+                return None, embedding, 0.0, None
+            self._best_similarities.append(similarity)
+            if similarity < self.threshold:
+                return None, embedding, similarity, entry_id
+            self._entries.move_to_end(entry_id)
+            return response, embedding, similarity, entry_id
+
+    def add(self, partition: str, text: str, response: str, embedding: List[float] = None) -> None:
+        if embedding is None:
+            embedding = self._embed(text)
+        digest = self._digest(partition, text)
+        with self._lock:
+            if partition not in self._stores:
+                self._stores[partition] = LocalVectorStore(dimension=self.dimension, metric='cosine', initial_capacity=64)
+            self._stores[partition].upsert([(digest, embedding, {})])
+            self._entries[digest] = (partition, time.time(), response)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._delete(next(iter(self._entries)))
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry, returns how many were dropped"""
+        with self._lock:
+            stale = [entry_id for entry_id, (_, created, _) in self._entries.items() if self._expired(created)]
+            for entry_id in stale:
+                self._delete(entry_id)
+            self.expired += len(stale)
+            return len(stale)
+
+    def record_outcome(self, similarity: float, correct: bool) -> None:
+        """Record whether a candidate at this similarity had the right response"""
+        with self._lock:
+            self._samples.append((similarity, correct))
+            if similarity >= self.threshold:
+                self.verified += 1
+                if not correct:
+                    self.false_hits += 1
+
+    def run(self, llm: ModelBase, query: str, system_prompt: str = "", max_tokens: int = 1000, temperature: float = 0) -> str:
+        """Answer from the cache when a close enough prompt was seen, otherwise run llm and store the response"""
+        if temperature > self.max_temperature:
+            with self._lock:
+                self.bypassed += 1
+            return llm.run(query=query, system_prompt=system_prompt, max_tokens=max_tokens, temperature=temperature)
+        partition = self.partition(getattr(llm, "model", ""), max_tokens)
+        text = self.prompt_text(system_prompt, query)
+        cached, embedding, similarity, entry_id = self.lookup(partition, text)
+        if cached is not None:
+            with self._lock:
+                # Exact hits were counted by lookup, hits are the semantic ones
+                if embedding is not None:
+                    self.hits += 1
+                verify = similarity < 1.0 and self.verify_rate and self._random.random() < self.verify_rate
+            if verify:
+                fresh = llm.run(query=query, system_prompt=system_prompt, max_tokens=max_tokens, temperature=temperature)
+                self.record_outcome(similarity, self.judge(cached, fresh))
+            return cached
+        with self._lock:
+            self.misses += 1
+        response = llm.run(query=query, system_prompt=system_prompt, max_tokens=max_tokens, temperature=temperature)
+        if entry_id is not None:
+            # The closest prompt fell under the threshold, its response tells whether it should have
+            with self._lock:
+                candidate = self._entries.get(entry_id)
+            if candidate is not None:
+                self.record_outcome(similarity, self.judge(candidate[2], response))
+        self.add(partition, text, response, embedding)
+        return response
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.exact_hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "exact_hits": self.exact_hits, "misses": self.misses,
+                    "bypassed": self.bypassed, "expired": self.expired,
+                    "hit_rate": (self.hits + self.exact_hits) / lookups if lookups else 0.0,
+                    "verified_hits": self.verified, "false_hits": self.false_hits,
+                    "false_hit_rate": self.false_hits / self.verified if self.verified else 0.0}
+
+    def threshold_report(self, thresholds: List[float] = (0.85, 0.9, 0.925, 0.95, 0.975, 0.99)) -> List[Dict[str, float]]:
+        """
+        Estimated semantic hit rate and false-hit rate per threshold, from the best
+        similarities of past lookups and the recorded outcomes of candidates.
+        """
+        with self._lock:
+            similarities = list(self._best_similarities)
+            samples = list(self._samples)
+        report = []
+        for threshold in thresholds:
+            judged = [correct for similarity, correct in samples if similarity >= threshold]
+            report.append({
+                "threshold": threshold,
+                "hit_rate": sum(similarity >= threshold for similarity in similarities) / len(similarities) if similarities else 0.0,
+                "false_hit_rate": judged.count(False) / len(judged) if judged else 0.0,
+                "samples": len(judged),
+            })
+        return report
+
+class SemanticCachedModel(ModelBase):
+    """
+    Wraps a model so its run() goes through a SemanticCache, everything else is passed
+    through to the wrapped model. Use it anywhere a model is taken, e.g. AoTAgent(llm=...).
+    """
+    llm: ModelBase
+    cache: SemanticCache
+
+    def __init__(self, llm: ModelBase, cache: SemanticCache):
+        self.llm = llm
+        self.cache = cache
+
+    def __getattr__(self, name):
+        # Only reached for attributes the wrapper lacks. copy and pickle look some up before llm is set
+        llm = self.__dict__.get("llm")
+        if llm is None:
+            raise AttributeError(name)
+        return getattr(llm, name)
+
+    def with_model(self, model: str) -> "SemanticCachedModel":
+        """The wrapped model asking for another model, through the same cache, which keeps models apart"""
+        return SemanticCachedModel(self.llm.with_model(model), self.cache)
+
+    def run(self, query, system_prompt: str = "", max_tokens: int = 1000, temperature: int = 0, history: List[Dict[str, str]] = None):
+        if history:
+            # The answer depends on the conversation, which the cache key does not cover
+            return self.llm.run(query=query, system_prompt=system_prompt, max_tokens=max_tokens, temperature=temperature, history=history)
+        return self.cache.run(self.llm, query=query, system_prompt=system_prompt, max_tokens=max_tokens, temperature=temperature)
+
+'''Example Usage'''
+'''embeddings = TextEmbeddings(base_api_key=OPENAI_API_KEY)
+cache = SemanticCache(embeddings, threshold=0.95, max_entries=5000, max_age=3600, verify_rate=0.05)
+llm = SemanticCachedModel(Models.get_Model("OpenAI"), cache)
+print(llm.run(query="What is the capital of France?"))
+print(llm.run(query="what's the capital city of France"))  # served from the cache if similar enough
+print(cache.stats())
+print(cache.threshold_report())'''
@@ -0,0 +1,151 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+class ApproximateEncoding():
+    """
+    Stand-in for a tiktoken encoding that cannot be loaded, e.g. offline without a cached
+    encoding file, when the TokenCounter allows it. Splits text into pieces of at most four characters, which tracks the
+    ~4 characters per token of English text, and decodes by joining them back.
+    """
+    name = "approximate"
+    _pattern = re.compile(r"\s*\S{1,4}|\s+$")
+
+    def encode(self, text: str, **kwargs) -> List[str]:
+        return self._pattern.findall(text)
+
+    def encode_ordinary_batch(self, texts: Sequence[str], **kwargs) -> List[List[str]]:
+        return [self.encode(text) for text in texts]
+
+    def decode(self, tokens: Sequence[str]) -> str:
+        return "".join(tokens)
+
+class TokenCounter():
+    """
+    Token counting for one encoding, shared by models, embeddings, parsers and prompts.
+
+    The encoding is loaded on first use and only once, counts are memoized in an LRU so
+    repeated strings such as system prompts and templates are encoded a single time, and
+    batches of strings are encoded together. Get the shared instance for an encoding with
+    get_token_counter rather than building one per object.
+
+    Args:
+        encoding_name: The tiktoken encoding, e.g. 'cl100k_base'.
+        encoding: An already loaded encoding object to use instead.
+        cache_size: The number of distinct strings whose counts are remembered.
+        allow_approximate: Count ~4 characters per token when the encoding can't be loaded
+            instead of raising. None reads the TOKEN_COUNTER_APPROXIMATE environment
+            variable, so offline runs can opt in without code changes. Token budgets
+            (chunk sizes, truncation, memory eviction) are then only approximate.
+    """
+    encoding_name: str
+    cache_size: int
+    allow_approximate: bool
+
+    # Per-message overhead of the chat format, see OpenAI's token counting guide
+    TOKENS_PER_MESSAGE = 3
+    TOKENS_PER_REPLY = 3
+
+    def __init__(self, encoding_name: str = "cl100k_base", encoding=None, cache_size: int = 4096, allow_approximate: bool = None):
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self.allow_approximate = allow_approximate
+        self._encoding = encoding
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            with self._lock:
+                if self._encoding is None:
+                    try:
+                        import tiktoken
+                        self._encoding = tiktoken.get_encoding(self.encoding_name)
+                    except Exception as e:
+                        allow = self.allow_approximate
+                        if allow is None:
+                            allow = os.getenv("TOKEN_COUNTER_APPROXIMATE", "") not in ("", "0")
+                        if not allow:
+                            raise RuntimeError(f"Could not load the {self.encoding_name} encoding ({e}). Pass allow_approximate=True "
+                                               "or set TOKEN_COUNTER_APPROXIMATE=1 to count ~4 characters per token instead") from e
+                        logger.warning(f"Could not load the {self.encoding_name} encoding ({e}), token counts are approximate")
+                        self._encoding = ApproximateEncoding()
+        return self._encoding
+
+    @property
+    def exact(self) -> bool:
+        return not isinstance(self.encoding, ApproximateEncoding)
+
+    def encode(self, text: str) -> list:
+        return self.encoding.encode(text, disallowed_special=())
+
+    def encode_batch(self, texts: Sequence[str]) -> List[list]:
+        return self.encoding.encode_ordinary_batch(list(texts))
+
+    def decode(self, tokens: Sequence) -> str:
+        return self.encoding.decode(tokens)
+
+    def _remember(self, text: str, count: int) -> None:
+        with self._lock:
+            self._counts[text] = count
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+
+    def _recall(self, text: str):
+        with self._lock:
+            count = self._counts.get(text)
+            if count is not None:
+                self._counts.move_to_end(text)
+            return count
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        count = self._recall(text)
+        if count is None:
+            count = len(self.encode(text))
+            self._remember(text, count)
+        return count
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        """Counts for many strings, only the ones not seen before are encoded, in one batch"""
+        counts = [self._recall(text) if text else 0 for text in texts]
+        missing = [i for i, count in enumerate(counts) if count is None]
+        if missing:
+            encoded = self.encode_batch([texts[i] for i in missing])
+            for i, tokens in zip(missing, encoded):
+                counts[i] = len(tokens)
+                self._remember(texts[i], counts[i])
+        return counts
+
+    def count_messages(self, messages: Sequence[Dict[str, str]]) -> int:
+        """Prompt tokens of a chat completion request"""
+        contents = [message.get("content") or "" for message in messages]
+        return sum(self.count_batch(contents)) + self.TOKENS_PER_MESSAGE * len(messages) + self.TOKENS_PER_REPLY
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text down to at most max_tokens tokens"""
+        if self.count(text) <= max_tokens:
+            return text
+        return self.decode(self.encode(text)[:max_tokens])
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        """Split text into consecutive chunks of at most max_tokens tokens"""
+        tokens = self.encode(text)
+        return [self.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+def get_token_counter(encoding_name: str = "cl100k_base") -> TokenCounter:
+    """The process-wide TokenCounter for an encoding"""
+    with _counters_lock:
+        if encoding_name not in _counters:
+            _counters[encoding_name] = TokenCounter(encoding_name)
+        return _counters[encoding_name]
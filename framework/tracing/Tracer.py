@@ -0,0 +1,243 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+class Span():
+    """
+    One timed phase, opened with 'with tracer.span(...)'. Spans opened inside it on the
+    same thread are its children. Attributes (step, node id, tokens, cache hit...) can be
+    given when it opens or added with set() while it runs.
+    """
+    __slots__ = ("tracer", "name", "category", "attributes", "start", "end", "thread_id", "parent", "child_time")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+        self.start = 0.0
+        self.end = 0.0
+        self.thread_id = 0
+        self.parent: Optional[Span] = None
+        self.child_time = 0.0
+
+    def __bool__(self) -> bool:
+        return True
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.tracer._push(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.tracer._pop(self)
+        return False
+
+class _NullSpan():
+    """What span() returns while tracing is off: entering, leaving and set() do nothing, and it is falsy"""
+    __slots__ = ()
+
+    def __bool__(self) -> bool:
+        return False
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class Tracer():
+    """
+    Collects nested spans from every thread and exports them as Chrome trace_event JSON,
+    which chrome://tracing, Perfetto (ui.perfetto.dev) and speedscope show as a flame
+    graph per thread.
+
+    Args:
+        max_spans: Spans kept at most, later ones are counted in dropped but not kept.
+    """
+    max_spans: int
+
+    def __init__(self, max_spans: int = 1000000):
+        self.max_spans = max_spans
+        self.origin = time.perf_counter()
+        self.dropped = 0
+        self._spans: List[Span] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def span(self, name: str, category: str = "aot", **attributes) -> Span:
+        return Span(self, name, category, attributes)
+
+    def current(self) -> Optional[Span]:
+        """The innermost open span of this thread"""
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    def _push(self, span: Span) -> None:
+        local = self._local
+        try:
+            stack = local.stack
+        except AttributeError:
+            # First span of this thread, its name is looked up once here instead of on every span
+            stack = local.stack = []
+            local.thread_id = threading.get_ident()
+            with self._lock:
+                self._threads[local.thread_id] = threading.current_thread().name
+        span.parent = stack[-1] if stack else None
+        span.thread_id = local.thread_id
+        stack.append(span)
+
+    def _pop(self, span: Span) -> None:
+        stack = self._local.stack
+        if stack and stack[-1] is span:
+            stack.pop()
+        if span.parent is not None:
+            span.parent.child_time += span.duration
+        # list.append is atomic, only the rare drop needs the lock
+        spans = self._spans
+        if len(spans) < self.max_spans:
+            spans.append(span)
+        else:
+            with self._lock:
+                self.dropped += 1
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans = []
+            self.dropped = 0
+
+    def chrome_events(self) -> List[Dict[str, Any]]:
+        """The finished spans as complete ('X') events in microseconds, plus the thread names"""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self._spans)
+            threads = dict(self._threads)
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}} for tid, name in threads.items()]
+        for span in spans:
+            events.append({"name": span.name, "cat": span.category, "ph": "X", "pid": pid, "tid": span.thread_id,
+                           "ts": (span.start - self.origin) * 1e6, "dur": span.duration * 1e6,
+                           "args": {key: value if isinstance(value, (int, float, str, bool)) or value is None else str(value)
+                                    for key, value in span.attributes.items()}})
+        return events
+
+    def export_chrome(self, path: str) -> str:
+        """Write the trace to path, open it in chrome://tracing or ui.perfetto.dev"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}, file)
+        return path
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per span name: count, total seconds and self seconds (minus children), slowest total first"""
+        totals: Dict[str, Dict[str, float]] = {}
+        for span in self.spans():
+            entry = totals.setdefault(span.name, {"count": 0, "total": 0.0, "self": 0.0})
+            entry["count"] += 1
+            entry["total"] += span.duration
+            entry["self"] += span.duration - span.child_time
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["total"]))
+
+    def print_summary(self, limit: int = 20) -> None:
+        print(f"{'span':<32}{'count':>8}{'total s':>12}{'self s':>12}")
+        for name, entry in list(self.summary().items())[:limit]:
+            print(f"{name:<32}{entry['count']:>8}{entry['total']:>12.3f}{entry['self']:>12.3f}")
+
+# The process-wide tracer, None while tracing is off
+_tracer: Optional[Tracer] = None
+
+def enable_tracing(tracer: Tracer = None) -> Tracer:
+    """Start collecting spans, in a new Tracer unless one is given"""
+    global _tracer
+    _tracer = tracer if tracer is not None else Tracer()
+    return _tracer
+
+def disable_tracing() -> Optional[Tracer]:
+    """Stop collecting spans, returns the tracer that collected them"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+def span(name: str, category: str = "aot", **attributes):
+    """A span of the active tracer, or the shared no-op span while tracing is off"""
+    tracer = _tracer
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.span(name, category, **attributes)
+
+def annotate(**attributes) -> None:
+    """Add attributes to this thread's innermost open span, if tracing is on"""
+    tracer = _tracer
+    if tracer is not None:
+        current = tracer.current()
+        if current is not None:
+            current.attributes.update(attributes)
+
+def traced(name: str = None, category: str = "aot") -> Callable:
+    """
+    Decorator wrapping every call of the function in a span, the function's qualified name
+    by default. While tracing is off a call only pays the wrapper, about 0.3 µs, and a span
+    about 3 µs while it is on, so decorate phases (a search, an expansion, a model or
+    vector store call) and not helpers called per lookup.
+    """
+    def decorator(function: Callable) -> Callable:
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+            with tracer.span(span_name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def tracing(path: str = None, tracer: Tracer = None) -> Iterator[Tracer]:
+    """Trace the block, and write the Chrome trace to path when given"""
+    previous = _tracer
+    active = enable_tracing(tracer)
+    try:
+        yield active
+    finally:
+        if previous is not None:
+            enable_tracing(previous)
+        else:
+            disable_tracing()
+        if path is not None:
+            active.export_chrome(path)
+
+'''Example Usage'''
+'''with tracing("traces/aot.json") as tracer:
+    agent = AoTAgent(api_key=OPENAI_API_KEY, num_thoughts=2, max_steps=3, initial_prompt=task)
+    agent.solve()
+tracer.print_summary()  # then open traces/aot.json in ui.perfetto.dev or chrome://tracing'''
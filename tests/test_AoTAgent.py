@@ -0,0 +1,60 @@
+import hashlib
+import threading
+import time
+
+import pytest
+
+from framework.agents.AlgorithmOfThought.AoTAgent import AoTAgent
+from framework.models.Models import ModelBase
+
+class ScriptedModel(ModelBase):
+    """
+    Thoughts are numbered per prompt and scores depend on the thought only, so a search
+    draws the same thoughts and scores whatever order its calls run in. Records how
+    many calls were running at once.
+    """
+    evaluation_strategy = "value"
+
+    def __init__(self, seconds: float = 0.02):
+        self.model = "scripted"
+        self.seconds = seconds
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def run(self, query, system_prompt: str = "", max_tokens: int = 1000, temperature: int = 0, history=None):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            sample = self._samples.get(query, 0)
+            self._samples[query] = sample + 1
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        if max_tokens <= 10:
+            thought = query.split("current state to the solution:")[1].strip().splitlines()[0]
+            return str(int(hashlib.sha1(thought.encode("utf-8")).hexdigest()[:4], 16) % 101)
+        return f"###STEP### thought {digest[:6]}-{sample}"
+
+def solve(**options):
+    llm = ScriptedModel()
+    agent = AoTAgent(llm=llm, num_thoughts=3, max_steps=1, pruning_threshold=0, value_threshold=100,
+                     initial_prompt="Make 24 from 4 4 6 8", **options)
+    agent.solve()
+    return agent, llm
+
+def test_pipelined_search_overlaps_calls_and_scores_the_same_thoughts():
+    sequential, sequential_llm = solve()
+    pipelined, pipelined_llm = solve(pipelined=True)
+    assert sequential_llm.peak == 1
+    assert pipelined_llm.peak > 1
+    assert pipelined.evaluated_thoughts == sequential.evaluated_thoughts
+    assert pipelined_llm.calls == sequential_llm.calls
+
+def test_pipelined_and_concurrent_subtrees_are_exclusive():
+    with pytest.raises(ValueError):
+        AoTAgent(llm=ScriptedModel(), pipelined=True, concurrent_subtrees=2, initial_prompt="task")
@@ -0,0 +1,60 @@
+import pytest
+
+from framework.models.Cascade import CascadePolicy, resolve_model
+from framework.models.Models import ModelBase, OpenAI
+from framework.models.Router import Endpoint, RouterModel
+from framework.models.SemanticCache import SemanticCache, SemanticCachedModel
+
+class FixedModel(ModelBase):
+    """A model that can't switch to another model name"""
+
+    def __init__(self):
+        self.model = "fixed"
+
+    def run(self, query, **kwargs):
+        return "answer"
+
+def test_decide_uses_confident_scores():
+    cascade = CascadePolicy(small=FixedModel(), max_spread=20, margin=5, thresholds=(50, 80))
+    assert cascade.decide([30, 34]) == (32, False)
+    assert cascade.decide([90, None]) == (90, False)
+
+def test_decide_escalates_missing_spread_and_close_scores():
+    cascade = CascadePolicy(small=FixedModel(), max_spread=20, margin=5, thresholds=(50, 80))
+    assert cascade.decide([None, None]) == (None, True)
+    assert cascade.decide([10, 60])[1]
+    assert cascade.decide([78, 80])[1]
+    assert cascade.stats()["reasons"] == {"no_score": 1, "spread": 1, "margin": 1}
+    assert cascade.stats()["escalation_rate"] == 1.0
+
+def test_resolve_model_keeps_instances():
+    base, instance = FixedModel(), FixedModel()
+    assert resolve_model(instance, base) is instance
+    assert resolve_model(None, base) is None
+
+def test_resolve_model_copies_openai_models():
+    base = OpenAI(base_api_key="key", model="gpt-4")
+    small = resolve_model("gpt-3.5-turbo", base)
+    assert small is not base
+    assert (small.model, base.model) == ("gpt-3.5-turbo", "gpt-4")
+    assert small.token_counter is base.token_counter
+
+def test_resolve_model_reaches_through_a_semantic_cache():
+    base = SemanticCachedModel(OpenAI(base_api_key="key", model="gpt-4"), SemanticCache(lambda text: [1.0, 0.0], dimension=2))
+    small = resolve_model("gpt-3.5-turbo", base)
+    assert isinstance(small, SemanticCachedModel) and small.cache is base.cache
+    # The inner model runs the calls, so it is the one that has to switch
+    assert (small.llm.model, base.llm.model) == ("gpt-3.5-turbo", "gpt-4")
+
+def test_resolve_model_on_a_router():
+    router = RouterModel(["http://127.0.0.1:1/v1", "http://127.0.0.1:2/v1"], model="gpt-4")
+    small = resolve_model("gpt-3.5-turbo", router)
+    assert (small.model, router.model) == ("gpt-3.5-turbo", "gpt-4")
+    assert small.endpoints == router.endpoints
+    pinned = RouterModel([Endpoint("http://127.0.0.1:1/v1", model="gpt-4", name="pinned")])
+    with pytest.raises(ValueError, match="pinned"):
+        resolve_model("gpt-3.5-turbo", pinned)
+
+def test_resolve_model_rejects_models_without_with_model():
+    with pytest.raises(TypeError):
+        resolve_model("gpt-3.5-turbo", FixedModel())
@@ -0,0 +1,58 @@
+import re
+import zlib
+
+import numpy as np
+
+from framework.blocks.memory.ConversationMemory import ConversationMemory
+from framework.models.Models import ModelBase
+from framework.models.TokenCounter import ApproximateEncoding, TokenCounter
+
+DIMENSION = 64
+
+def embed(text: str):
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    for word in re.findall(r"\w+", text.casefold()):
+        vector[zlib.crc32(word.encode("utf-8")) % DIMENSION] += 1.0
+    return vector / max(np.linalg.norm(vector), 1e-12)
+
+class Summarizer(ModelBase):
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, query, **kwargs):
+        self.calls += 1
+        return f"summary {self.calls}"
+
+def memory(**kwargs):
+    return ConversationMemory(embeddings=embed, dimension=DIMENSION, recall_min_score=0.5,
+                              token_counter=TokenCounter(encoding=ApproximateEncoding()), **kwargs)
+
+def test_buffer_stays_within_its_budget():
+    conversation = memory(max_tokens=40)
+    for i in range(20):
+        conversation.add("user", f"message number {i} about nothing")
+    assert conversation.buffer_tokens <= 40
+    assert conversation.messages()[-1]["content"] == "message number 19 about nothing"
+
+def test_evicted_turns_are_recalled():
+    conversation = memory(max_tokens=30)
+    conversation.add("user", "my project is called atlas")
+    for i in range(10):
+        conversation.add("user", f"filler {i}")
+    history = conversation.messages("what is my project called")
+    assert "my project is called atlas" in history[0]["content"]
+
+def test_turns_waiting_for_the_summary_are_not_recalled_twice():
+    summarizer = Summarizer()
+    conversation = memory(max_tokens=30, summarizer=summarizer, summary_batch_tokens=1000)
+    conversation.add("user", "my project is called atlas")
+    for i in range(10):
+        conversation.add("user", f"filler {i}")
+    assert summarizer.calls == 0
+    history = conversation.messages("what is my project called")
+    # Still in the prompt word for word, so recalling it again would only repeat it
+    assert sum("my project is called atlas" in message["content"] for message in history) == 1
+    conversation.update_summary()
+    history = conversation.messages("what is my project called")
+    assert history[0]["content"].endswith("summary 1")
+    assert "my project is called atlas" in history[1]["content"]
@@ -0,0 +1,80 @@
+import os
+
+from framework.blocks.knowledge.vectorStores.IndexSync import IndexManifest, IndexSync, content_id, document_key
+from framework.blocks.knowledge.vectorStores.LocalVectorStore import LocalVectorStore
+
+class FileSync(IndexSync):
+    """IndexSync over text files, a chunk per line keyed as '<bookmark>_<n>' like PDFParser does"""
+
+    def parse(self, path):
+        with open(path, encoding="utf-8") as f:
+            return {f"Section_{n}": line.strip() for n, line in enumerate(f)}
+
+def embed(text: str):
+    return [1.0, float(len(text)), float(sum(map(ord, text)) % 97)]
+
+def write(path, *lines):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    return str(path)
+
+def make_sync(tmp_path, calls=None):
+    def counted(text):
+        if calls is not None:
+            calls.append(text)
+        return embed(text)
+    store = LocalVectorStore(dimension=3)
+    return store, FileSync(store, counted, manifest=str(tmp_path / "manifest.json"), root=str(tmp_path / "library"))
+
+def test_content_ids_are_stable_and_prefixed_by_document():
+    assert content_id("text", "a/x.pdf") == content_id("text", "a/x.pdf")
+    assert content_id("text", "a/x.pdf").startswith(document_key("a/x.pdf") + "#")
+    assert content_id("text", "a/x.pdf") != content_id("text", "b/x.pdf")
+    assert "#" not in content_id("text")
+
+def test_second_sync_embeds_nothing(tmp_path):
+    calls = []
+    paths = [write(tmp_path / "library" / "one.txt", "alpha", "beta"), write(tmp_path / "library" / "two.txt", "gamma")]
+    store, sync = make_sync(tmp_path, calls)
+    assert sync.sync_library(paths).upserted == 3
+    report = sync.sync_library(paths)
+    assert (report.upserted, report.deleted, len(report.skipped_documents)) == (0, 0, 2)
+    assert len(calls) == 3
+    assert store.describe_index_stats()["total_vector_count"] == 3
+
+def test_edit_only_embeds_new_chunks_and_deletes_stale_ones(tmp_path):
+    calls = []
+    path = write(tmp_path / "library" / "one.txt", "alpha", "beta")
+    store, sync = make_sync(tmp_path, calls)
+    sync.sync_library([path])
+    write(path, "alpha", "delta")
+    report = sync.sync_library([path])
+    assert (report.upserted, report.deleted, report.unchanged) == (1, 1, 1)
+    assert calls[-1] == "delta"
+    assert sorted(sync.manifest.chunk_ids("one.txt")) == sorted([content_id("alpha", "one.txt"), content_id("delta", "one.txt")])
+
+def test_equally_named_files_in_different_folders_stay_apart(tmp_path):
+    paths = [write(tmp_path / "library" / "a" / "x.txt", "shared"), write(tmp_path / "library" / "b" / "x.txt", "shared")]
+    store, sync = make_sync(tmp_path)
+    sync.sync_library(paths)
+    assert sorted(sync.manifest.documents) == ["a/x.txt", "b/x.txt"]
+    assert store.describe_index_stats()["total_vector_count"] == 2
+
+def test_prune_removes_documents_no_longer_in_the_library(tmp_path):
+    paths = [write(tmp_path / "library" / "one.txt", "alpha"), write(tmp_path / "library" / "two.txt", "beta")]
+    store, sync = make_sync(tmp_path)
+    sync.sync_library(paths)
+    report = sync.sync_library(paths[:1])
+    assert report.removed_documents == ["two.txt"]
+    assert store.describe_index_stats()["total_vector_count"] == 1
+    assert list(IndexManifest(str(tmp_path / "manifest.json")).documents) == ["one.txt"]
+
+def test_same_ids_as_upsert_embeddings_from_dict(tmp_path):
+    path = write(tmp_path / "library" / "one.txt", "alpha", "beta")
+    store, sync = make_sync(tmp_path)
+    sync.sync_library([path])
+    direct = LocalVectorStore(dimension=3)
+    direct.upsert_embeddings_from_dict({"alpha": embed("alpha"), "beta": embed("beta")}, document="one.txt")
+    ids = sorted(sync.manifest.chunk_ids("one.txt"))
+    assert sorted(match["id"] for match in direct.fetch(ids)["vectors"].values()) == ids
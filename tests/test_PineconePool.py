@@ -0,0 +1,86 @@
+import pytest
+
+from framework.blocks.knowledge.vectorStores.FakePinecone import FakePinecone
+from framework.blocks.knowledge.vectorStores.PineconePool import PineconePool
+
+def test_handles_and_init_are_shared():
+    service = FakePinecone()
+    pool = PineconePool(client=service)
+    first = pool.index("key", "env", "library", dimension=3)
+    second = pool.index("key", "env", "library", dimension=3)
+    assert first is second
+    assert service.calls == {"init": 1, "whoami": 1, "list_indexes": 1, "create_index": 1}
+    assert pool.stats()["handle_hits"] == 1
+
+def test_metadata_is_cached_for_its_ttl():
+    service = FakePinecone()
+    pool = PineconePool(client=service, metadata_ttl=60)
+    pool.index("key", "env", "library", dimension=3)
+    assert pool.list_indexes("key", "env") == ["library"]
+    assert pool.describe_index("key", "env", "library")["dimension"] == 3
+    assert pool.describe_index("key", "env", "library")["dimension"] == 3
+    assert service.calls["list_indexes"] == 1
+    assert service.calls["describe_index"] == 1
+    pool.list_indexes("key", "env", refresh=True)
+    assert service.calls["list_indexes"] == 2
+
+def test_expired_metadata_is_fetched_again():
+    service = FakePinecone()
+    pool = PineconePool(client=service, metadata_ttl=0)
+    pool.list_indexes("key", "env")
+    pool.list_indexes("key", "env")
+    assert service.calls["list_indexes"] == 2
+
+def test_cache_file_spares_a_new_pool_whoami_and_list_indexes(tmp_path):
+    path = str(tmp_path / "pinecone.json")
+    service = FakePinecone()
+    PineconePool(client=service, cache_path=path).index("key", "env", "library", dimension=3)
+    service.calls.clear()
+    # A fresh process: new pool, same service and cache file
+    PineconePool(client=service, cache_path=path).index("key", "env", "library", dimension=3)
+    assert service.calls == {"init": 1}
+
+def test_cache_file_never_holds_the_api_key(tmp_path):
+    path = tmp_path / "pinecone.json"
+    PineconePool(client=FakePinecone(), cache_path=str(path)).list_indexes("secret-key", "env")
+    assert "secret-key" not in path.read_text()
+
+def test_broken_cache_file_is_ignored(tmp_path):
+    path = tmp_path / "pinecone.json"
+    path.write_text("{not json")
+    assert PineconePool(client=FakePinecone(), cache_path=str(path)).list_indexes("key", "env") == []
+
+def test_missing_index_is_created_or_refused():
+    service = FakePinecone()
+    pool = PineconePool(client=service)
+    with pytest.raises(ValueError):
+        pool.index("key", "env", "library", create=False)
+    assert "create_index" not in service.calls
+    pool.index("key", "env", "library", dimension=3)
+    assert service.calls["create_index"] == 1
+
+def test_index_created_elsewhere_is_found_despite_a_cached_list():
+    service = FakePinecone()
+    pool = PineconePool(client=service, metadata_ttl=60)
+    assert pool.list_indexes("key", "env") == []
+    service.create_index("library", dimension=3)
+    pool.index("key", "env", "library", create=False)
+    assert service.calls["create_index"] == 1  # only the direct one
+    assert service.calls["list_indexes"] == 2
+
+def test_accounts_are_kept_apart():
+    service = FakePinecone()
+    pool = PineconePool(client=service)
+    pool.list_indexes("key-a", "env")
+    pool.list_indexes("key-b", "env")
+    pool.list_indexes("key-a", "env")
+    assert service.calls["init"] == 2
+    assert service.calls["list_indexes"] == 2
+
+def test_invalidate_forgets_metadata():
+    service = FakePinecone()
+    pool = PineconePool(client=service, metadata_ttl=60)
+    pool.list_indexes("key", "env")
+    pool.invalidate("key", "env")
+    pool.list_indexes("key", "env")
+    assert service.calls["list_indexes"] == 2
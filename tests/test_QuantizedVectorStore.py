@@ -0,0 +1,50 @@
+import numpy as np
+
+from framework.blocks.knowledge.vectorStores.LocalVectorStore import LocalVectorStore
+from framework.blocks.knowledge.vectorStores.QuantizedVectorStore import QuantizedVectorStore, recall_at_k
+
+DIMENSION = 16
+
+def rows(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+
+def filled(store, data):
+    store.upsert([(f"id{i}", row, {"n": i}) for i, row in enumerate(data)])
+    return store
+
+def test_int8_store_finds_what_the_exact_store_finds():
+    data = rows(300)
+    exact = filled(LocalVectorStore(dimension=DIMENSION), data)
+    quantized = filled(QuantizedVectorStore(dimension=DIMENSION, quantizer="int8"), data)
+    assert recall_at_k(quantized, exact, rows(10, seed=1), top_k=5) >= 0.8
+
+def test_rerank_gives_exact_scores():
+    data = rows(200)
+    exact = filled(LocalVectorStore(dimension=DIMENSION), data)
+    store = filled(QuantizedVectorStore(dimension=DIMENSION, quantizer="pq", n_subvectors=4, n_centroids=16, rerank=True), data)
+    query = rows(1, seed=2)[0]
+    expected = exact.query(vector=query, top_k=3)["matches"][0]
+    found = store.query(vector=query, top_k=3)["matches"][0]
+    assert found["id"] == expected["id"]
+    assert abs(found["score"] - expected["score"]) < 1e-5
+
+def test_save_and_load_round_trip(tmp_path):
+    data = rows(100)
+    store = filled(QuantizedVectorStore(dimension=DIMENSION, rerank=True), data)
+    path = str(tmp_path / "store")
+    store.save(path)
+    loaded = QuantizedVectorStore.load(path)
+    assert loaded.rerank
+    query = rows(1, seed=3)[0]
+    assert [m["id"] for m in loaded.query(vector=query, top_k=5)["matches"]] == [m["id"] for m in store.query(vector=query, top_k=5)["matches"]]
+    loaded.upsert([("new", data[0])])
+    assert loaded.describe_index_stats()["total_vector_count"] == 101
+
+def test_empty_saved_store_loads_and_grows(tmp_path):
+    path = str(tmp_path / "empty")
+    QuantizedVectorStore(dimension=DIMENSION, rerank=True).save(path)
+    loaded = QuantizedVectorStore.load(path)
+    assert not loaded.quantizer.trained
+    filled(loaded, rows(100))
+    assert loaded.describe_index_stats()["total_vector_count"] == 100
+    assert loaded.query(vector=rows(1)[0], top_k=1)["matches"][0]["id"] == "id0"
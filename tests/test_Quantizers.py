@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from framework.blocks.knowledge.embeddings.Quantizers import (ProductQuantizer, ScalarQuantizer, get_quantizer,
+                                                               load_quantized_embeds, save_quantized_embeds)
+
+DIMENSION = 32
+
+def vectors(rows: int = 500, seed: int = 0) -> np.ndarray:
+    data = np.random.default_rng(seed).standard_normal((rows, DIMENSION)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+def test_int8_round_trip_is_close():
+    data = vectors()
+    quantizer = ScalarQuantizer(DIMENSION).train(data)
+    codes = quantizer.encode(data)
+    assert codes.dtype == np.int8 and codes.shape == data.shape
+    assert np.abs(quantizer.decode(codes) - data).max() <= quantizer.scale.max()
+
+def test_int8_dot_and_distance_match_the_decoded_vectors():
+    data = vectors()
+    query = vectors(1, seed=1)[0]
+    quantizer = ScalarQuantizer(DIMENSION).train(data)
+    codes = quantizer.encode(data)
+    decoded = quantizer.decode(codes)
+    np.testing.assert_allclose(quantizer.dot(codes, query), decoded @ query, rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(quantizer.squared_distance(codes, query, block=64), ((decoded - query) ** 2).sum(axis=1), rtol=1e-4, atol=1e-4)
+
+def test_pq_codes_are_small_and_rank_like_exact_search():
+    data = vectors(2000)
+    query = data[7] + 0.01 * vectors(1, seed=2)[0]
+    quantizer = ProductQuantizer(DIMENSION, n_subvectors=8, n_centroids=64, iterations=10)
+    quantizer.train(data)
+    codes = quantizer.encode(data)
+    assert codes.shape == (2000, 8) and codes.dtype == np.uint8
+    assert int(np.argmax(quantizer.dot(codes, query))) == 7
+    np.testing.assert_allclose(quantizer.dot(codes, query), quantizer.decode(codes) @ query, rtol=1e-4, atol=1e-4)
+
+def test_pq_needs_a_divisible_dimension():
+    with pytest.raises(ValueError):
+        ProductQuantizer(DIMENSION, n_subvectors=5)
+
+def test_get_quantizer_rejects_unknown_kinds():
+    assert isinstance(get_quantizer("int8", DIMENSION), ScalarQuantizer)
+    with pytest.raises(ValueError):
+        get_quantizer("fp4", DIMENSION)
+
+@pytest.mark.parametrize("quantizer", [ScalarQuantizer(DIMENSION), ProductQuantizer(DIMENSION, n_subvectors=4, n_centroids=16, iterations=5)])
+def test_save_and_load_round_trip(tmp_path, quantizer):
+    data = vectors(100)
+    embeds = {f"chunk {i}": row for i, row in enumerate(data)}
+    path = str(tmp_path / "embeds.npz")
+    save_quantized_embeds(embeds, path, quantizer=quantizer)
+    loaded, restored = load_quantized_embeds(path)
+    assert list(loaded) == list(embeds)
+    assert restored.kind == quantizer.kind
+    np.testing.assert_allclose(np.stack(list(loaded.values())), quantizer.decode(quantizer.encode(data)), rtol=1e-5, atol=1e-5)
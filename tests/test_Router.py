@@ -0,0 +1,49 @@
+import contextlib
+import time
+
+import pytest
+
+from benchmarks.mockServer import MockOpenAIServer
+from framework.models.Router import Endpoint, RouterModel
+
+@contextlib.contextmanager
+def servers(*servers):
+    with contextlib.ExitStack() as stack:
+        yield [stack.enter_context(server) for server in servers]
+
+def test_failed_endpoint_fails_over_then_cools_down():
+    with servers(MockOpenAIServer(error_rate=1.0), MockOpenAIServer()) as (broken, working):
+        llm = RouterModel([Endpoint(broken.base_url, name="broken"), Endpoint(working.base_url, name="working")],
+                          model="mock", api_key="mock", failure_threshold=1, cooldown=60)
+        assert "mock reasoning" in llm.run(query="first")
+        assert llm.stats()["failovers"] == 1
+        # Out of rotation now, so the next call goes straight to the working endpoint
+        llm.run(query="second")
+        assert llm.stats()["failovers"] == 1
+        assert broken.stats.snapshot()["calls"]["errors"] == 1
+        assert working.stats.snapshot()["calls"]["chat"] == 2
+
+def test_all_endpoints_failing_raises():
+    with servers(MockOpenAIServer(error_rate=1.0), MockOpenAIServer(error_rate=1.0)) as pool:
+        llm = RouterModel([server.base_url for server in pool], model="mock", api_key="mock")
+        with pytest.raises(RuntimeError, match="All 2 endpoints failed"):
+            llm.run(query="question")
+
+def test_slow_call_is_hedged_on_the_next_endpoint():
+    with servers(MockOpenAIServer(latency=1.0), MockOpenAIServer()) as (slow, fast):
+        llm = RouterModel([Endpoint(slow.base_url, name="slow"), Endpoint(fast.base_url, name="fast")],
+                          model="mock", api_key="mock", hedge=True, hedge_delay=0.05)
+        start = time.perf_counter()
+        llm.run(query="question")
+        assert time.perf_counter() - start < 0.8
+        stats = llm.stats()
+        assert (stats["hedged"], stats["hedge_wins"], stats["failovers"]) == (1, 1, 0)
+        llm.close()
+
+def test_hedged_call_fails_over_too():
+    with servers(MockOpenAIServer(error_rate=1.0), MockOpenAIServer()) as pool:
+        llm = RouterModel([server.base_url for server in pool], model="mock", api_key="mock", hedge=True, hedge_delay=5)
+        assert "mock reasoning" in llm.run(query="question")
+        assert llm.stats()["failovers"] == 1
+        assert llm.stats()["hedged"] == 0
+        llm.close()
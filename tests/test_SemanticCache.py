@@ -0,0 +1,60 @@
+import copy
+import re
+import zlib
+
+import numpy as np
+
+from framework.models.Models import ModelBase
+from framework.models.SemanticCache import SemanticCache, SemanticCachedModel
+
+DIMENSION = 32
+
+def embed(text: str):
+    """Bag of words, prompts with the same words embed identically whatever their case and punctuation"""
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    for word in re.findall(r"\w+", text.casefold()):
+        vector[zlib.crc32(word.encode("utf-8")) % DIMENSION] += 1.0
+    return vector / max(np.linalg.norm(vector), 1e-12)
+
+class CountingModel(ModelBase):
+    def __init__(self, model: str = "small"):
+        self.model = model
+        self.calls = 0
+
+    def run(self, query, system_prompt: str = "", max_tokens: int = 1000, temperature: int = 0, history=None):
+        self.calls += 1
+        return f"{self.model} answer {self.calls}"
+
+def cached_model(**kwargs):
+    return SemanticCachedModel(CountingModel(), SemanticCache(embed, dimension=DIMENSION, **kwargs))
+
+def test_similar_prompt_is_served_from_the_cache():
+    llm = cached_model(threshold=0.95)
+    first = llm.run(query="What is the capital of France?")
+    assert llm.run(query="what is the capital of france") == first
+    assert llm.run(query="What is the capital of France?") == first
+    assert llm.llm.calls == 1
+    assert (llm.cache.hits, llm.cache.exact_hits, llm.cache.misses) == (1, 1, 1)
+
+def test_different_prompts_and_sampled_calls_go_to_the_model():
+    llm = cached_model(threshold=0.95)
+    llm.run(query="What is the capital of France?")
+    llm.run(query="Name a prime number above ten")
+    llm.run(query="What is the capital of France?", temperature=1)
+    assert llm.llm.calls == 3
+    assert llm.cache.bypassed == 1
+
+def test_entries_are_evicted_past_max_entries():
+    llm = cached_model(max_entries=2)
+    for question in ("one apple", "two bananas", "three cherries"):
+        llm.run(query=question)
+    assert len(llm.cache) == 2
+    llm.run(query="one apple")
+    assert llm.llm.calls == 4
+
+def test_wrapper_passes_attributes_through_and_copies():
+    llm = cached_model()
+    assert llm.model == "small"
+    duplicate = copy.copy(llm)
+    assert duplicate.llm is llm.llm and duplicate.cache is llm.cache
+    assert not hasattr(SemanticCachedModel.__new__(SemanticCachedModel), "model")
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+
+from framework.blocks.tools.Tool import Tool
+from framework.blocks.tools.ToolExecutor import ToolCall, ToolExecutor, ToolResultCache
+
+class Counter():
+    """A sync tool function that records how many calls run at once"""
+
+    def __init__(self, seconds: float = 0.0):
+        self.seconds = seconds
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        return value * 2
+
+def test_results_come_back_in_call_order_with_errors_kept_apart():
+    def fail(value):
+        raise ValueError(value)
+    executor = ToolExecutor([Tool("double", Counter(), "doubles"), Tool("fail", fail, "fails")])
+    results = executor.run_all_sync([("double", 1), ("fail", 2), ("missing", 3), ToolCall("double", 4)])
+    assert [result.output for result in results] == [2, None, None, 8]
+    assert isinstance(results[1].error, ValueError)
+    assert isinstance(results[2].error, KeyError)
+
+def test_max_concurrency_caps_parallel_calls():
+    counter = Counter(seconds=0.05)
+    executor = ToolExecutor([Tool("double", counter, "doubles", max_concurrency=2)])
+    executor.run_all_sync([("double", i) for i in range(6)])
+    assert counter.calls == 6
+    assert counter.peak == 2
+
+def test_timed_out_sync_tool_keeps_its_slot_until_it_returns():
+    counter = Counter(seconds=0.3)
+    executor = ToolExecutor([Tool("double", counter, "doubles", timeout=0.05, max_concurrency=1)])
+    first, second = executor.run_all_sync([("double", 1), ("double", 2)])
+    assert isinstance(first.error, asyncio.TimeoutError) and first.seconds < 0.3
+    assert isinstance(second.error, asyncio.TimeoutError)
+    executor._threads.shutdown(wait=True)
+    # The second call only started once the first thread returned, never alongside it
+    assert counter.calls == 2
+    assert counter.peak == 1
+
+def test_async_tool_timeout_frees_its_slot():
+    async def slow(value):
+        await asyncio.sleep(0.5 if value == "slow" else 0)
+        return value
+    executor = ToolExecutor([Tool("echo", slow, "echoes", timeout=0.05, max_concurrency=1)])
+    slow_result, fast_result = executor.run_all_sync([("echo", "slow"), ("echo", "fast")])
+    assert isinstance(slow_result.error, asyncio.TimeoutError)
+    assert fast_result.output == "fast"
+
+def test_identical_calls_share_one_run_and_the_cache():
+    counter = Counter(seconds=0.05)
+    executor = ToolExecutor([Tool("double", counter, "doubles", cache_ttl=60)])
+    results = executor.run_all_sync([("double", 3), ("double", 3), ("double", 4)])
+    assert [result.output for result in results] == [6, 6, 8]
+    assert counter.calls == 2
+    assert results[1].cached
+    again = executor.run_all_sync([("double", 3)])[0]
+    assert again.cached and again.output == 6
+    assert counter.calls == 2
+
+def test_cache_entries_expire():
+    cache = ToolResultCache()
+    key = ToolResultCache.key(ToolCall("double", 3))
+    cache.set(key, 6, ttl=0.01)
+    assert cache.get(key) == (True, 6)
+    time.sleep(0.02)
+    assert cache.get(key) == (False, None)
+
+def test_cache_evicts_the_oldest_entry_when_full():
+    cache = ToolResultCache(max_entries=2)
+    for value in range(3):
+        cache.set(str(value), value, ttl=60)
+    assert cache.get("0") == (False, None)
+    assert cache.get("2") == (True, 2)
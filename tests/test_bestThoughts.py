@@ -0,0 +1,59 @@
+from framework.agents.AlgorithmOfThought.bestThoughts import BestThoughtTracker
+
+def test_best_thought_per_step():
+    tracker = BestThoughtTracker()
+    tracker.accept("a", step=1, value=70)
+    tracker.accept("b", step=1, value=85)
+    tracker.accept("c", step=2, value=60)
+    assert tracker.best == {1: {"thought": "b", "value": 85}, 2: {"thought": "c", "value": 60}}
+
+def test_equal_values_keep_the_first_accepted():
+    tracker = BestThoughtTracker()
+    tracker.accept("a", step=1, value=80)
+    tracker.accept("b", step=1, value=80)
+    assert tracker.best[1]["thought"] == "a"
+
+def test_discard_promotes_the_runner_up():
+    tracker = BestThoughtTracker()
+    tracker.accept("a", step=1, value=70)
+    tracker.accept("b", step=1, value=85)
+    tracker.discard("b")
+    assert tracker.best[1] == {"thought": "a", "value": 70}
+    tracker.discard("a")
+    assert 1 not in tracker.best
+    assert len(tracker) == 0
+
+def test_reaccepting_moves_a_thought():
+    tracker = BestThoughtTracker()
+    tracker.accept("a", step=1, value=90)
+    tracker.accept("b", step=1, value=80)
+    tracker.accept("a", step=2, value=50)
+    assert tracker.best == {1: {"thought": "b", "value": 80}, 2: {"thought": "a", "value": 50}}
+    assert tracker.top(1, 5) == [{"thought": "b", "value": 80}]
+
+def test_many_discards_match_a_rescan():
+    tracker = BestThoughtTracker()
+    values = {f"t{i}": (i * 37) % 101 for i in range(200)}
+    for thought, value in values.items():
+        tracker.accept(thought, step=1, value=value)
+    for thought in list(values)[::3]:
+        tracker.discard(thought)
+        del values[thought]
+    ranked = sorted(values.items(), key=lambda item: -item[1])
+    assert tracker.best[1]["value"] == ranked[0][1]
+    assert [item["value"] for item in tracker.top(1, 10)] == [value for _, value in ranked[:10]]
+
+def test_alternative_paths_take_the_ith_best_of_every_step():
+    tracker = BestThoughtTracker()
+    tracker.accept("1a", step=1, value=90)
+    tracker.accept("1b", step=1, value=80)
+    tracker.accept("2a", step=2, value=70)
+    paths = tracker.alternative_paths(3)
+    assert [{step: item["thought"] for step, item in path.items()} for path in paths] == [{1: "1a", 2: "2a"}, {1: "1b", 2: "2a"}]
+
+def test_load_keeps_the_best_dict_identity():
+    tracker = BestThoughtTracker()
+    best = tracker.best
+    tracker.load({"a": {"step": 1, "value": 60}, "b": {"step": 1, "value": 75}})
+    assert tracker.best is best
+    assert best[1]["thought"] == "b"
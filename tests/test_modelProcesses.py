@@ -0,0 +1,45 @@
+import threading
+import time
+
+from framework.agents.AlgorithmOfThought.modelProcesses import AlgorithmModelProcesses
+from framework.models.Models import ModelBase
+from framework.models.ResponseCache import ResponseCache
+
+class SlowModel(ModelBase):
+    """Every call sleeps, so concurrent callers overlap, and returns a new sample"""
+
+    def __init__(self, seconds: float = 0.02):
+        self.model = "slow"
+        self.seconds = seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def run(self, query, system_prompt: str = "", max_tokens: int = 1000, temperature: int = 0, history=None):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.seconds)
+        return f"sample {call}"
+
+def test_concurrent_samples_of_a_prompt_get_their_own_cache_positions():
+    cache = ResponseCache()
+    processes = AlgorithmModelProcesses(llm=SlowModel(), response_cache=cache)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(processes.run_cached("prompt", temperature=1))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Without the cursor lock two threads could claim the same position and share a sample
+    assert len(set(results)) == 6
+    assert processes.LLM.calls == 6
+
+def test_another_agent_reuses_the_samples_in_order():
+    cache = ResponseCache()
+    first = AlgorithmModelProcesses(llm=SlowModel(seconds=0), response_cache=cache)
+    samples = [first.run_cached("prompt", temperature=1) for _ in range(3)]
+    second = AlgorithmModelProcesses(llm=SlowModel(seconds=0), response_cache=cache)
+    assert [second.run_cached("prompt", temperature=1) for _ in range(3)] == samples
+    assert second.LLM.calls == 0
+    # Greedy calls share the first response whatever the sampled cursors are at
+    assert first.run_cached("prompt") == second.run_cached("prompt")
@@ -0,0 +1,62 @@
+import pytest
+
+from framework.agents.AlgorithmOfThought.runJournal import JournalMissError, RunJournal, journal_key
+
+def record_run(path: str) -> str:
+    key = journal_key("thought", "task", "state", 1)
+    journal = RunJournal(path, mode="record", flush_interval=0.01)
+    for response in ("first", "second"):
+        journal.record_llm(key, "thought", "", "prompt", 1000, 1, response)
+    journal.checkpoint("searched", {"nodeCount": 3})
+    journal.close()
+    return key
+
+def test_replay_serves_responses_in_recorded_order(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    key = record_run(path)
+    journal = RunJournal(path, mode="replay")
+    assert journal.next_response(key) == "first"
+    assert journal.next_response(key) == "second"
+    assert journal.last_checkpoint()["nodeCount"] == 3
+
+def test_replay_raises_on_unrecorded_call(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    key = record_run(path)
+    journal = RunJournal(path, mode="replay")
+    journal.next_response(key)
+    journal.next_response(key)
+    with pytest.raises(JournalMissError):
+        journal.next_response(key)
+    with pytest.raises(JournalMissError):
+        journal.next_response(journal_key("evaluate", "task", "state", 1))
+
+def test_resume_falls_through_to_the_model_after_the_recorded_calls(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    key = record_run(path)
+    journal = RunJournal(path, mode="resume", flush_interval=0.01)
+    assert [journal.next_response(key) for _ in range(3)] == ["first", "second", None]
+    journal.record_llm(key, "thought", "", "prompt", 1000, 1, "third")
+    journal.close()
+    assert [record["response"] for record in RunJournal.read(path) if record["kind"] == "llm"] == ["first", "second", "third"]
+
+def test_truncated_journal_keeps_complete_batches(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    key = record_run(path)
+    with open(path, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00garbage")
+    assert RunJournal(path, mode="replay").next_response(key) == "first"
+
+def test_write_error_is_raised_from_flush_and_writer_keeps_running(tmp_path):
+    path = str(tmp_path / "missing" / "run.jsonl.gz")
+    journal = RunJournal(path, mode="record", flush_interval=0.01)
+    journal.record_score("state", 1, 50)
+    with pytest.raises(OSError):
+        journal.flush()
+    # The error is raised once, later records still drain
+    journal.record_score("state", 2, 60)
+    with pytest.raises(OSError):
+        journal.flush()
+    (tmp_path / "missing").mkdir()
+    journal.record_score("state", 3, 70)
+    journal.close()
+    assert [record["step"] for record in RunJournal.read(path)] == [3]
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from framework.agents.AlgorithmOfThought.subtreeScheduler import SearchStopped, SubtreeScheduler
+
+def test_a_call_is_made_once_and_shared():
+    scheduler = SubtreeScheduler(2, min_call_latency=0)
+    calls = []
+    started = threading.Event()
+
+    def call():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return "answer"
+    results = []
+    thread = threading.Thread(target=lambda: results.append(scheduler.run("key", call, speculative=True)))
+    thread.start()
+    started.wait()
+    results.append(scheduler.run("key", call))
+    thread.join()
+    scheduler.stop()
+    assert results == ["answer", "answer"] and len(calls) == 1
+    assert scheduler.stats()["shared_calls"] == 1
+    # dfs asked for the explorer's call, so it was not wasted
+    assert scheduler.stats()["wasted_calls"] == 0
+
+def test_errors_reach_every_asker():
+    scheduler = SubtreeScheduler(1)
+
+    def fail():
+        raise ValueError("no answer")
+    with pytest.raises(ValueError):
+        scheduler.run("key", fail)
+    with pytest.raises(ValueError):
+        scheduler.run("key", fail)
+    scheduler.stop()
+
+def test_speculative_budget_stops_explorers():
+    scheduler = SubtreeScheduler(2, max_speculative_calls=2, min_call_latency=0)
+    scheduler.run("a", lambda: 1, speculative=True)
+    scheduler.run("b", lambda: 2, speculative=True)
+    with pytest.raises(SearchStopped):
+        scheduler.run("c", lambda: 3, speculative=True)
+    assert not scheduler.claim("subtree")
+    # dfs itself is never limited
+    assert scheduler.run("c", lambda: 3) == 3
+    assert scheduler.stats()["wasted_calls"] == 2
+    scheduler.stop()
+
+def test_fast_calls_start_no_explorers():
+    scheduler = SubtreeScheduler(2, min_call_latency=0.05)
+    assert scheduler.claim("first")
+    scheduler.run("fast", lambda: 1)
+    assert not scheduler.claim("second")
+    scheduler.run("slow", lambda: time.sleep(0.2))
+    assert scheduler.claim("second")
+    assert not scheduler.claim("second")
+    scheduler.stop()
+    assert not scheduler.claim("third")
+
+def test_failed_explorers_are_counted_not_raised():
+    scheduler = SubtreeScheduler(1)
+
+    def explorer():
+        raise SearchStopped()
+    scheduler.explore(explorer)
+    scheduler.stop()
+    assert scheduler.stats()["explorers"] == 1
+    assert scheduler.stats()["failed_explorers"] == 1
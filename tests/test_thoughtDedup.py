@@ -0,0 +1,64 @@
+from framework.agents.AlgorithmOfThought.thoughtDedup import MinHasher, ThoughtDeduplicator, content_tokens, normalize_thought
+
+SETS = "1. Compute A - B where A = [1,3,5,6,7,8,9] and B = [2,3,6,9] by removing every element of B from A."
+SWAPPED = "1. Compute B - A where B = [1,3,5,6,7,8,9] and A = [2,3,6,9] by removing every element of A from B."
+
+def similarity(first: str, second: str) -> float:
+    hasher = MinHasher()
+    return MinHasher.similarity(hasher.signature(normalize_thought(first)), hasher.signature(normalize_thought(second)))
+
+def test_normalize_drops_markers_case_and_whitespace():
+    assert normalize_thought("Step 2:  Multiply 4 BY 6.") == normalize_thought("multiply 4 by 6")
+
+def test_exact_and_reworded_duplicates_merge():
+    dedup = ThoughtDeduplicator(threshold=0.85)
+    dedup.add("1. Multiply 4 by 6 to get 24.")
+    assert dedup.find("Multiply 4  by 6 to get 24") == "1. Multiply 4 by 6 to get 24."
+    assert dedup.find("- Multiply 4 by 6 to get 24 !") == "1. Multiply 4 by 6 to get 24."
+
+def test_changed_number_is_not_a_duplicate():
+    changed = SETS.replace("8,9]", "8,10]")
+    # Similar enough for MinHash alone to merge them at this threshold
+    assert similarity(SETS, changed) >= 0.5
+    dedup = ThoughtDeduplicator(threshold=0.5)
+    dedup.add(SETS)
+    assert dedup.find(changed) is None
+
+def test_swapped_sets_are_not_a_duplicate():
+    assert similarity(SETS, SWAPPED) >= 0.5
+    assert content_tokens(SWAPPED) != content_tokens(SETS)
+    dedup = ThoughtDeduplicator(threshold=0.5)
+    dedup.add(SETS)
+    assert dedup.find(SWAPPED) is None
+
+def test_minhash_merge_needs_the_same_content_tokens():
+    assert similarity("Add 12 and 30 to get 42, then check the total against the target.",
+                      "Add 12 and 31 to get 43, and then check the total against the target") >= 0.5
+    dedup = ThoughtDeduplicator(threshold=0.5)
+    dedup.add("Add 12 and 30 to get 42, then check the total against the target.")
+    assert dedup.find("Add 12 and 30 to get 42, and then check the total against the target") is not None
+    assert dedup.find("Add 12 and 31 to get 43, and then check the total against the target") is None
+
+def test_embedding_match_needs_the_same_content_tokens():
+    dedup = ThoughtDeduplicator(threshold=0.99, embedder=lambda text: [1.0, 0.0])
+    dedup.add("Subtract 7 from 20 to get 13.")
+    assert dedup.find("Take 7 away from 20, which leaves 13") == "Subtract 7 from 20 to get 13."
+    assert dedup.find("Take 8 away from 20, which leaves 12") is None
+
+def test_copy_is_independent():
+    dedup = ThoughtDeduplicator()
+    dedup.add("Multiply 4 by 6 to get 24.")
+    copied = dedup.copy()
+    copied.add("Divide 24 by 3 to get 8.")
+    assert len(dedup) == 1 and len(copied) == 2
+    assert dedup.find("Divide 24 by 3 to get 8") is None
+
+def test_negative_number_is_not_a_bullet():
+    assert normalize_thought("-5 + 3 = -2") != normalize_thought("5 + 3 = -2")
+    assert content_tokens("-5 + 3 = -2") != content_tokens("5 + 3 = 8")
+    assert normalize_thought("- Add 5 and 3") == normalize_thought("Add 5 and 3")
+    dedup = ThoughtDeduplicator(threshold=0.5)
+    dedup.add("5 + 3 = 8")
+    assert dedup.find("-5 + 3 = 8") is None
+    assert dedup.find("* 5 + 3 = 8") is None
+    assert dedup.find("5 + 3 = 8.") == "5 + 3 = 8"
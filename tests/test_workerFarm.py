@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks.mockServer import MockOpenAIServer
+from framework.agents.AlgorithmOfThought.workerFarm import WorkerFarm
+
+def test_job_without_a_result_fails_at_its_deadline():
+    # No local workers, so nothing ever takes the job
+    with WorkerFarm(processes=0, job_timeout=0.2) as farm:
+        future = farm.submit("thought", state="state")
+        with pytest.raises(TimeoutError):
+            future.result(timeout=5)
+        assert farm.stats()["expired"] == 1
+        assert farm.stats()["pending"] == 0
+
+def test_close_fails_pending_jobs_and_refuses_new_ones():
+    farm = WorkerFarm(processes=0, job_timeout=None).start()
+    future = farm.submit("thought", state="state")
+    farm.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        future.result(timeout=5)
+    with pytest.raises(RuntimeError, match="closed"):
+        farm.submit("thought", state="state")
+
+def test_workers_answer_jobs_against_the_mock_server():
+    with MockOpenAIServer() as server:
+        with WorkerFarm(processes=1, threads_per_process=2, model="mock", api_key="mock", api_base=server.base_url) as farm:
+            model = farm.model_processes()
+            thoughts = model.generate_thoughts(state="", initial_prompt="Make 24 from 4 4 6 8", k=2, current_step=1)
+            assert len(thoughts) == 2 and all("mock reasoning" in thought for thought in thoughts)
+            assert model.evaluate_state(thoughts[0], "Make 24 from 4 4 6 8", previous_score=0, current_step=1) is not None
+            assert farm.stats()["submitted"] == 3